@@ -15,8 +15,16 @@
 
 import argparse
 
-def parse_args() -> argparse.Namespace:
-    """Parse the arguments and invoke the necessary steps."""
+# The file extension metrics_collector reads each --metrics-format from.
+METRICS_EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+    "histogram": ".hist",
+}
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """Parse the arguments (sys.argv by default) and invoke the necessary steps."""
     parser = argparse.ArgumentParser(description="SSIOG arguments")
     parser.add_argument(
         "--prefix",
@@ -24,9 +32,80 @@ def parse_args() -> argparse.Namespace:
         nargs="+",
         help=(
             "Use the files starting with the given prefix(es)."
-            + " Use gs://... when using direct GCS access."
+            + " Use gs://... when using direct GCS access, sim://synthetic/ or"
+            + " sim:///local/dir/ for a simulated object store, and null:// for"
+            + " a store answering at once."
         )
     )
+    parser.add_argument(
+        "--manifest-dir",
+        type=str,
+        help=(
+            "Directory (local or a pyarrow URI such as gs://...) for the dataset"
+            + " manifests. If set, object names and sizes are loaded from there"
+            + " instead of listing the prefixes on every run."
+        ),
+        default="",
+    )
+    parser.add_argument(
+        "--manifest-refresh",
+        type=str,
+        choices=["never", "validate", "always"],
+        help=(
+            "When to rebuild a stored manifest: never, when a fresh listing"
+            + " differs from it (validate), or always."
+        ),
+        default="never",
+    )
+    parser.add_argument(
+        "--sim-objects",
+        type=int,
+        help="Number of objects of a sim://synthetic/ or null:// store.",
+        default=1000,
+    )
+    parser.add_argument(
+        "--sim-object-size",
+        type=int,
+        help="Size in bytes of the objects of a sim://synthetic/ or null:// store.",
+        default=1 << 20,
+    )
+    parser.add_argument(
+        "--sim-latency-ms",
+        type=float,
+        help="Mean latency of each open or read request to a sim:// store.",
+        default=0,
+    )
+    parser.add_argument(
+        "--sim-latency-distribution",
+        type=str,
+        choices=["fixed", "exponential", "lognormal"],
+        help="Distribution of the sim:// request latency around its mean.",
+        default="fixed",
+    )
+    parser.add_argument(
+        "--sim-latency-sigma",
+        type=float,
+        help="Shape of the lognormal sim:// latency, larger values give heavier tails.",
+        default=1.0,
+    )
+    parser.add_argument(
+        "--sim-stream-bandwidth-mbps",
+        type=float,
+        help="Bandwidth cap of each open sim:// file, in Mbit/s. 0 for no cap.",
+        default=0,
+    )
+    parser.add_argument(
+        "--sim-bandwidth-mbps",
+        type=float,
+        help="Bandwidth cap of all the sim:// reads of the process, in Mbit/s. 0 for no cap.",
+        default=0,
+    )
+    parser.add_argument(
+        "--sim-error-rate",
+        type=float,
+        help="Probability that a sim:// request fails.",
+        default=0,
+    )
     parser.add_argument(
             "--object-count-limit",
         type=int,
@@ -64,18 +143,229 @@ def parse_args() -> argparse.Namespace:
         help="Sampling order strategy (Sequential, FileRandom, FullRandom).",
         default=["Sequential"],
     )
+    parser.add_argument(
+        "--file-random-mode",
+        type=str,
+        choices=["readall", "window", "ranged"],
+        help=(
+            "How FileRandom reads an object: the whole object at once (readall),"
+            + " streamed in --file-random-window reads (window), or only the"
+            + " selected samples with ranged reads (ranged)."
+        ),
+        default="readall",
+    )
+    parser.add_argument(
+        "--file-random-window",
+        type=int,
+        help="Window size in bytes for --file-random-mode=window.",
+        default=64 * 1024 * 1024,
+    )
+    parser.add_argument(
+        "--reader-memory-budget",
+        type=int,
+        help="Maximum bytes buffered by FileRandom readers per process, 0 for no limit.",
+        default=0,
+    )
+    parser.add_argument(
+        "--coalesce-max-gap",
+        type=int,
+        help=(
+            "Merge FullRandom samples of the same object that are at most this"
+            + " many bytes apart into one ranged read. Negative disables coalescing."
+        ),
+        default=-1,
+    )
+    parser.add_argument(
+        "--coalesce-max-size",
+        type=int,
+        help="Maximum size in bytes of a coalesced read.",
+        default=8 * 1024 * 1024,
+    )
+    parser.add_argument(
+        "--coalesce-window",
+        type=int,
+        help="Number of upcoming samples per reader considered for coalescing.",
+        default=256,
+    )
+    parser.add_argument(
+        "--reader-engine",
+        type=str,
+        choices=["thread", "asyncio", "process"],
+        help=(
+            "Reader engine. 'thread' blocks one OS thread per read,"
+            + " 'asyncio' keeps many reads in flight per event loop,"
+            + " 'process' runs the readers in separate processes."
+        ),
+        default="thread",
+    )
+    parser.add_argument(
+        "--async-loops",
+        type=int,
+        help="Number of asyncio event loops, each on its own thread (asyncio engine only).",
+        default=4,
+    )
+    parser.add_argument(
+        "--async-queue-depth",
+        type=int,
+        help="Maximum in-flight reads per event loop (asyncio engine only).",
+        default=256,
+    )
+    parser.add_argument(
+        "--reader-processes",
+        type=int,
+        help="Number of reader processes (process engine only).",
+        default=8,
+    )
+    parser.add_argument(
+        "--shm-ring-slots",
+        type=int,
+        help="Number of slots in the shared-memory ring buffer (process engine only).",
+        default=4096,
+    )
+    parser.add_argument(
+        "--shm-handoff",
+        type=str,
+        choices=["descriptor", "bytes"],
+        help=(
+            "What reader processes hand to the step loop: only the sample"
+            + " descriptor, or the descriptor and the sample bytes."
+        ),
+        default="descriptor",
+    )
     parser.add_argument(
         "--background-queue-maxsize",
         type=int,
         help="Maximum size for the threaded queue.",
         default=2048,
     )
+    parser.add_argument(
+        "--queue-batch-size",
+        type=int,
+        help=(
+            "Number of completed samples a reader hands to the step loop per"
+            + " queue transfer. The queue capacity stays"
+            + " --background-queue-maxsize samples."
+        ),
+        default=16,
+    )
+    parser.add_argument(
+        "--buffer-pool-size",
+        type=int,
+        help=(
+            "Number of preallocated --sample-size buffers that Sequential and"
+            + " FullRandom readers read into and reuse, 0 to allocate per read."
+            + " A reader out of buffers flushes its partial --queue-batch-size"
+            + " batch and waits, so sizes below --background-queue-maxsize plus"
+            + " threads times --queue-batch-size cost throughput."
+        ),
+        default=0,
+    )
+    parser.add_argument(
+        "--handle-cache-size",
+        type=int,
+        help=(
+            "Number of open object handles shared by the FullRandom readers of a"
+            + " prefix, the least recently used ones are closed first. Objects"
+            + " are opened on first read. 0 keeps every handle open. With"
+            + " --buffer-pool-size, each reader thread also opens its own"
+            + " stream of a cached object, so reads into buffers need no lock."
+        ),
+        default=1024,
+    )
+    parser.add_argument(
+        "--target-rate",
+        type=float,
+        help=(
+            "Open-loop target in samples per second per rank. Reads are issued"
+            + " on schedule however long earlier reads take, and latency is"
+            + " measured from the scheduled time. 0 keeps the closed loop."
+        ),
+        default=0,
+    )
+    parser.add_argument(
+        "--target-bytes-rate",
+        type=float,
+        help="Open-loop target in bytes per second per rank, used if --target-rate is 0.",
+        default=0,
+    )
+    parser.add_argument(
+        "--arrival",
+        type=str,
+        choices=["constant", "poisson"],
+        help="Open-loop arrival process: evenly spaced or Poisson reads.",
+        default="constant",
+    )
+    parser.add_argument(
+        "--deadline-ms",
+        type=float,
+        help="Open-loop reads completing later than this after their scheduled time count as missed deadlines, 0 to disable.",
+        default=0,
+    )
+    parser.add_argument(
+        "--compute-time-ms",
+        type=float,
+        help=(
+            "Simulated compute time of each step, during which the readers keep"
+            + " prefetching. Each step reports how long it stalled waiting for data."
+        ),
+        default=0,
+    )
+    parser.add_argument(
+        "--compute-time-distribution",
+        type=str,
+        choices=["fixed", "normal", "exponential"],
+        help="Distribution of the compute time, with mean --compute-time-ms.",
+        default="fixed",
+    )
+    parser.add_argument(
+        "--compute-time-stddev-ms",
+        type=float,
+        help="Standard deviation of the normal compute time distribution.",
+        default=0,
+    )
+    parser.add_argument(
+        "--prefetch-depth",
+        type=int,
+        help=(
+            "Number of batches the readers may prefetch ahead of the step being"
+            + " computed. Overrides --background-queue-maxsize, and"
+            + " --shm-ring-slots for the process engine. 0 keeps them."
+        ),
+        default=0,
+    )
     parser.add_argument(
         "--background-threads",
         type=int,
         help="Number of background threads.",
         default=16,
     )
+    parser.add_argument(
+        "--plan-mode",
+        type=str,
+        choices=["broadcast", "seed"],
+        help=(
+            "How ranks agree on the epoch plan. 'broadcast' sends the prefix,"
+            + " objects, read order and samples from rank 0. 'seed' sends only"
+            + " a seed and every rank derives the same plan."
+        ),
+        default="broadcast",
+    )
+    parser.add_argument(
+        "--plan-ahead",
+        type=int,
+        help=(
+            "Number of epochs planned in the background while the current one"
+            + " runs, on a separate process group. 0 plans each epoch when it"
+            + " starts."
+        ),
+        default=0,
+    )
+    parser.add_argument(
+        "--plan-seed",
+        type=int,
+        help="Base seed for the 'seed' plan mode (epoch N uses seed + N), random if negative.",
+        default=-1,
+    )
     parser.add_argument(
         "--group-coordinator-address",
         type=str,
@@ -100,6 +390,23 @@ def parse_args() -> argparse.Namespace:
         help="The process group size.",
         default=1,
     )
+    parser.add_argument(
+        "--sync-mode",
+        type=str,
+        choices=["barrier", "every-n", "allreduce", "none"],
+        help=(
+            "How the ranks synchronize between steps: a barrier every step, a"
+            + " barrier every --sync-interval steps, an asynchronous all-reduce"
+            + " of a step token overlapped with the next step, or none."
+        ),
+        default="barrier",
+    )
+    parser.add_argument(
+        "--sync-interval",
+        type=int,
+        help="Number of steps between barriers with --sync-mode=every-n.",
+        default=1,
+    )
     parser.add_argument(
         "--label",
         type=str,
@@ -115,8 +422,31 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--metrics-file",
         type=str,
-        help="Log the metrics on the file.",
-        default="metrics.csv",
+        help=(
+            "Log the metrics on the file. Defaults to metrics with the"
+            + " extension of --metrics-format, e.g. metrics.parquet."
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics-format",
+        type=str,
+        choices=["csv", "parquet", "arrow", "histogram"],
+        help=(
+            "'csv' logs the latency of each sample. 'parquet' and 'arrow' (IPC"
+            + " file) log each sample with its object, offset, bytes, thread,"
+            + " rank and reader. 'histogram' records per-thread"
+            + " log-bucketed histograms, reports percentiles per step and per"
+            + " epoch (merged across ranks), and writes the run histogram to"
+            + " --metrics-file."
+        ),
+        default="csv",
+    )
+    parser.add_argument(
+        "--histogram-relative-error",
+        type=float,
+        help="Relative error of the percentiles of --metrics-format=histogram.",
+        default=0.01,
     )
     parser.add_argument(
         "--export-metrics",
@@ -151,4 +481,13 @@ def parse_args() -> argparse.Namespace:
         default=True,
     )
 
-    return parser.parse_args()
\ No newline at end of file
+    args = parser.parse_args(argv)
+    extension = METRICS_EXTENSIONS[args.metrics_format]
+    if args.metrics_file is None:
+        args.metrics_file = "metrics" + extension
+    elif not args.metrics_file.endswith(extension):
+        parser.error(
+            f"--metrics-file {args.metrics_file} must end with {extension}"
+            + f" for --metrics-format={args.metrics_format}."
+        )
+    return args
\ No newline at end of file
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An asyncio based reader engine.
+
+Each event loop runs on its own thread and keeps up to `queue_depth` reads in
+flight, instead of one blocking read per OS thread. Completed samples are put
+on the same queue consumed by `training.Epoch`.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+import gcsfs
+import pyarrow.fs as fs
+
+import handle_cache
+import sampling
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the executor used by filesystems without a native async API.
+_MAX_EXECUTOR_WORKERS = 64
+
+
+def _subset(items: Iterable, index: int, count: int) -> list:
+    return [o for i, o in enumerate(items) if i % count == index]
+
+
+def read_requests(
+    read_order: str,
+    object_names: Iterable[str],
+    rank: int,
+    world_size: int,
+    loop_id: int,
+    loop_count: int,
+    sample_size: int,
+    samples: list,
+) -> Iterator[tuple[str, int]]:
+    """
+    Yields the (name, offset) reads assigned to one event loop, in issue order.
+
+    The work split matches the threaded readers: objects (or samples for
+    FullRandom) are partitioned first by rank and then by loop.
+    """
+    if read_order == "FullRandom":
+        subset = _subset(samples, rank, world_size)
+        yield from _subset(subset, loop_id, loop_count)
+        return
+
+    index = sampling.index_of(samples)
+    subset = _subset(object_names, rank, world_size)
+    subset = _subset(subset, loop_id, loop_count)
+    if read_order == "Sequential":
+        for name in subset:
+            for i in range(index.count(name)):
+                yield (name, i * sample_size)
+    elif read_order == "FileRandom":
+        for name in subset:
+            for offset in index.offsets(name).tolist():
+                yield (name, offset)
+    else:
+        raise Exception(f"Unknown reading order {read_order}")
+
+
+class _ExecutorBackend(object):
+    """
+    Reads through a blocking pyarrow filesystem on a bounded thread pool.
+
+    Used for filesystems without a native async API (e.g. local). Objects
+    are opened on first read and at most `handle_cache_size` handles are
+    kept, 0 keeps every handle.
+    """
+
+    def __init__(self, filesystem: fs.FileSystem, queue_depth: int, handle_cache_size: int = 0):
+        self._handles = handle_cache.HandleCache(filesystem, handle_cache_size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(queue_depth, _MAX_EXECUTOR_WORKERS)
+        )
+
+    async def read(self, name: str, offset: int, size: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._handles.read_at, name, size, offset)
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+        self._handles.close()
+
+
+class _GcsfsBackend(object):
+    """
+    Reads ranges with the native coroutines of an asynchronous gcsfs instance.
+    """
+
+    def __init__(self):
+        self._fs = gcsfs.GCSFileSystem(asynchronous=True, skip_instance_cache=True)
+
+    async def read(self, name: str, offset: int, size: int) -> bytes:
+        if self._fs._session is None:
+            await self._fs._set_session()
+        return await self._fs._cat_file(name, start=offset, end=offset + size)
+
+    async def close(self):
+        if self._fs._session is not None:
+            await self._fs._session.close()
+
+
+def is_gcs(filesystem: fs.FileSystem) -> bool:
+    """Returns true if the filesystem reads from GCS (directly or via gcsfs)."""
+    if filesystem.type_name == "gcs":
+        return True
+    return isinstance(filesystem, fs.PyFileSystem) and isinstance(
+        getattr(filesystem.handler, "fs", None), gcsfs.GCSFileSystem
+    )
+
+
+def _backend(filesystem: fs.FileSystem, queue_depth: int, handle_cache_size: int = 0):
+    if is_gcs(filesystem):
+        return _GcsfsBackend()
+    return _ExecutorBackend(filesystem, queue_depth, handle_cache_size)
+
+
+async def _put(q: queue.Queue, item):
+    # Never block the event loop on a full queue, other reads are in flight.
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            await asyncio.sleep(0.001)
+
+
+async def _run(
+    requests: Iterable[tuple[str, int]],
+    backend,
+    q: queue.Queue,
+    queue_depth: int,
+    sample_size: int,
+    fail_on_empty: bool,
+    on_latency: Callable[[int, str, int, int], None],
+    batch_size: int,
+    cancelled: threading.Event = None,
+):
+    in_flight = asyncio.Semaphore(queue_depth)
+    pending = set()
+    errors = []
+    batch = []
+
+    async def read_one(name: str, offset: int):
+        nonlocal batch
+        try:
+            start_time = time.monotonic_ns()
+            chunk = await backend.read(name, offset, sample_size)
+            elapsed_time = time.monotonic_ns() - start_time
+        finally:
+            in_flight.release()
+        on_latency(elapsed_time, name, offset, len(chunk))
+        if not chunk:
+            if fail_on_empty:
+                raise ValueError("chunk is nil.")
+            return
+        batch.append((name, offset, elapsed_time))
+        if len(batch) >= batch_size:
+            full, batch = batch, []
+            await _put(q, full)
+
+    def done(task: asyncio.Task):
+        pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    try:
+        for name, offset in requests:
+            await in_flight.acquire()
+            if errors or (cancelled is not None and cancelled.is_set()):
+                in_flight.release()
+                break
+            task = asyncio.ensure_future(read_one(name, offset))
+            pending.add(task)
+            task.add_done_callback(done)
+        if pending:
+            await asyncio.wait(set(pending))
+        if errors:
+            raise errors[0]
+        if batch:
+            await _put(q, batch)
+    finally:
+        for task in list(pending):
+            task.cancel()
+
+
+class Worker(object):
+    """
+    An event loop and its read backends, kept by a reader thread across
+    epochs so open files and connections are reused. Each backend keeps at
+    most `handle_cache_size` open files.
+    """
+
+    def __init__(self, handle_cache_size: int = 0):
+        self.loop = asyncio.new_event_loop()
+        self.handle_cache_size = handle_cache_size
+        self._backends = {}
+
+    def backend(self, filesystem: fs.FileSystem, queue_depth: int):
+        # Keyed by identity, the filesystem is kept alive with its backend.
+        key = (id(filesystem), queue_depth)
+        if key not in self._backends:
+            self._backends[key] = (filesystem, _backend(filesystem, queue_depth, self.handle_cache_size))
+        return self._backends[key][1]
+
+    def close(self):
+        for _, backend in self._backends.values():
+            self.loop.run_until_complete(backend.close())
+        self._backends.clear()
+        self.loop.close()
+
+
+def run_loop(
+    read_order: str,
+    object_names: Iterable[str],
+    rank: int,
+    world_size: int,
+    loop_id: int,
+    loop_count: int,
+    queue_depth: int,
+    filesystem: fs.FileSystem,
+    sample_size: int,
+    samples: list,
+    q: queue.Queue,
+    on_latency: Callable[[int, str, int, int], None],
+    batch_size: int = 1,
+    worker: Worker = None,
+    cancelled: threading.Event = None,
+):
+    """
+    Runs one event loop to completion on the calling thread.
+
+    Completed samples are put on `q` as lists of up to `batch_size`
+    (name, offset, elapsed_ns) tuples and each read is reported through
+    `on_latency(elapsed_ns, name, offset, nbytes)`. With a `worker`, its
+    loop and backends are used and left open for the next epoch. No new
+    reads are issued once `cancelled` is set.
+    """
+    requests = read_requests(
+        read_order, object_names, rank, world_size, loop_id, loop_count, sample_size, samples
+    )
+    logger.debug(f"Event loop {loop_id} started with queue depth {queue_depth}.")
+
+    def run(backend):
+        return _run(
+            requests,
+            backend,
+            q,
+            queue_depth,
+            sample_size,
+            read_order == "FullRandom",
+            on_latency,
+            batch_size,
+            cancelled,
+        )
+
+    if worker is not None:
+        worker.loop.run_until_complete(run(worker.backend(filesystem, queue_depth)))
+        return
+
+    async def main():
+        backend = _backend(filesystem, queue_depth)
+        try:
+            await run(backend)
+        finally:
+            await backend.close()
+
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Measures the throughput ceiling of the harness itself: epochs read from a
+null:// store, which answers every request at once, for each read order
+and number of reader threads. Reports samples/s and CPU time per sample.
+
+    python benchmark_harness.py --threads 1 4 16
+    python benchmark_harness.py --read-orders FullRandom -- --reader-engine asyncio
+
+Flags after `--` are passed to the training arguments.
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+import torch.distributed as td
+
+import arguments
+import reader_pool
+import training
+
+
+def run(read_order: str, threads: int, options: argparse.Namespace, extra: list[str]) -> dict:
+    """Runs --epochs epochs of a configuration after a warm-up one, returns its rates."""
+    args = arguments.parse_args(
+        [
+            "--prefix", "null://",
+            "--read-order", read_order,
+            "--background-threads", str(threads),
+            "--async-loops", str(threads),
+            "--steps", str(options.steps),
+            "--batch-size", str(options.batch_size),
+            "--sample-size", str(options.sample_size),
+            "--sim-objects", str(options.objects),
+            "--sim-object-size", str(options.object_size),
+        ]
+        + extra
+    )
+    sources = training.configure_object_sources(args)
+    object_sizes = {n: size for source in sources.values() for n, size in source.sizes.items()}
+    readers = None
+    if args.reader_engine != "process":
+        readers = reader_pool.ReaderPool(threads)
+    samples_read = 0
+    wall_ns = 0
+    cpu_s = 0.0
+    try:
+        for epoch in range(options.epochs + 1):
+            (reader, order, filesystem, epoch_objects, samples, pool, pacer) = training.plan_epoch(
+                sources, epoch, args, 0, object_sizes
+            )
+            wall_start = time.monotonic_ns()
+            cpu_start = time.process_time()
+            steps = sum(1 for _ in training.Epoch(reader, epoch_objects, filesystem, samples, args, order, readers=readers))
+            if epoch == 0:
+                continue
+            wall_ns += time.monotonic_ns() - wall_start
+            cpu_s += time.process_time() - cpu_start
+            samples_read += steps * args.batch_size
+    finally:
+        if readers is not None:
+            readers.close()
+    return {
+        "read_order": read_order,
+        "threads": threads,
+        "engine": args.reader_engine,
+        "samples": samples_read,
+        "samples_per_s": samples_read / (wall_ns / 1e9) if wall_ns else 0.0,
+        "mb_per_s": samples_read * args.sample_size / 1e6 / (wall_ns / 1e9) if wall_ns else 0.0,
+        "cpu_us_per_sample": cpu_s * 1e6 / samples_read if samples_read else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the throughput ceiling of the harness.")
+    parser.add_argument("--read-orders", nargs="+", default=["Sequential", "FileRandom", "FullRandom"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--sample-size", type=int, default=65536)
+    parser.add_argument("--objects", type=int, default=256)
+    parser.add_argument("--object-size", type=int, default=1 << 22)
+    parser.add_argument("--json", type=str, default="", help="Also write the results to this JSON file.")
+    options, extra = parser.parse_known_args()
+    extra = [a for a in extra if a != "--"]
+
+    logging.getLogger().setLevel(logging.WARNING)
+    training.logger.setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        td.init_process_group("gloo", init_method=f"file://{os.path.join(tmp, 'store')}", rank=0, world_size=1)
+        try:
+            results = []
+            print(f"{'read order':12s} {'threads':>7s} {'samples/s':>12s} {'MB/s':>10s} {'CPU us/sample':>14s}")
+            for read_order in options.read_orders:
+                for threads in options.threads:
+                    r = run(read_order, threads, options, extra)
+                    results.append(r)
+                    print(
+                        f"{read_order:12s} {threads:7d} {r['samples_per_s']:12.0f} "
+                        f"{r['mb_per_s']:10.1f} {r['cpu_us_per_sample']:14.1f}"
+                    )
+        finally:
+            td.destroy_process_group()
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
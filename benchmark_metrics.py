@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Measures the per-sample cost of recording a sample latency, in nanoseconds,
+for each metrics logger and for the OTel histogram. The Queue-based CSV
+logger the per-thread buffers replaced is kept as a baseline.
+
+    python benchmark_metrics.py --samples 1000000 --threads 4
+"""
+
+import argparse
+import csv
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from opentelemetry.sdk.metrics import MeterProvider
+
+import metrics_logger
+
+
+class _QueueMetricsLogger:
+    """
+    The former AsyncMetricsLogger: a list and a locked Queue.put per sample,
+    drained into the CSV file every `flush_interval` seconds.
+    """
+    def __init__(self, file_name="metrics.csv", flush_interval=5):
+        self.file_name = file_name
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self._shutdown = False
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def _drain(self, writer, csvfile):
+        metrics = []
+        try:
+            while True:
+                metrics.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if metrics:
+            writer.writerows(metrics)
+            csvfile.flush()
+
+    def _writer_loop(self):
+        with open(self.file_name, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["timestamp", "sample_lat"])
+            while True:
+                self._drain(writer, csvfile)
+                if self._shutdown:
+                    self._drain(writer, csvfile)
+                    break
+                time.sleep(self.flush_interval)
+
+    def log_metric(self, sample_lat, name=None, offset=-1, nbytes=-1, reader=None):
+        timestamp = time.time()
+        self.queue.put([timestamp, sample_lat])
+
+    def close(self):
+        self._shutdown = True
+        self.writer_thread.join()
+
+
+def _per_sample_ns(record, samples: int, threads: int) -> float:
+    """Returns the wall time per recorded sample, with `threads` recording concurrently."""
+    per_thread = samples // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def run():
+        barrier.wait()
+        for i in range(per_thread):
+            record(i)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter_ns()
+    for t in workers:
+        t.join()
+    return (time.perf_counter_ns() - start) / (per_thread * threads)
+
+
+def benchmark(samples: int, threads: int) -> dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        loggers = {
+            "csv": lambda: metrics_logger.AsyncMetricsLogger(file_name=os.path.join(tmp, "m.csv")),
+            "csv (legacy Queue)": lambda: _QueueMetricsLogger(file_name=os.path.join(tmp, "legacy.csv")),
+            "parquet": lambda: metrics_logger.ArrowMetricsLogger(file_name=os.path.join(tmp, "m.parquet")),
+            "histogram": lambda: metrics_logger.HistogramMetricsLogger(file_name=os.path.join(tmp, "m.hist")),
+        }
+        for name, make in loggers.items():
+            logger = make()
+            results[f"{name} log_metric"] = _per_sample_ns(
+                lambda i: logger.log_metric(0.5, "object", i, 4096, "full_random"), samples, threads
+            )
+            logger.close()
+
+    meter = MeterProvider().get_meter("benchmark")
+    lat = meter.create_histogram(name="ssiog.sample_lat", unit="ms")
+    results["otel record, dict per call"] = _per_sample_ns(
+        lambda i: lat.record(0.5, {"reader": "full_random"}), samples, threads
+    )
+    attributes = {"reader": "full_random"}
+    results["otel record, shared attributes"] = _per_sample_ns(
+        lambda i: lat.record(0.5, attributes), samples, threads
+    )
+    results["empty loop"] = _per_sample_ns(lambda i: None, samples, threads)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-sample metrics recording cost.")
+    parser.add_argument("--samples", type=int, default=1000000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    for name, ns in benchmark(args.samples, args.threads).items():
+        print(f"{name:36s} {ns:10.1f} ns/sample")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Microbenchmarks of the harness on generated local data, compared against
+the results stored in a baseline file.
+
+    python benchmark_suite.py
+    python benchmark_suite.py --only sampler reader_full_random --output results.json
+    python benchmark_suite.py --update-baseline
+
+Every benchmark runs in a forked process, so its peak RSS is its own. The
+run fails when a benchmark's throughput drops, or its CPU time per item or
+peak RSS grows, by more than the baseline thresholds.
+
+A fixed single-threaded calibration workload is timed with every run and
+stored with the baseline, and throughput and times are scaled by the ratio
+of the two before comparing, so a baseline recorded on a slower or faster
+host still applies. The CPU count is not calibrated: the threaded
+benchmarks warn when it differs.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow.fs as fs
+import torch.distributed as td
+
+import arguments
+import metrics_collector
+import metrics_logger
+import reader_pool
+import sampling
+import training
+
+# Relative changes tolerated against the baseline, overridable in the
+# baseline file, globally or per benchmark. The p99 of the iterations is
+# too noisy on shared machines to be checked unless a threshold is added.
+DEFAULT_THRESHOLDS = {
+    "items_per_s": 0.3,
+    "cpu_us_per_item": 0.3,
+    "peak_rss_mb": 0.2,
+}
+
+
+class Data(object):
+    """Local objects of random bytes and a sample selection over them."""
+    def __init__(self, root: str, objects: int = 16, object_size: int = 4 << 20, sample_size: int = 64 << 10):
+        self.root = root
+        self.sample_size = sample_size
+        self.names = []
+        rng = np.random.default_rng(0)
+        for i in range(objects):
+            name = os.path.join(root, f"object-{i:04d}")
+            with open(name, "wb") as f:
+                f.write(rng.bytes(object_size))
+            self.names.append(name)
+        self.sizes = [object_size] * objects
+        self.samples = sampling.select_samples(
+            self.names, self.sizes, sample_size, objects * object_size // sample_size, rng
+        )
+
+
+# Benchmarks are context managers over their data, yielding a callable that
+# runs one iteration and returns the number of items it processed.
+
+
+@contextlib.contextmanager
+def _sampler(data: Data):
+    names = [f"object-{i}" for i in range(100000)]
+    sizes = np.full(len(names), 64 << 20)
+    rng = np.random.default_rng(0)
+    yield lambda: len(sampling.select_samples(names, sizes, 1 << 20, 1000000, rng))
+
+
+def _reader(reader, **options):
+    @contextlib.contextmanager
+    def setup(data: Data):
+        filesystem = fs.LocalFileSystem()
+        yield lambda: sum(
+            1 for _ in reader(data.names, 0, 1, filesystem, data.sample_size, data.samples, **options)
+        )
+    return setup
+
+
+@contextlib.contextmanager
+def _queue_handoff(data: Data):
+    args = arguments.parse_args(
+        ["--prefix", data.root, "--steps", "200", "--batch-size", "64", "--background-threads", "4"]
+    )
+    readers = reader_pool.ReaderPool(args.background_threads)
+
+    def reader(object_names, thread_id, thread_count, filesystem, sample_size, samples):
+        for offset in range(args.steps * args.batch_size // thread_count + 1):
+            yield ("object", offset, 1)
+
+    try:
+        yield lambda: args.batch_size * sum(1 for _ in training.Epoch(reader, ["object"], None, [], args, readers=readers))
+    finally:
+        readers.close()
+
+
+@contextlib.contextmanager
+def _metrics_logger(data: Data):
+    file_name = os.path.join(data.root, "metrics_logger.csv")
+
+    def run():
+        logger = metrics_logger.AsyncMetricsLogger(file_name=file_name)
+        for i in range(200000):
+            logger.log_metric(0.5, "object", i, 4096, "full_random")
+        logger.close()
+        return 200000
+    yield run
+
+
+def _metrics_file(data: Data) -> str:
+    """Logs 500000 samples to a CSV metrics file, once per data directory."""
+    file_name = os.path.join(data.root, "metrics_collector.csv")
+    if not os.path.exists(file_name):
+        logger = metrics_logger.AsyncMetricsLogger(file_name=file_name)
+        for i in range(500000):
+            logger.log_metric(float(i % 1000), "object", i, 4096, "full_random")
+        logger.close()
+    return file_name
+
+
+@contextlib.contextmanager
+def _metrics_collector(data: Data):
+    file_name = _metrics_file(data)
+    yield lambda: len(metrics_collector.analyze_metrics(file_name))
+
+
+@contextlib.contextmanager
+def _metrics_stream(data: Data):
+    file_name = _metrics_file(data)
+    yield lambda: metrics_collector.stream_metrics(file_name).count
+
+
+@contextlib.contextmanager
+def _metrics_report(data: Data):
+    file_name = _metrics_file(data)
+    yield lambda: sum(row["samples"] for row in metrics_collector.report_metrics(file_name, 0.1)["overall"])
+
+
+BENCHMARKS = {
+    "sampler": _sampler,
+    "reader_sequential": _reader(training.sequential_reader),
+    "reader_file_random": _reader(training.file_random_reader),
+    "reader_file_random_ranged": _reader(training.file_random_reader, mode="ranged"),
+    "reader_full_random": _reader(training.full_random_reader),
+    "queue_handoff": _queue_handoff,
+    "metrics_logger": _metrics_logger,
+    "metrics_collector": _metrics_collector,
+    "metrics_stream": _metrics_stream,
+    "metrics_report": _metrics_report,
+}
+
+# Metrics measured as durations, which scale inversely with the host speed.
+_TIMES = ("p50_ms", "p99_ms", "cpu_us_per_item")
+
+
+def measure(name: str, data: Data, repeats: int, min_time: float = 0) -> dict:
+    """
+    Runs a benchmark once to warm up, then at least `repeats` times and for
+    at least `min_time` seconds.
+    """
+    with BENCHMARKS[name](data) as run:
+        run()
+        walls = []
+        items = 0
+        cpu_start = time.process_time()
+        while len(walls) < repeats or sum(walls) < min_time * 1e9:
+            start = time.perf_counter_ns()
+            items += run()
+            walls.append(time.perf_counter_ns() - start)
+        cpu_s = time.process_time() - cpu_start
+    return {
+        "items": items,
+        "items_per_s": items / (sum(walls) / 1e9),
+        "p50_ms": float(np.percentile(walls, 50)) / 1e6,
+        "p99_ms": float(np.percentile(walls, 99)) / 1e6,
+        "cpu_s": cpu_s,
+        "cpu_us_per_item": cpu_s * 1e6 / items,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _child(name: str, data: Data, repeats: int, min_time: float, conn):
+    try:
+        td.init_process_group(
+            "gloo", init_method=f"file://{os.path.join(data.root, name + '.store')}", rank=0, world_size=1
+        )
+        conn.send(measure(name, data, repeats, min_time))
+    except Exception as e:
+        conn.send(f"{type(e).__name__}: {e}")
+    finally:
+        conn.close()
+
+
+def run_isolated(name: str, data: Data, repeats: int, min_time: float = 0) -> dict:
+    """Measures a benchmark in a forked process."""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    p = ctx.Process(target=_child, args=(name, data, repeats, min_time, child))
+    p.start()
+    child.close()
+    result = parent.recv()
+    p.join()
+    if isinstance(result, str):
+        raise Exception(f"Benchmark {name} failed: {result}")
+    return result
+
+
+def calibrate(repeats: int = 5) -> float:
+    """
+    Returns the fastest of `repeats` runs, in seconds, of a fixed
+    single-threaded workload of Python loops and NumPy sorting.
+    """
+    values = np.random.default_rng(0).random(1 << 20)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        sum(i * i for i in range(1 << 20))
+        np.sort(values)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(results: dict, baseline: dict, calibration_s: float = None) -> list[str]:
+    """
+    Returns the regressions of `results` against `baseline`, one message
+    each. With the calibration time of this host and of the baseline's, the
+    baseline throughput and times are first scaled to this host's speed.
+    """
+    speed = 1.0
+    if calibration_s and baseline.get("calibration_s"):
+        speed = baseline["calibration_s"] / calibration_s
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            continue
+        limits = {**thresholds, **base.get("thresholds", {})}
+        for metric, threshold in limits.items():
+            if metric not in base:
+                continue
+            expected = base[metric]
+            if metric == "items_per_s":
+                expected *= speed
+            elif metric in _TIMES:
+                expected /= speed
+            # Throughput regresses downwards, everything else upwards.
+            if metric == "items_per_s":
+                regressed = result[metric] < expected * (1 - threshold)
+            else:
+                regressed = result[metric] > expected * (1 + threshold)
+            if regressed:
+                scaled = "" if speed == 1.0 else f", scaled x{speed:.2f} for this host"
+                regressions.append(
+                    f"{name}: {metric} {result[metric]:.4g} vs baseline {expected:.4g} "
+                    f"(threshold {threshold:.0%}{scaled})"
+                )
+    return regressions
+
+
+def _host() -> dict:
+    return {"machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the harness microbenchmarks against a baseline.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=2.0, help="Minimum seconds measured per benchmark.")
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json"),
+    )
+    parser.add_argument("--output", type=str, default="", help="Also write the results to this JSON file.")
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the results as the baseline instead of comparing against it.",
+    )
+    args = parser.parse_args()
+
+    # Only the results are printed, the harness logs would drown them.
+    logging.disable(logging.INFO)
+    calibration_s = calibrate()
+    print(f"Calibration: {calibration_s * 1000:.1f} ms")
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        data = Data(root)
+        print(f"{'benchmark':26s} {'items/s':>12s} {'p50 ms':>9s} {'p99 ms':>9s} {'CPU us/item':>12s} {'peak RSS MB':>12s}")
+        for name in args.only:
+            r = results[name] = run_isolated(name, data, args.repeats, args.min_time)
+            print(
+                f"{name:26s} {r['items_per_s']:12.0f} {r['p50_ms']:9.2f} {r['p99_ms']:9.2f} "
+                f"{r['cpu_us_per_item']:12.3f} {r['peak_rss_mb']:12.1f}"
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"host": _host(), "calibration_s": calibration_s, "benchmarks": results}, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline["host"] = _host()
+        baseline["calibration_s"] = calibration_s
+        baseline.setdefault("thresholds", DEFAULT_THRESHOLDS)
+        benchmarks = baseline.setdefault("benchmarks", {})
+        for name, r in results.items():
+            # Keeps the per-benchmark threshold overrides.
+            benchmarks[name] = {**benchmarks.get(name, {}), **r}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Updated {args.baseline}.")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create it.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("host", {}).get("cpus") != _host()["cpus"]:
+        print(
+            f"Warning: the baseline was measured with {baseline.get('host', {}).get('cpus')} CPUs, the"
+            " threaded benchmarks are not calibrated for the difference."
+        )
+    if "calibration_s" in baseline:
+        print(f"Baseline calibration: {baseline['calibration_s'] * 1000:.1f} ms")
+    regressions = compare(results, baseline, calibration_s)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
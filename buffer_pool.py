@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import contextlib
+import threading
+
+# Per thread, what to run before blocking on an exhausted pool.
+_local = threading.local()
+
+
+class PooledBuffer(bytearray):
+    """A preallocated sample buffer which knows the pool it belongs to."""
+    __slots__ = ("pool",)
+
+
+class BufferPool:
+    """
+    A fixed set of preallocated sample buffers shared by the reader threads.
+
+    Readers read into a buffer with `readinto` and hand a memoryview of it to
+    the step loop, which releases it once the sample is accounted for.
+    `acquire` blocks while all buffers are in use; each time it has to wait
+    counts as an exhaustion. Before blocking it runs the calling thread's
+    `before_wait` hook, which hands on the buffers the thread still holds.
+    """
+    def __init__(self, count, size, on_exhausted=None):
+        self.count = count
+        self.size = size
+        self.exhausted = 0
+        self._on_exhausted = on_exhausted
+        self._free = collections.deque()
+        self._cond = threading.Condition()
+        for _ in range(count):
+            buf = PooledBuffer(size)
+            buf.pool = self
+            self._free.append(buf)
+
+    def acquire(self) -> PooledBuffer:
+        with self._cond:
+            if self._free:
+                return self._free.pop()
+        hook = getattr(_local, "hook", None)
+        if hook is not None:
+            hook()
+        with self._cond:
+            if not self._free:
+                self.exhausted += 1
+                if self._on_exhausted:
+                    self._on_exhausted()
+                while not self._free:
+                    self._cond.wait()
+            return self._free.pop()
+
+    def release(self, buf: PooledBuffer):
+        with self._cond:
+            self._free.append(buf)
+            self._cond.notify()
+
+    def available(self) -> int:
+        return len(self._free)
+
+
+@contextlib.contextmanager
+def before_wait(hook):
+    """
+    Runs `hook` whenever this thread is about to block in `acquire`, e.g. to
+    flush a partial batch whose buffers the consumer would otherwise never
+    see, and release.
+    """
+    previous = getattr(_local, "hook", None)
+    _local.hook = hook
+    try:
+        yield
+    finally:
+        _local.hook = previous
+
+
+def release(chunk):
+    """
+    Returns the buffer behind a sample chunk to its pool. Chunks which are
+    not views of a pooled buffer are ignored.
+    """
+    if isinstance(chunk, memoryview) and isinstance(chunk.obj, PooledBuffer):
+        chunk.obj.pool.release(chunk.obj)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Coalescing of nearby sample reads into larger range reads.
+"""
+
+from typing import Iterable, Iterator
+
+
+class Range(object):
+    """A merged read of `length` bytes at `start`, covering `offsets`."""
+    __slots__ = ("name", "start", "length", "offsets")
+
+    def __init__(self, name: str, start: int, length: int, offsets: list[int]):
+        self.name = name
+        self.start = start
+        self.length = length
+        self.offsets = offsets
+
+    def __eq__(self, other):
+        return (self.name, self.start, self.length, self.offsets) == (
+            other.name, other.start, other.length, other.offsets
+        )
+
+    def __repr__(self):
+        return f"Range({self.name!r}, {self.start}, {self.length}, {self.offsets})"
+
+
+def coalesce(
+    samples: Iterable[tuple[str, int]], sample_size: int, max_gap: int, max_size: int
+) -> list[Range]:
+    """
+    Groups (name, offset) samples by object and merges them into ranges.
+
+    A sample joins the current range of its object if it starts at most
+    `max_gap` bytes after the range ends and the merged range stays within
+    `max_size` bytes. A single sample always gets a range, even if it is
+    larger than `max_size`. Duplicated samples are kept, each one is served
+    from the same range.
+    """
+    ranges = []
+    current = None
+    for name, offset in sorted(samples):
+        end = offset + sample_size
+        if (
+            current is not None
+            and current.name == name
+            and offset - (current.start + current.length) <= max_gap
+            and max(end, current.start + current.length) - current.start <= max_size
+        ):
+            current.length = max(end, current.start + current.length) - current.start
+            current.offsets.append(offset)
+            continue
+        current = Range(name, offset, sample_size, [offset])
+        ranges.append(current)
+    return ranges
+
+
+def windows(samples: Iterable, size: int) -> Iterator[list]:
+    """Splits the samples into consecutive lists of up to `size` samples."""
+    window = []
+    for sample in samples:
+        window.append(sample)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
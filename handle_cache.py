@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Open file handles shared by the reader threads.
+"""
+
+import collections
+import contextlib
+import threading
+
+import pyarrow.fs as fs
+
+
+class _Handle(object):
+    """
+    An open object. read_at is positional and shared by every thread;
+    readinto needs a position, so each thread reading into buffers gets
+    its own stream of the object rather than sharing one under a lock.
+    """
+    __slots__ = ("name", "file", "lock", "refs", "evicted", "streams", "_local")
+
+    def __init__(self, name: str, file):
+        self.name = name
+        self.file = file
+        # Guards the list of streams.
+        self.lock = threading.Lock()
+        self.refs = 0
+        self.evicted = False
+        self.streams = []
+        self._local = threading.local()
+
+    def stream(self, filesystem: fs.FileSystem):
+        """Returns this thread's stream of the object, opening it if needed."""
+        f = getattr(self._local, "file", None)
+        if f is None:
+            f = self._local.file = filesystem.open_input_file(self.name)
+            with self.lock:
+                self.streams.append(f)
+        return f
+
+    def read_at(self, nbytes: int, offset: int) -> bytes:
+        return self.file.read_at(nbytes, offset)
+
+    def readinto_at(self, buf, offset: int) -> int:
+        """
+        Reads into `buf` at `offset` through this thread's stream, returns the
+        number of bytes read. The stream must have been opened by `open`.
+        """
+        f = self._local.file
+        f.seek(offset)
+        return f.readinto(buf)
+
+    def close(self):
+        self.file.close()
+        for f in self.streams:
+            f.close()
+
+
+class HandleCache(object):
+    """
+    Handles of the objects of a filesystem, opened on first access and
+    shared by all reader threads.
+
+    At most `capacity` handles are kept, the least recently used one is
+    closed first (0 keeps every handle). Threads reading into buffers also
+    keep a stream per handle. A handle evicted while a read is
+    using it is closed when that read completes.
+    """
+    def __init__(self, filesystem: fs.FileSystem, capacity: int = 0):
+        self.filesystem = filesystem
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._handles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def open(self, name: str, readinto: bool = False):
+        """
+        Yields the handle of an object, opening it on a miss, for reads
+        timed apart from the open. With readinto, this thread's stream for
+        `readinto_at` is opened too.
+        """
+        handle = self._acquire(name)
+        try:
+            if readinto:
+                handle.stream(self.filesystem)
+            yield handle
+        finally:
+            self._release(handle)
+
+    def read_at(self, name: str, nbytes: int, offset: int) -> bytes:
+        with self.open(name) as handle:
+            return handle.read_at(nbytes, offset)
+
+    def readinto_at(self, name: str, buf, offset: int) -> int:
+        """Reads into `buf` at `offset`, returns the number of bytes read."""
+        with self.open(name, readinto=True) as handle:
+            return handle.readinto_at(buf, offset)
+
+    def size(self, name: str) -> int:
+        handle = self._acquire(name)
+        try:
+            return handle.file.size()
+        finally:
+            self._release(handle)
+
+    def __len__(self):
+        return len(self._handles)
+
+    def close(self):
+        """Closes the cached handles, the ones in use when released."""
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+            for handle in handles:
+                handle.evicted = True
+            idle = [handle for handle in handles if handle.refs == 0]
+        for handle in idle:
+            handle.close()
+
+    def _acquire(self, name: str) -> _Handle:
+        with self._lock:
+            handle = self._handles.get(name)
+            if handle is not None:
+                self.hits += 1
+                self._handles.move_to_end(name)
+                handle.refs += 1
+                return handle
+            self.misses += 1
+        # Open outside the lock, other threads keep reading meanwhile.
+        file = self.filesystem.open_input_file(name)
+        evicted = []
+        with self._lock:
+            handle = self._handles.get(name)
+            if handle is None:
+                handle = _Handle(name, file)
+                self._handles[name] = handle
+                file = None
+            else:
+                # Another thread opened it first.
+                self._handles.move_to_end(name)
+            handle.refs += 1
+            while self.capacity > 0 and len(self._handles) > self.capacity:
+                _, old = self._handles.popitem(last=False)
+                old.evicted = True
+                self.evictions += 1
+                if old.refs == 0:
+                    evicted.append(old)
+        if file is not None:
+            file.close()
+        for old in evicted:
+            old.close()
+        return handle
+
+    def _release(self, handle: _Handle):
+        with self._lock:
+            handle.refs -= 1
+            close = handle.evicted and handle.refs == 0
+        if close:
+            handle.close()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Log-bucketed latency histograms, in the spirit of HdrHistogram.
+
+Values are counted in buckets whose bounds grow geometrically, so every
+quantile is reported within a fixed relative error while memory stays
+constant, whatever the number of recorded values.
+"""
+
+import io
+import math
+import threading
+
+import numpy as np
+import torch
+import torch.distributed as td
+
+
+class LogHistogram:
+    """
+    Counts values in buckets `(min_value * gamma**(i-1), min_value * gamma**i]`
+    with `gamma = (1 + relative_error) / (1 - relative_error)`. Bucket 0 holds
+    the values up to `min_value` and the last bucket everything from
+    `max_value` up. Quantiles are within `relative_error` of the exact value
+    for values between `min_value` and `max_value`.
+    """
+    def __init__(self, relative_error=0.01, min_value=1e-3, max_value=1e7, counts=None, total=0.0):
+        self.relative_error = relative_error
+        self.min_value = min_value
+        self.max_value = max_value
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets = math.ceil(math.log(max_value / min_value) / self._log_gamma) + 1
+        self._log_min = math.log(min_value)
+        self._scale = 1 / self._log_gamma
+        # A list rather than an array: incrementing one item is faster.
+        self.counts = [0] * self.buckets if counts is None else list(counts)
+        if len(self.counts) != self.buckets:
+            raise ValueError(f"Expected {self.buckets} bucket counts, got {len(self.counts)}.")
+        self.total = total
+
+    def record(self, value: float):
+        if value <= self.min_value:
+            i = 0
+        else:
+            i = math.ceil((math.log(value) - self._log_min) * self._scale)
+            if i >= self.buckets:
+                i = self.buckets - 1
+        self.counts[i] += 1
+        self.total += value
+
+    def bucket_indices(self, values: np.ndarray) -> np.ndarray:
+        """Returns the bucket of each value of an array."""
+        values = np.asarray(values, dtype=np.float64)
+        above = values > self.min_value
+        indices = np.zeros(len(values), dtype=np.int64)
+        indices[above] = np.ceil((np.log(values[above]) - self._log_min) * self._scale)
+        np.minimum(indices, self.buckets - 1, out=indices)
+        return indices
+
+    def record_many(self, values: np.ndarray):
+        """Records an array of values at once."""
+        values = np.asarray(values, dtype=np.float64)
+        indices = self.bucket_indices(values)
+        counts = np.asarray(self.counts, dtype=np.int64) + np.bincount(indices, minlength=self.buckets)
+        self.counts = counts.tolist()
+        self.total += float(values.sum())
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def mean(self) -> float:
+        count = self.count
+        return self.total / count if count else 0.0
+
+    def _empty(self, counts=None, total=0.0) -> "LogHistogram":
+        return LogHistogram(self.relative_error, self.min_value, self.max_value, counts, total)
+
+    def _check_compatible(self, other: "LogHistogram"):
+        if (self.relative_error, self.min_value, self.max_value) != (
+            other.relative_error, other.min_value, other.max_value
+        ):
+            raise ValueError("Histograms with different buckets cannot be combined.")
+
+    def merge(self, other: "LogHistogram"):
+        """Adds the counts of another histogram with the same buckets."""
+        self._check_compatible(other)
+        self.counts = (np.asarray(self.counts, dtype=np.int64) + np.asarray(other.counts, dtype=np.int64)).tolist()
+        self.total += other.total
+
+    def delta(self, previous: "LogHistogram") -> "LogHistogram":
+        """Returns the values recorded since `previous`, an earlier copy of this histogram."""
+        self._check_compatible(previous)
+        counts = np.asarray(self.counts, dtype=np.int64) - np.asarray(previous.counts, dtype=np.int64)
+        return self._empty(counts.tolist(), self.total - previous.total)
+
+    def copy(self) -> "LogHistogram":
+        # list() copies the counts in one step, while other threads may record.
+        return self._empty(list(self.counts), self.total)
+
+    def value_at(self, i: int) -> float:
+        """Returns the representative value of bucket i."""
+        if i == 0:
+            return self.min_value
+        return 2 * self.min_value * self._gamma**i / (self._gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Returns the q-quantile (0 <= q <= 1), 0 if the histogram is empty."""
+        return float(self.quantiles_of(np.asarray([self.counts], dtype=np.int64), q)[0])
+
+    def quantiles_of(self, counts: np.ndarray, q: float) -> np.ndarray:
+        """
+        Returns the q-quantile of each row of a 2-D array of bucket counts,
+        laid out as this histogram's, and 0 for the empty rows.
+        """
+        cumulative = np.cumsum(counts, axis=1)
+        total = cumulative[:, -1]
+        rank = q * (total - 1)
+        indices = (cumulative <= rank[:, None]).sum(axis=1)
+        values = 2 * self.min_value * self._gamma ** indices.astype(np.float64) / (self._gamma + 1)
+        values[indices == 0] = self.min_value
+        values[total == 0] = 0.0
+        return values
+
+    def percentiles(self, ps=(50, 90, 99, 99.9)) -> dict[float, float]:
+        return {p: self.quantile(p / 100) for p in ps}
+
+    def to_bytes(self) -> bytes:
+        """Serializes the histogram, storing only the non-empty buckets."""
+        counts = np.asarray(self.counts, dtype=np.int64)
+        indices = np.flatnonzero(counts).astype(np.uint32)
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf,
+            params=np.array([self.relative_error, self.min_value, self.max_value, self.total]),
+            indices=indices,
+            counts=counts[indices],
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LogHistogram":
+        with np.load(io.BytesIO(data)) as f:
+            relative_error, min_value, max_value, total = f["params"].tolist()
+            h = cls(relative_error, min_value, max_value, total=total)
+            counts = np.zeros(h.buckets, dtype=np.int64)
+            counts[f["indices"]] = f["counts"]
+        h.counts = counts.tolist()
+        return h
+
+
+class ThreadHistograms:
+    """
+    One histogram per recording thread, so recording takes no lock.
+
+    A snapshot merges copies of all of them; the values recorded between two
+    snapshots are their `delta`, so nothing is reset under a recording thread.
+    """
+    def __init__(self, relative_error=0.01, min_value=1e-3, max_value=1e7):
+        self._params = (relative_error, min_value, max_value)
+        self._local = threading.local()
+        self._histograms = []
+        self._lock = threading.Lock()
+
+    def record(self, value: float):
+        try:
+            h = self._local.histogram
+        except AttributeError:
+            h = self._local.histogram = LogHistogram(*self._params)
+            with self._lock:
+                self._histograms.append(h)
+        h.record(value)
+
+    def snapshot(self) -> LogHistogram:
+        merged = LogHistogram(*self._params)
+        with self._lock:
+            histograms = list(self._histograms)
+        for h in histograms:
+            merged.merge(h.copy())
+        return merged
+
+
+def write(path: str, histogram: LogHistogram):
+    with open(path, "wb") as f:
+        f.write(histogram.to_bytes())
+
+
+def read(path: str) -> LogHistogram:
+    with open(path, "rb") as f:
+        return LogHistogram.from_bytes(f.read())
+
+
+def all_reduce(histogram: LogHistogram) -> LogHistogram:
+    """
+    Returns the histogram merged across all ranks. Every rank must call it
+    with histograms of the same buckets.
+    """
+    counts = torch.tensor(histogram.counts, dtype=torch.int64)
+    td.all_reduce(counts, op=td.ReduceOp.SUM)
+    total = torch.tensor([histogram.total], dtype=torch.float64)
+    td.all_reduce(total, op=td.ReduceOp.SUM)
+    return histogram._empty(counts.tolist(), total.item())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Persistent dataset manifests: object names, sizes and generations listed
+once and stored as Parquet, so later runs skip listing and per-object
+metadata requests.
+"""
+
+import hashlib
+import logging
+import os
+
+import fsspec
+import pyarrow as pa
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_KEY = b"ssiog.listing_digest"
+_PREFIX_KEY = b"ssiog.prefix"
+
+
+class Manifest(object):
+    """The names, sizes and generations of the objects under a prefix."""
+    def __init__(self, prefix: str, names: list[str], sizes: list[int], generations: list[str]):
+        self.prefix = prefix
+        self.names = names
+        self.sizes = sizes
+        self.generations = generations
+
+    def digest(self) -> str:
+        """Returns a digest of the listing, which changes if any object does."""
+        h = hashlib.blake2b(digest_size=16)
+        for name, size, generation in sorted(zip(self.names, self.sizes, self.generations)):
+            h.update(f"{name}\0{size}\0{generation}\n".encode())
+        return h.hexdigest()
+
+
+def _listing_filesystem(prefix: str):
+    if prefix.startswith("gs://"):
+        return fsspec.filesystem("gcs"), prefix.removeprefix("gs://")
+    if prefix.startswith("gcsfs://"):
+        return fsspec.filesystem("gcs"), prefix.removeprefix("gcsfs://")
+    return fsspec.filesystem("local"), prefix
+
+
+def list_prefix(prefix: str) -> Manifest:
+    """
+    Lists the objects under a prefix with their sizes, in one listing call.
+
+    Directories are skipped. The generation is the GCS object generation,
+    or the modification time for local files.
+
+    The listing covers one level under a delimiter, and it is one paged
+    sequence that cannot be split without knowing its key ranges. Prefixes
+    are listed in parallel instead, and stored manifests avoid listing again.
+    """
+    listing_fs, path = _listing_filesystem(prefix)
+    entries = [e for e in listing_fs.ls(path, detail=True) if e.get("type", "file") == "file"]
+    return Manifest(
+        prefix,
+        [e["name"] for e in entries],
+        [int(e["size"]) for e in entries],
+        [str(e.get("generation", e.get("mtime", ""))) for e in entries],
+    )
+
+
+def manifest_path(manifest_dir: str, prefix: str) -> str:
+    """Returns where the manifest of a prefix is stored under manifest_dir."""
+    key = hashlib.blake2b(prefix.encode(), digest_size=8).hexdigest()
+    return f"{manifest_dir.rstrip('/')}/manifest-{key}.parquet"
+
+
+def write(path: str, manifest: Manifest):
+    """Writes a manifest as a Parquet file, local or any pyarrow URI."""
+    table = pa.table(
+        {
+            "name": pa.array(manifest.names, type=pa.string()),
+            "size": pa.array(manifest.sizes, type=pa.int64()),
+            "generation": pa.array(manifest.generations, type=pa.string()),
+        }
+    ).replace_schema_metadata(
+        {_PREFIX_KEY: manifest.prefix.encode(), _DIGEST_KEY: manifest.digest().encode()}
+    )
+    filesystem, p = fs.FileSystem.from_uri(_uri(path))
+    filesystem.create_dir(os.path.dirname(p), recursive=True)
+    # Write then move, so concurrent readers never see a partial manifest.
+    tmp = f"{p}.tmp-{os.getpid()}"
+    pq.write_table(table, tmp, filesystem=filesystem)
+    filesystem.move(tmp, p)
+
+
+def read(path: str):
+    """
+    Reads a manifest and the listing digest stored with it. Returns None if
+    the file does not exist.
+    """
+    filesystem, p = fs.FileSystem.from_uri(_uri(path))
+    if filesystem.get_file_info(p).type == fs.FileType.NotFound:
+        return None
+    table = pq.read_table(p, filesystem=filesystem)
+    metadata = table.schema.metadata or {}
+    manifest = Manifest(
+        metadata.get(_PREFIX_KEY, b"").decode(),
+        table.column("name").to_pylist(),
+        table.column("size").to_pylist(),
+        table.column("generation").to_pylist(),
+    )
+    return manifest, metadata.get(_DIGEST_KEY, b"").decode()
+
+
+def load(manifest_dir: str, prefix: str, refresh: str = "never") -> Manifest:
+    """
+    Returns the manifest of a prefix, from manifest_dir when possible.
+
+    refresh is 'never' (trust the stored manifest), 'validate' (list again
+    and rebuild if the listing digest changed) or 'always'. New or rebuilt
+    manifests are written back to manifest_dir.
+    """
+    path = manifest_path(manifest_dir, prefix)
+    stored = None if refresh == "always" else read(path)
+    if stored is not None and refresh == "never":
+        logger.info(f"Loaded manifest of {prefix} from {path}.")
+        return stored[0]
+
+    listed = list_prefix(prefix)
+    if stored is not None and stored[1] == listed.digest():
+        logger.info(f"Manifest of {prefix} at {path} is up to date.")
+        return stored[0]
+    write(path, listed)
+    logger.info(f"Wrote manifest of {prefix} ({len(listed.names)} objects) to {path}.")
+    return listed
+
+
+def _uri(path: str) -> str:
+    if "://" in path:
+        return path
+    return os.path.abspath(path)
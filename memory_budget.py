@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import threading
+
+
+class MemoryBudget:
+    """
+    A byte budget shared by the reader threads of a process.
+
+    Readers reserve the bytes they are about to buffer and block while the
+    budget is exhausted. A limit of 0 disables the budget.
+    """
+    def __init__(self, limit=0):
+        self.limit = limit
+        self.in_use = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def reserve(self, nbytes):
+        """
+        Reserves `nbytes` for the duration of the context. Requests larger
+        than the whole budget are clamped to it, so they wait for all other
+        readers instead of blocking forever.
+        """
+        if self.limit > 0:
+            nbytes = min(nbytes, self.limit)
+        with self._cond:
+            while self.limit > 0 and self.in_use + nbytes > self.limit:
+                self._cond.wait()
+            self.in_use += nbytes
+            self.peak = max(self.peak, self.in_use)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_use -= nbytes
+                self._cond.notify_all()
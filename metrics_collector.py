@@ -19,10 +19,18 @@ import gcsfs
 import argparse
 import logging
 import os
+import math
 import psutil
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
+import histogram
+import metrics_report
+
 # Initialize the global logger with basic INFO level log.
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
 logger = logging.getLogger(__name__)
@@ -43,22 +51,39 @@ def process_csv(file, fs):
     with fs.open(file, 'r') as f:
         df = pd.read_csv(f)
         if not df.empty:
-            return df['timestamp'][0], df['timestamp'][len(df['timestamp']) - 1], df
+            # Rows are grouped per logging thread, not in timestamp order.
+            return df['timestamp'].min(), df['timestamp'].max(), df
         else:
             return None, None, df
 
-            
+def process_arrow(file, fs):
+    """Loads a Parquet or Arrow IPC metrics file written by ArrowMetricsLogger."""
+    with fs.open(file, 'rb') as f:
+        if file.endswith(".parquet"):
+            table = pq.read_table(f)
+        else:
+            table = pa.ipc.open_file(f).read_all()
+    df = table.to_pandas()
+    if df.empty:
+        return None, None, df
+    return df['timestamp'].min(), df['timestamp'].max(), df
+
+def process_file(file, fs):
+    if file.endswith(".csv"):
+        return process_csv(file, fs)
+    return process_arrow(file, fs)
+
 
 def analyze_metrics(path, timestamp_filter=True):
     """
-    Analyzes metrics from CSV files in a Google Cloud Storage bucket or local filesystem.
+    Analyzes metrics from CSV, Parquet or Arrow IPC files in a Google Cloud Storage bucket or local filesystem.
 
     Args:
-        path (str): The path to the bucket or local containing CSV files, e.g., "gs://my-bucket/path/to/files/*.csv", "/local/*.csv"
+        path (str): The path to the bucket or local containing metrics files, e.g., "gs://my-bucket/path/to/files/*.csv", "/local/*.parquet"
 
     Returns:
         A pandas DataFrame containing the combined latency data, or None if no files are found. Also, timebased filtering which selects
-        common entry among all the CSV files if timestamp_filter is set to True.
+        common entry among all the metrics files if timestamp_filter is set to True.
     """
     try:
         if path.startswith("gs://"): # if gcs path
@@ -66,20 +91,20 @@ def analyze_metrics(path, timestamp_filter=True):
         else: # otherwise assume it a local path
             fs = fsspec.filesystem("local")
         
-        # Find all CSV files in the path using glob-like pattern matching.
-        csv_files = list(fs.glob(path))
-        if not csv_files:
+        # Find all metrics files in the path using glob-like pattern matching.
+        metric_files = list(fs.glob(path))
+        if not metric_files:
             return None
         
-        logger.info(f"Total number of CSV files: {len(csv_files)}")
+        logger.info(f"Total number of metrics files: {len(metric_files)}")
         systemMemory = get_system_memory()
         logger.info(f"Total system memory: {systemMemory[0]} MiB" )
         logger.info(f"Used system memory: {systemMemory[1]} MiB")
         logger.info(f"Free system memory: {systemMemory[2]} MiB")
-        logger.info(f"Memory usage by process before loading CSV files: {get_memory_usage()} MiB")    
+        logger.info(f"Memory usage by process before loading metrics files: {get_memory_usage()} MiB")    
 
         with ThreadPoolExecutor() as pool:
-            results = list(tqdm(pool.map(lambda file: process_csv(file, fs), csv_files), total=len(csv_files)))
+            results = list(tqdm(pool.map(lambda file: process_file(file, fs), metric_files), total=len(metric_files)))
             
         start_timestamps = []
         end_timestamps = []        
@@ -91,7 +116,7 @@ def analyze_metrics(path, timestamp_filter=True):
             all_data.append(df)
         
         combined_df = pd.concat(all_data)    
-        logger.info(f"Memory usage by process after loading CSV files: {get_memory_usage()} MiB")    
+        logger.info(f"Memory usage by process after loading metrics files: {get_memory_usage()} MiB")    
         
         if not start_timestamps or not end_timestamps:
             return None
@@ -113,6 +138,121 @@ def analyze_metrics(path, timestamp_filter=True):
         logger.error(f"Error in analyzing metrics: {e}")
         return None
 
+def _file_format(file):
+    if file.endswith(".csv"):
+        return "csv"
+    if file.endswith(".parquet"):
+        return "parquet"
+    if file.endswith(".hist"):
+        return "histogram"
+    return "ipc"
+
+def _parquet_time_range(file, fs):
+    """Returns the timestamp range of a Parquet file from its statistics, None if missing."""
+    with fs.open(file, 'rb') as f:
+        metadata = pq.ParquetFile(f).metadata
+    column = metadata.schema.names.index("timestamp")
+    start, end = math.inf, -math.inf
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(column).statistics
+        if stats is None or not stats.has_min_max:
+            return None
+        start, end = min(start, stats.min), max(end, stats.max)
+    return start, end
+
+def time_range(file, fs):
+    """
+    Returns the (first, last) timestamp of a metrics file, scanning only the
+    timestamp column, or from the row group statistics of Parquet files.
+    """
+    fmt = _file_format(file)
+    if fmt == "parquet":
+        stats_range = _parquet_time_range(file, fs)
+        if stats_range is not None:
+            return stats_range
+    start, end = math.inf, -math.inf
+    for batch in ds.dataset(file, format=fmt, filesystem=fs).to_batches(columns=["timestamp"]):
+        if batch.num_rows:
+            min_max = pc.min_max(batch.column(0))
+            start, end = min(start, min_max["min"].as_py()), max(end, min_max["max"].as_py())
+    if start > end:
+        return None
+    return start, end
+
+def stream_metrics(path, timestamp_filter=True, relative_error=0.01, batch_size=1 << 18):
+    """
+    Streams the sample latencies of the metrics files matching `path` into a
+    log-bucketed histogram, in bounded memory whatever the size of the run.
+
+    CSV, Parquet and Arrow IPC files are scanned as pyarrow datasets, reading
+    only the timestamp and latency columns. If timestamp_filter is set, the
+    window common to all the files is pushed down into the scan, so Parquet
+    row groups outside of it are skipped. Histogram files (.hist) are merged
+    as they are, they carry no timestamps to filter on.
+
+    Returns the histogram, or None if no samples were found or a histogram
+    file has other buckets than `relative_error`.
+    """
+    fs = gcsfs.GCSFileSystem() if path.startswith("gs://") else fsspec.filesystem("local")
+    files = list(fs.glob(path))
+    if not files:
+        return None
+    logger.info(f"Streaming {len(files)} metrics files.")
+
+    result = histogram.LogHistogram(relative_error)
+    by_format = {}
+    for file in files:
+        by_format.setdefault(_file_format(file), []).append(file)
+    for file in by_format.pop("histogram", []):
+        with fs.open(file, 'rb') as f:
+            other = histogram.LogHistogram.from_bytes(f.read())
+        try:
+            result.merge(other)
+        except ValueError:
+            logger.error(
+                f"{file} was recorded with a relative error of {other.relative_error}, not {relative_error}."
+                f" Rerun with --relative-error {other.relative_error}."
+            )
+            return None
+
+    window = None
+    if timestamp_filter and by_format:
+        scanned = [file for fmt_files in by_format.values() for file in fmt_files]
+        with ThreadPoolExecutor() as pool:
+            ranges = [r for r in pool.map(lambda file: time_range(file, fs), scanned) if r is not None]
+        if not ranges:
+            return None
+        window = (ds.field("timestamp") >= max(r[0] for r in ranges)) & (ds.field("timestamp") <= min(r[1] for r in ranges))
+
+    for fmt, fmt_files in by_format.items():
+        dataset = ds.dataset(fmt_files, format=fmt, filesystem=fs)
+        # Limit the read-ahead, so memory does not grow with the number of files.
+        batches = dataset.to_batches(
+            columns=["sample_lat"], filter=window, batch_size=batch_size, batch_readahead=2, fragment_readahead=1
+        )
+        for batch in tqdm(batches):
+            result.record_many(batch.column(0).to_numpy(zero_copy_only=False))
+        logger.info(f"Memory usage by process after streaming {fmt} files: {get_memory_usage()} MiB")
+
+    if result.count == 0:
+        return None
+    return result
+
+def report_metrics(path, window, timestamp_filter=False, relative_error=0.01):
+    """
+    Builds the time-windowed report of the metrics files matching `path`,
+    see metrics_report. If timestamp_filter is set, only the window common
+    to all the files is reported. Returns it as a dict, or None if no
+    samples were found.
+    """
+    fs = gcsfs.GCSFileSystem() if path.startswith("gs://") else fsspec.filesystem("local")
+    files = sorted(f for f in fs.glob(path) if _file_format(f) != "histogram")
+    if not files:
+        return None
+    logger.info(f"Building a {window} s windowed report of {len(files)} metrics files.")
+    report = metrics_report.build(files, fs, window, relative_error, time_range, timestamp_filter)
+    return None if report is None else report.to_dict()
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Analyze metrics from GCS")
     
@@ -126,6 +266,30 @@ def parse_args():
         "--timestamp-filter",
         action="store_true",
         help="Filter by common timestamps")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Stream the files into a histogram sketch instead of loading them all, in bounded memory")
+    parser.add_argument(
+        "--relative-error",
+        type=float,
+        default=0.01,
+        help="Relative error of the percentiles computed with --streaming or --report-window")
+    parser.add_argument(
+        "--report-window",
+        type=float,
+        default=0,
+        help="Report throughput and percentiles per time window of this many seconds, overall and per rank")
+    parser.add_argument(
+        "--report-json",
+        type=str,
+        default="",
+        help="Write the windowed report as JSON to this file")
+    parser.add_argument(
+        "--report-html",
+        type=str,
+        default="",
+        help="Write the windowed report as a static HTML chart to this file")
     
     return parser.parse_args()
 
@@ -133,6 +297,20 @@ def parse_args():
 # Create a main executor which provides a hardcoded path to analyze the metrics create a main method instead
 def main():
     args = parse_args()
+    if args.report_window > 0:
+        report = report_metrics(args.metrics_path, args.report_window, args.timestamp_filter, args.relative_error)
+        if report is not None:
+            print(metrics_report.format_table(report))
+            metrics_report.write(report, args.report_json, args.report_html)
+        return
+    if args.streaming:
+        result = stream_metrics(args.metrics_path, args.timestamp_filter, args.relative_error)
+        if result is not None:
+            print(f"count    {result.count}")
+            print(f"mean     {result.mean()}")
+            for p in [0, 5, 10, 25, 50, 90, 99, 99.9, 100]:
+                print(f"{p:<8} {result.quantile(p / 100)}")
+        return
     result_df = analyze_metrics(args.metrics_path, args.timestamp_filter)
     if result_df is not None:
         print(result_df['sample_lat'].describe(percentiles=[0.05, 0.1, 0.25, 0.5, 0.9, 0.99, 0.999]))
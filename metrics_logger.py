@@ -13,72 +13,127 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import array
 import csv
+import threading
 import time
-import queue
-from queue import Queue
 from threading import Thread
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import histogram
+
+
+class _Slot:
+    __slots__ = ("buffer", "thread")
+
+    def __init__(self, buffer, thread):
+        self.buffer = buffer
+        self.thread = thread
+
+
+class _ThreadBuffers:
+    """
+    One metrics buffer per recording thread, so recording takes no lock.
+
+    A thread looks its buffer up once per sample and appends all the fields
+    of the sample to it, while `swap` hands every thread a fresh buffer. A
+    thread may still append to a buffer it looked up just before a swap, so
+    swapped out buffers are only returned by the next swap, or by the final
+    one, once the recording threads are done.
+    """
+    def __init__(self, new_buffer):
+        self._new_buffer = new_buffer
+        self._local = threading.local()
+        self._slots = []
+        self._retired = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            return self._local.slot.buffer
+        except AttributeError:
+            slot = self._local.slot = _Slot(self._new_buffer(), threading.current_thread())
+            with self._lock:
+                self._slots.append(slot)
+            return slot.buffer
+
+    def swap(self, final=False) -> list:
+        """
+        Returns (thread, buffer) pairs of the buffers retired by the previous
+        swap, plus the current ones if `final`.
+        """
+        with self._lock:
+            slots = list(self._slots)
+            # Threads which exited will not record again.
+            self._slots = [slot for slot in slots if slot.thread.is_alive()]
+        ready, self._retired = self._retired, []
+        for slot in slots:
+            retired = (slot.thread, slot.buffer)
+            slot.buffer = self._new_buffer()
+            (ready if final else self._retired).append(retired)
+        return ready
+
 
 class AsyncMetricsLogger:
     """
     A class to asynchronously log metrics to a CSV file.
+
+    Each recording thread appends to its own array, the writer thread swaps
+    the arrays out every `flush_interval` seconds.
     """
     def __init__(self, file_name="metrics.csv", flush_interval=5):
         self.file_name = file_name
         self.flush_interval = flush_interval
-        self.queue = Queue()
-        self._shutdown = False
+        # Interleaved (timestamp, sample_lat) pairs.
+        self._buffers = _ThreadBuffers(lambda: array.array("d"))
+        self._shutdown = threading.Event()
         self.writer_thread = Thread(target=self._writer_loop, daemon=True)
         self.writer_thread.start()
 
+    @staticmethod
+    def _rows(buffers):
+        for _, buf in buffers:
+            for timestamp, sample_lat in zip(buf[0::2], buf[1::2]):
+                # Whole latencies are written as integers, as they were logged.
+                yield (timestamp, int(sample_lat) if sample_lat.is_integer() else sample_lat)
+
     def _writer_loop(self):
         with open(self.file_name, "w", newline="") as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow(["timestamp", "sample_lat"])
 
             while True:
-                try:
-                    metrics = []
-                    while True:
-                        metrics.append(self.queue.get_nowait())
-                except queue.Empty:
-                    pass
-
-                if metrics:
-                    writer.writerows(metrics)
-                    csvfile.flush()
-                    
-                # Get all remaining metrics from the queue if shutdown.
-                if self._shutdown:
-                    try:
-                        metrics = []
-                        while True:
-                            metrics.append(self.queue.get_nowait())
-                    except queue.Empty:
-                        pass
-                    
-                    if metrics:
-                        writer.writerows(metrics)
-                        csvfile.flush()
+                shutdown = self._shutdown.wait(self.flush_interval)
+                writer.writerows(self._rows(self._buffers.swap(final=shutdown)))
+                csvfile.flush()
+                if shutdown:
                     break
 
-                time.sleep(self.flush_interval)
-                
-
-
-    def log_metric(self, sample_lat):
+    def log_metric(self, sample_lat, name=None, offset=-1, nbytes=-1, reader=None):
         """
-        Logs a metric data point asynchronously.
+        Logs a metric data point asynchronously. Only the latency is written,
+        the other fields are kept by the Arrow logger.
         """
-        timestamp = time.time()
-        self.queue.put([timestamp, sample_lat])
+        buf = self._buffers.get()
+        buf.append(time.time())
+        buf.append(sample_lat)
+
+    def step(self):
+        """Per-step histograms are only kept by the histogram logger."""
+        return None
+
+    def epoch(self):
+        """Per-epoch histograms are only kept by the histogram logger."""
+        return None
         
     def close(self):
         """
         Signals the writer thread to shut down and flushes any remaining metrics.
         """
-        self._shutdown = True  # Set the shutdown flag
+        self._shutdown.set()
         self.writer_thread.join()  # Wait for the thread to finish
 
 
@@ -91,8 +146,159 @@ class NoOpMetricsLogger:
     def __init__(self, file_name="metrics.csv"):
         pass  # Ignore any arguments
 
-    def log_metric(self, sample_lat):
+    def log_metric(self, sample_lat, name=None, offset=-1, nbytes=-1, reader=None):
         pass  # Do nothing when log_metric is called
+
+    def step(self):
+        return None
+
+    def epoch(self):
+        return None
     
     def close(self):
-        pass  # Do nothing when close is called
\ No newline at end of file
+        pass  # Do nothing when close is called
+
+
+class HistogramMetricsLogger:
+    """
+    Records metrics into per-thread log-bucketed histograms instead of one
+    row per sample, and writes the histogram of the whole run to the file
+    on close.
+    """
+    def __init__(self, file_name="metrics.hist", relative_error=0.01):
+        self.file_name = file_name
+        self.histograms = histogram.ThreadHistograms(relative_error)
+        self._last_step = self._last_epoch = self.histograms.snapshot()
+
+    def log_metric(self, sample_lat, name=None, offset=-1, nbytes=-1, reader=None):
+        self.histograms.record(sample_lat)
+
+    def step(self):
+        """Returns the histogram of the metrics logged since the last step."""
+        snapshot = self.histograms.snapshot()
+        delta = snapshot.delta(self._last_step)
+        self._last_step = snapshot
+        return delta
+
+    def epoch(self):
+        """Returns the histogram of the metrics logged since the last epoch."""
+        snapshot = self.histograms.snapshot()
+        delta = snapshot.delta(self._last_epoch)
+        self._last_epoch = self._last_step = snapshot
+        return delta
+
+    def close(self):
+        histogram.write(self.file_name, self.histograms.snapshot())
+
+
+METRICS_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.float64()),
+        ("sample_lat", pa.float64()),
+        ("object", pa.string()),
+        ("offset", pa.int64()),
+        ("bytes", pa.int64()),
+        ("thread", pa.int64()),
+        ("rank", pa.int32()),
+        ("reader", pa.string()),
+    ]
+)
+
+
+class _Columns:
+    __slots__ = ("timestamp", "sample_lat", "object", "offset", "bytes", "reader")
+
+    def __init__(self):
+        self.timestamp = array.array("d")
+        self.sample_lat = array.array("d")
+        self.object = []
+        self.offset = array.array("q")
+        self.bytes = array.array("q")
+        self.reader = []
+
+
+class ArrowMetricsLogger:
+    """
+    Logs one row per sample, with its object, offset, size, thread, rank and
+    reader, to a Parquet file or, with file_format "ipc", an Arrow IPC file.
+
+    Each recording thread appends to its own typed column arrays, the writer
+    thread swaps them out and writes them as one record batch every
+    `flush_interval` seconds.
+    """
+    def __init__(self, file_name="metrics.parquet", flush_interval=5, rank=0, file_format="parquet"):
+        self.file_name = file_name
+        self.flush_interval = flush_interval
+        self.rank = rank
+        self.file_format = file_format
+        self._buffers = _ThreadBuffers(_Columns)
+        self._shutdown = threading.Event()
+        self.writer_thread = Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def log_metric(self, sample_lat, name=None, offset=-1, nbytes=-1, reader=None):
+        """
+        Buffers a metric data point, written at the next flush.
+        """
+        c = self._buffers.get()
+        c.timestamp.append(time.time())
+        c.sample_lat.append(sample_lat)
+        c.object.append(name)
+        c.offset.append(offset)
+        c.bytes.append(nbytes)
+        c.reader.append(reader)
+
+    def _batch(self, buffers):
+        buffers = [(thread, c) for thread, c in buffers if len(c.timestamp) > 0]
+        if not buffers:
+            return None
+
+        def column(field, dtype):
+            return pa.concat_arrays([pa.array(getattr(c, field), type=dtype) for _, c in buffers])
+
+        threads = [(thread.native_id or 0, len(c.timestamp)) for thread, c in buffers]
+        n = sum(count for _, count in threads)
+        return pa.record_batch(
+            [
+                column("timestamp", pa.float64()),
+                column("sample_lat", pa.float64()),
+                column("object", pa.string()),
+                column("offset", pa.int64()),
+                column("bytes", pa.int64()),
+                pa.array(np.repeat([t for t, _ in threads], [c for _, c in threads]), type=pa.int64()),
+                pa.array(np.full(n, self.rank), type=pa.int32()),
+                column("reader", pa.string()),
+            ],
+            schema=METRICS_SCHEMA,
+        )
+
+    def _open_writer(self):
+        if self.file_format == "parquet":
+            return pq.ParquetWriter(self.file_name, METRICS_SCHEMA)
+        return pa.ipc.new_file(self.file_name, METRICS_SCHEMA)
+
+    def _writer_loop(self):
+        writer = self._open_writer()
+        try:
+            while True:
+                shutdown = self._shutdown.wait(self.flush_interval)
+                batch = self._batch(self._buffers.swap(final=shutdown))
+                if batch is not None:
+                    writer.write_batch(batch)
+                if shutdown:
+                    break
+        finally:
+            writer.close()
+
+    def step(self):
+        return None
+
+    def epoch(self):
+        return None
+
+    def close(self):
+        """
+        Signals the writer thread to shut down and flushes any remaining metrics.
+        """
+        self._shutdown.set()
+        self.writer_thread.join()
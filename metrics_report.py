@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Time-windowed report of a run: throughput and latency percentiles per
+window, overall and per rank, computed in one streaming pass.
+"""
+
+import html
+import json
+import math
+
+import numpy as np
+import pyarrow.dataset as ds
+
+import histogram
+
+PERCENTILES = (50, 99, 99.9)
+
+
+class WindowedReport:
+    """
+    Sample counts, bytes and latency histograms per rank and time window.
+
+    Windows are `window` seconds long from `start`. Histograms are kept
+    only for the windows a rank has samples in, and only their non-empty
+    buckets, so memory follows the distinct (window, bucket) cells seen
+    rather than ranks x windows x buckets.
+    """
+    def __init__(self, start: float, end: float, window: float, relative_error=0.01):
+        self.start = start
+        self.window = window
+        self.windows = math.floor((end - start) / window) + 1
+        self.sketch = histogram.LogHistogram(relative_error, max_value=1e6)
+        self.samples = {}
+        self.bytes = {}
+        # Per rank, the sorted window * buckets + bucket cells and their counts.
+        self.cells = {}
+
+    def _rank(self, rank: int):
+        if rank not in self.samples:
+            self.samples[rank] = np.zeros(self.windows, dtype=np.int64)
+            self.bytes[rank] = np.zeros(self.windows, dtype=np.float64)
+            self.cells[rank] = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        return self.samples[rank], self.bytes[rank]
+
+    def add(self, timestamps, latencies, nbytes=None, ranks=None, rank=0):
+        """
+        Adds a batch of samples, of one rank or with a rank per sample.
+        Bytes are optional, CSV metrics do not carry them.
+        """
+        w = ((np.asarray(timestamps, dtype=np.float64) - self.start) // self.window).astype(np.int64)
+        np.clip(w, 0, self.windows - 1, out=w)
+        cells = w * self.sketch.buckets + self.sketch.bucket_indices(latencies)
+        nbytes = None if nbytes is None else np.asarray(nbytes, dtype=np.float64)
+        groups = [(rank, slice(None))] if ranks is None else [
+            (int(r), np.asarray(ranks) == r) for r in np.unique(ranks)
+        ]
+        for r, selected in groups:
+            samples, total_bytes = self._rank(r)
+            samples += np.bincount(w[selected], minlength=self.windows)
+            if nbytes is not None:
+                # Samples without a size are logged with -1 bytes.
+                total_bytes += np.bincount(w[selected], weights=np.maximum(nbytes[selected], 0), minlength=self.windows)
+            self.cells[r] = _merge_cells(self.cells[r], np.unique(cells[selected], return_counts=True))
+
+    def _rows(self, samples, total_bytes, cells) -> list[dict]:
+        # Quantiles of the active windows only, one window per row.
+        active = np.flatnonzero(samples)
+        indices, counts = cells
+        dense = np.zeros((len(active), self.sketch.buckets), dtype=np.int64)
+        dense[np.searchsorted(active, indices // self.sketch.buckets), indices % self.sketch.buckets] = counts
+        quantiles = {p: np.zeros(self.windows) for p in PERCENTILES}
+        for p in PERCENTILES:
+            quantiles[p][active] = self.sketch.quantiles_of(dense, p / 100)
+        return [
+            {
+                "window": i,
+                "start_s": i * self.window,
+                "samples": int(samples[i]),
+                "samples_per_s": samples[i] / self.window,
+                "bytes_per_s": total_bytes[i] / self.window,
+                **{f"p{p}_ms": float(quantiles[p][i]) if samples[i] else None for p in PERCENTILES},
+            }
+            for i in range(self.windows)
+        ]
+
+    def to_dict(self) -> dict:
+        ranks = sorted(self.samples)
+        overall_cells = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        for r in ranks:
+            overall_cells = _merge_cells(overall_cells, self.cells[r])
+        overall = (
+            sum(self.samples[r] for r in ranks) if ranks else np.zeros(self.windows, dtype=np.int64),
+            sum(self.bytes[r] for r in ranks) if ranks else np.zeros(self.windows),
+            overall_cells,
+        )
+        return {
+            "start_timestamp": self.start,
+            "window_s": self.window,
+            "relative_error": self.sketch.relative_error,
+            "overall": self._rows(*overall),
+            "ranks": {str(r): self._rows(self.samples[r], self.bytes[r], self.cells[r]) for r in ranks},
+        }
+
+
+def _merge_cells(a, b):
+    """Sums two sparse (sorted cells, counts) histograms."""
+    indices = np.concatenate([a[0], b[0]])
+    counts = np.concatenate([a[1], b[1]])
+    merged, inverse = np.unique(indices, return_inverse=True)
+    return merged, np.bincount(inverse, weights=counts, minlength=len(merged)).astype(np.int64)
+
+
+def build(files: list[str], fs, window: float, relative_error=0.01, time_range=None, timestamp_filter=False) -> WindowedReport:
+    """
+    Streams the metrics files into a report. `time_range(file, fs)` returns
+    the (first, last) timestamp of a file. Files without a rank column count
+    as one rank each, in the order given. With timestamp_filter, only the
+    samples of the window common to all the files are reported.
+    """
+    ranges = [time_range(file, fs) for file in files]
+    ranges = [r for r in ranges if r is not None]
+    if not ranges:
+        return None
+    if timestamp_filter:
+        start, end = max(r[0] for r in ranges), min(r[1] for r in ranges)
+        if start > end:
+            return None
+        common = (ds.field("timestamp") >= start) & (ds.field("timestamp") <= end)
+    else:
+        start, end = min(r[0] for r in ranges), max(r[1] for r in ranges)
+        common = None
+    report = WindowedReport(start, end, window, relative_error)
+    for i, file in enumerate(files):
+        fmt = "csv" if file.endswith(".csv") else "parquet" if file.endswith(".parquet") else "ipc"
+        dataset = ds.dataset(file, format=fmt, filesystem=fs)
+        columns = [c for c in ["timestamp", "sample_lat", "bytes", "rank"] if c in dataset.schema.names]
+        for batch in dataset.to_batches(columns=columns, filter=common, batch_size=1 << 18, batch_readahead=2):
+            if batch.num_rows == 0:
+                continue
+            report.add(
+                batch.column("timestamp").to_numpy(),
+                batch.column("sample_lat").to_numpy(),
+                batch.column("bytes").to_numpy() if "bytes" in columns else None,
+                batch.column("rank").to_numpy() if "rank" in columns else None,
+                rank=i,
+            )
+    return report
+
+
+def format_table(report: dict) -> str:
+    """Formats the overall windows and a per-rank summary as text tables."""
+    def fmt(v):
+        return "-" if v is None else f"{v:.3f}"
+
+    lines = [f"{'start_s':>10} {'samples':>10} {'samples/s':>12} {'MiB/s':>10} {'p50_ms':>10} {'p99_ms':>10} {'p99.9_ms':>10}"]
+    for row in report["overall"]:
+        lines.append(
+            f"{row['start_s']:>10g} {row['samples']:>10} {row['samples_per_s']:>12.1f} {row['bytes_per_s'] / 2**20:>10.2f} "
+            f"{fmt(row['p50_ms']):>10} {fmt(row['p99_ms']):>10} {fmt(row['p99.9_ms']):>10}"
+        )
+    lines.append("")
+    lines.append(f"{'rank':>6} {'samples':>10} {'samples/s':>12} {'max p99_ms':>12} {'worst window':>12}")
+    for rank, rows in report["ranks"].items():
+        active = [row for row in rows if row["samples"]]
+        samples = sum(row["samples"] for row in rows)
+        duration = len(active) * report["window_s"]
+        worst = max(active, key=lambda row: row["p99_ms"]) if active else None
+        lines.append(
+            f"{rank:>6} {samples:>10} {samples / duration if duration else 0:>12.1f} "
+            f"{fmt(worst and worst['p99_ms']):>12} {worst['start_s'] if worst else '-':>12}"
+        )
+    return "\n".join(lines)
+
+
+def _polyline(points, x_max, y_max, width, height, color, stroke=1.5, opacity=1.0):
+    if not points:
+        return ""
+    coords = " ".join(
+        f"{40 + x / x_max * (width - 50):.1f},{height - 20 - y / y_max * (height - 30):.1f}" for x, y in points
+    )
+    return f'<polyline fill="none" stroke="{color}" stroke-width="{stroke}" opacity="{opacity}" points="{coords}"/>'
+
+
+def _chart(title, report, key, width=900, height=260):
+    series = [("overall", report["overall"])] + list(report["ranks"].items())
+    x_max = max(report["window_s"] * len(report["overall"]), 1e-9)
+    y_max = max([row[key] or 0 for _, rows in series for row in rows] + [1e-9])
+    lines = []
+    for name, rows in series:
+        points = [(row["start_s"], row[key]) for row in rows if row[key] is not None]
+        if name == "overall":
+            lines.append(_polyline(points, x_max, y_max, width, height, "#1a73e8", 2.5))
+        else:
+            lines.append(_polyline(points, x_max, y_max, width, height, "#888", 1, 0.4))
+    return (
+        f'<h3>{html.escape(title)}</h3><svg width="{width}" height="{height}" style="border:1px solid #ddd">'
+        f'<text x="4" y="14" font-size="11">{y_max:.4g}</text><text x="4" y="{height - 24}" font-size="11">0</text>'
+        f'<text x="{width - 60}" y="{height - 4}" font-size="11">{x_max:g} s</text>'
+        + "".join(lines)
+        + "</svg>"
+    )
+
+
+def to_html(report: dict) -> str:
+    """Renders the report as a static HTML page with inline SVG charts."""
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>ssiog report</title></head>"
+        "<body style='font-family:sans-serif'>"
+        f"<h2>ssiog report, {report['window_s']:g} s windows</h2>"
+        "<p>Blue: overall. Grey: individual ranks.</p>"
+        + _chart("Samples per second", report, "samples_per_s")
+        + _chart("p99 sample latency (ms)", report, "p99_ms")
+        + f"<pre>{html.escape(format_table(report))}</pre>"
+        + "</body></html>"
+    )
+
+
+def write(report: dict, json_path: str = "", html_path: str = ""):
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f)
+    if html_path:
+        with open(html_path, "w") as f:
+            f.write(to_html(report))
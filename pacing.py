@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Open-loop pacing: sample reads are issued on a fixed schedule, independent
+of how fast earlier reads complete, so slow storage shows up as latency
+and backlog instead of as a lower offered load.
+"""
+
+import random
+import threading
+import time
+
+
+class Pacer:
+    """
+    Schedules the sample reads of a rank at `rate` samples per second.
+
+    Shared by the reader threads of the rank. `arrival` is 'constant' (evenly
+    spaced) or 'poisson' (exponential gaps with the same mean). The schedule
+    starts at the first `wait`. Latencies are measured from the scheduled
+    time, which avoids coordinated omission: a read that is issued late
+    because all readers were busy still counts the time it waited.
+    """
+    def __init__(self, rate: float, arrival: str = "constant", deadline_ns: int = 0, seed: int = None):
+        if rate <= 0:
+            raise ValueError(f"Pacing rate must be positive, got {rate}.")
+        if arrival not in ("constant", "poisson"):
+            raise ValueError(f"Unknown arrival process {arrival}")
+        self.rate = rate
+        self.arrival = arrival
+        self.deadline_ns = deadline_ns
+        # Reads issued, issued while the next read was already due, and
+        # completed more than deadline_ns after their scheduled time.
+        self.issued = 0
+        self.backlogged = 0
+        self.missed_deadlines = 0
+        # Most reads that were due but not yet issued at once.
+        self.max_backlog = 0
+        self._interval_ns = 1e9 / rate
+        self._rng = random.Random(seed)
+        self._next = None
+        self._lock = threading.Lock()
+
+    def _gap_ns(self) -> float:
+        if self.arrival == "poisson":
+            return self._rng.expovariate(1.0) * self._interval_ns
+        return self._interval_ns
+
+    def wait(self) -> int:
+        """
+        Takes the next slot of the schedule, sleeps until it is due and
+        returns its scheduled time, in time.monotonic_ns() units.
+        """
+        with self._lock:
+            now = time.monotonic_ns()
+            if self._next is None:
+                self._next = now
+            scheduled = int(self._next)
+            self._next += self._gap_ns()
+            self.issued += 1
+            if self._next <= now:
+                # The readers fell behind the schedule.
+                self.backlogged += 1
+                backlog = int((now - scheduled) // self._interval_ns) + 1
+                self.max_backlog = max(self.max_backlog, backlog)
+        if scheduled > now:
+            time.sleep((scheduled - now) / 1e9)
+        return scheduled
+
+    def done(self, elapsed_ns: int) -> bool:
+        """
+        Records a read that completed `elapsed_ns` after its scheduled time.
+        Returns whether it missed the deadline.
+        """
+        if self.deadline_ns <= 0 or elapsed_ns <= self.deadline_ns:
+            return False
+        with self._lock:
+            self.missed_deadlines += 1
+        return True
+
+
+def target_rate(args) -> float:
+    """
+    Returns the per-rank open-loop rate in samples per second, from
+    --target-rate or --target-bytes-rate, or 0 for the closed loop.
+    """
+    if args.target_rate > 0:
+        return args.target_rate
+    if args.target_bytes_rate > 0:
+        return args.target_bytes_rate / args.sample_size
+    return 0
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Reader threads which live across epochs.
+"""
+
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ReaderPool(object):
+    """
+    Long-lived reader threads, which run the reads of one epoch at a time.
+
+    `run(target)` calls `target(worker_id, state, cancelled)` on every
+    thread. `state` is a dict kept by each thread across epochs, for the
+    open files and connections it reuses; values with a `close` method are
+    closed with the pool. `cancelled` is set when the epoch no longer needs
+    samples, readers stop at their next sample.
+    """
+    def __init__(self, count: int, name: str = "reader"):
+        self.count = count
+        self._inboxes = [queue.SimpleQueue() for _ in range(count)]
+        self._threads = [
+            threading.Thread(target=self._loop, args=(i,), name=f"{name}-{i}", daemon=True)
+            for i in range(count)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def run(self, target: callable) -> threading.Event:
+        """Assigns the work of an epoch, returns the event cancelling it."""
+        cancelled = threading.Event()
+        for inbox in self._inboxes:
+            inbox.put((target, cancelled))
+        return cancelled
+
+    def close(self):
+        """Stops the threads once their current work completes, and joins them."""
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for t in self._threads:
+            t.join()
+
+    def _loop(self, worker_id: int):
+        state = {}
+        try:
+            while True:
+                work = self._inboxes[worker_id].get()
+                if work is None:
+                    return
+                target, cancelled = work
+                try:
+                    target(worker_id, state, cancelled)
+                except Exception as e:
+                    logger.error(f"Reader {worker_id} failed: {e}")
+        finally:
+            for value in state.values():
+                if hasattr(value, "close"):
+                    value.close()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compact, NumPy backed containers for the samples selected for an epoch.
+"""
+
+import hashlib
+from collections.abc import Sequence
+from typing import Iterable
+
+import numpy as np
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class SampleIndex:
+    """
+    Maps each object to the sorted offsets of its selected samples.
+
+    Built once per epoch, so readers can look up the samples of an object
+    without scanning the whole sample list.
+    """
+    def __init__(self, names: list[str], object_ids: np.ndarray, offsets: np.ndarray):
+        order = np.lexsort((offsets, object_ids))
+        self._offsets = np.asarray(offsets, dtype=np.int64)[order]
+        bounds = np.searchsorted(object_ids[order], np.arange(len(names) + 1))
+        self._ranges = {
+            name: (int(bounds[i]), int(bounds[i + 1])) for i, name in enumerate(names)
+        }
+
+    @classmethod
+    def from_pairs(cls, samples: Iterable[tuple[str, int]]) -> "SampleIndex":
+        """Builds the index from (name, offset) pairs."""
+        samples = list(samples)
+        ids = {}
+        object_ids = np.fromiter(
+            (ids.setdefault(n, len(ids)) for n, _ in samples), dtype=np.int64, count=len(samples)
+        )
+        offsets = np.fromiter((o for _, o in samples), dtype=np.int64, count=len(samples))
+        return cls(list(ids), object_ids, offsets)
+
+    def offsets(self, name: str) -> np.ndarray:
+        """Returns the sorted sample offsets of an object, possibly empty."""
+        r = self._ranges.get(name)
+        if r is None:
+            return _EMPTY
+        return self._offsets[r[0] : r[1]]
+
+    def count(self, name: str) -> int:
+        """Returns the number of samples selected from an object."""
+        r = self._ranges.get(name)
+        return 0 if r is None else r[1] - r[0]
+
+
+class Samples(Sequence):
+    """
+    The samples selected for an epoch, stored as compact arrays.
+
+    Sample `i` is `(names[object_ids[i]], offsets[i])`. Behaves as a sequence
+    of (name, offset) tuples for the readers, and carries its index.
+    """
+    def __init__(self, names: list[str], object_ids: np.ndarray, offsets: np.ndarray):
+        self.names = list(names)
+        self.object_ids = np.asarray(object_ids, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.index = SampleIndex(self.names, self.object_ids, self.offsets)
+
+    @classmethod
+    def from_pairs(cls, samples: Iterable[tuple[str, int]]) -> "Samples":
+        """Builds the samples from (name, offset) pairs."""
+        samples = list(samples)
+        ids = {}
+        object_ids = [ids.setdefault(n, len(ids)) for n, _ in samples]
+        return cls(list(ids), object_ids, [o for _, o in samples])
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        return (self.names[self.object_ids[i]], int(self.offsets[i]))
+
+    def __iter__(self):
+        names = self.names
+        for i, o in zip(self.object_ids.tolist(), self.offsets.tolist()):
+            yield (names[i], o)
+
+
+def select_samples(
+    names: list[str],
+    sizes: Iterable[int],
+    sample_size: int,
+    count: int,
+    rng: np.random.Generator = None,
+) -> Samples:
+    """
+    Draws `count` samples uniformly, with replacement, from all the
+    `sample_size` aligned offsets of the given objects.
+
+    Only a cumulative count of samples per object is kept, each draw is
+    mapped back to its object with a binary search, so memory is
+    proportional to the number of objects plus the number of draws.
+    """
+    rng = rng or np.random.default_rng()
+    sizes = np.asarray(sizes, dtype=np.int64)
+    # Every object contributes ceil(size / sample_size) offsets.
+    per_object = (sizes + sample_size - 1) // sample_size
+    cumulative = np.cumsum(per_object)
+    total = int(cumulative[-1]) if len(cumulative) else 0
+    if total == 0:
+        raise ValueError("No samples available to select from.")
+    draws = rng.integers(0, total, size=count, dtype=np.int64)
+    object_ids = np.searchsorted(cumulative, draws, side="right")
+    first = cumulative[object_ids] - per_object[object_ids]
+    offsets = (draws - first) * sample_size
+    return Samples(names, object_ids, offsets)
+
+
+def available_samples(sizes: Iterable[int], sample_size: int) -> int:
+    """Returns the number of sample_size aligned offsets in the objects."""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    return int(((sizes + sample_size - 1) // sample_size).sum())
+
+
+def index_of(samples: Iterable[tuple[str, int]]) -> SampleIndex:
+    """
+    Returns the index of the samples, building one if they are a plain list.
+    """
+    if isinstance(samples, Samples):
+        return samples.index
+    return SampleIndex.from_pairs(samples)
+
+
+def dataset_fingerprint(objects_by_prefix: dict[str, Iterable[str]]) -> str:
+    """
+    Returns a short digest of the listed objects, independent of listing
+    order, so ranks can cheaply check they see the same dataset.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for prefix in sorted(objects_by_prefix):
+        h.update(prefix.encode())
+        for name in sorted(objects_by_prefix[prefix]):
+            h.update(b"\0")
+            h.update(name.encode())
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def plan_checksum(object_names: Iterable[str], samples: Samples) -> int:
+    """Returns a signed 64-bit checksum of an epoch plan."""
+    h = hashlib.blake2b(digest_size=8)
+    for name in object_names:
+        h.update(name.encode())
+        h.update(b"\0")
+    for name in samples.names:
+        h.update(name.encode())
+        h.update(b"\0")
+    h.update(samples.object_ids.tobytes())
+    h.update(samples.offsets.tobytes())
+    return int.from_bytes(h.digest(), "little", signed=True)
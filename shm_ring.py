@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A shared-memory ring buffer to hand samples from reader processes to the
+step loop.
+"""
+
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+# Slot kinds.
+SAMPLE = 0
+DONE = 1
+FAILED = 2
+
+# kind, object index, offset, latency (ns), sample bytes, payload length.
+_HEADER = struct.Struct("<qqqqqq")
+
+
+class SharedRingBuffer:
+    """
+    A multi-producer, single-consumer ring of fixed size slots in shared memory.
+
+    Each slot holds a sample descriptor and, if `payload_size` > 0, up to
+    `payload_size` bytes of sample data. Producers block when the ring is
+    full and the consumer blocks when it is empty. The ring must be created
+    before the producer processes are forked.
+    """
+    def __init__(self, slots=1024, payload_size=0, ctx=None):
+        ctx = ctx or multiprocessing.get_context("fork")
+        self.slots = slots
+        self.payload_size = payload_size
+        self.slot_size = _HEADER.size + payload_size
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_size)
+        self._free = ctx.Semaphore(slots)
+        self._filled = ctx.Semaphore(0)
+        self._lock = ctx.Lock()
+        self._head = ctx.RawValue("q", 0)
+        self._tail = 0  # Only touched by the consumer.
+
+    def put(self, kind, index=-1, offset=0, latency_ns=0, payload=None, nbytes=-1):
+        """
+        Writes one descriptor, and optionally its payload, into the next slot.
+        `nbytes` is the size of the sample read, -1 if unknown.
+        """
+        length = 0
+        if payload is not None and self.payload_size > 0:
+            length = min(len(payload), self.payload_size)
+        self._free.acquire()
+        # The slot is claimed, written and published under the lock so that
+        # slots become visible to the consumer strictly in order.
+        with self._lock:
+            start = (self._head.value % self.slots) * self.slot_size
+            _HEADER.pack_into(self._shm.buf, start, kind, index, offset, latency_ns, nbytes, length)
+            if length:
+                body = start + _HEADER.size
+                self._shm.buf[body : body + length] = payload[:length]
+            self._head.value += 1
+            self._filled.release()
+
+    def get(self, block=True):
+        """
+        Returns the next (kind, index, offset, latency_ns, payload, nbytes) tuple.
+
+        The payload is a copy of the slot bytes, or None if no payload was
+        written. If `block` is False and the ring is empty, returns None.
+        """
+        if not self._filled.acquire(block):
+            return None
+        start = (self._tail % self.slots) * self.slot_size
+        kind, index, offset, latency_ns, nbytes, length = _HEADER.unpack_from(self._shm.buf, start)
+        payload = None
+        if length:
+            body = start + _HEADER.size
+            payload = bytes(self._shm.buf[body : body + length])
+        self._tail += 1
+        self._free.release()
+        return (kind, index, offset, latency_ns, payload, nbytes)
+
+    def close(self):
+        """Releases the shared memory, must be called once by the owner."""
+        self._shm.close()
+        self._shm.unlink()
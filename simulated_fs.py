@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+A simulated object store behind a pyarrow PyFileSystem, for reproducing
+GCS-like latency, bandwidth limits and errors without a bucket.
+
+`sim://synthetic/` serves generated objects and `sim:///some/dir/` serves
+the files of a local directory. `null://` answers every request at once,
+to measure the ceiling of the harness itself.
+"""
+
+import math
+import os
+import random
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.fs as fs
+
+import manifest
+
+SCHEME = "sim://"
+NULL_SCHEME = "null://"
+SYNTHETIC = "synthetic"
+NULL = "null"
+
+# Synthetic objects repeat a block of random bytes.
+_BLOCK_SIZE = 1 << 20
+# The zeros served by null:// stores.
+_ZEROS = memoryview(bytes(_BLOCK_SIZE))
+
+
+class LatencyModel(object):
+    """
+    Draws the latency of each request, in seconds, with a mean of `mean_ms`:
+    'fixed', 'exponential', or 'lognormal' with shape `sigma` for heavy tails.
+    """
+    def __init__(self, mean_ms: float = 0, distribution: str = "fixed", sigma: float = 1.0, seed: int = None):
+        if distribution not in ("fixed", "exponential", "lognormal"):
+            raise Exception(f"Unknown latency distribution {distribution}.")
+        self.mean = mean_ms / 1000
+        self.distribution = distribution
+        self.sigma = sigma
+        # Keeps the mean of the lognormal at mean_ms whatever its shape.
+        self._mu = math.log(self.mean) - sigma * sigma / 2 if self.mean > 0 else 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if self.mean <= 0:
+            return 0
+        if self.distribution == "fixed":
+            return self.mean
+        with self._lock:
+            if self.distribution == "exponential":
+                return self._rng.expovariate(1 / self.mean)
+            return self._rng.lognormvariate(self._mu, self.sigma)
+
+
+class Throttle(object):
+    """
+    Caps the bandwidth of all the streams sharing it: each transfer reserves
+    the next free interval of the link and waits until it has passed.
+    """
+    def __init__(self, bytes_per_s: float):
+        self.bytes_per_s = bytes_per_s
+        self._next_free = 0.0
+        self._lock = threading.Lock()
+
+    def transfer(self, nbytes: int):
+        if self.bytes_per_s <= 0 or nbytes <= 0:
+            return
+        with self._lock:
+            start = max(time.monotonic(), self._next_free)
+            self._next_free = start + nbytes / self.bytes_per_s
+            end = self._next_free
+        _sleep_until(end)
+
+
+def _sleep_until(deadline: float):
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+class SimulatedStorage(object):
+    """
+    The objects and the behavior of a simulated store.
+
+    Every request (open or read) waits for a latency drawn from `latency`
+    and fails with probability `error_rate`. Reads then transfer at most
+    `stream_bytes_per_s` per open file and `bytes_per_s` for the process.
+    """
+    def __init__(
+        self,
+        root: str,
+        objects: int = 0,
+        object_size: int = 0,
+        latency: LatencyModel = None,
+        stream_bytes_per_s: float = 0,
+        bytes_per_s: float = 0,
+        error_rate: float = 0,
+        seed: int = None,
+    ):
+        self.root = root
+        self.latency = latency or LatencyModel()
+        self.stream_bytes_per_s = stream_bytes_per_s
+        self.throttle = Throttle(bytes_per_s)
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        if root in (SYNTHETIC, NULL):
+            self._sizes = {f"{root}/object-{i:06d}": object_size for i in range(objects)}
+            self._block = random.Random(seed).randbytes(_BLOCK_SIZE) if root == SYNTHETIC else None
+        else:
+            self._sizes = {
+                e.path: e.size
+                for e in fs.LocalFileSystem().get_file_info(fs.FileSelector(root))
+                if e.type == fs.FileType.File
+            }
+            self._block = None
+
+    def names(self) -> list[str]:
+        return sorted(self._sizes)
+
+    def size(self, name: str) -> int:
+        size = self._sizes.get(name)
+        if size is None:
+            raise FileNotFoundError(f"{name} is not in the simulated store.")
+        return size
+
+    def request(self, what: str):
+        """Waits for the latency of one request, and fails it at the error rate."""
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        time.sleep(self.latency.sample())
+        if failed:
+            raise OSError(f"Simulated error: {what} failed with 503 Service Unavailable.")
+
+    def read(self, name: str, offset: int, nbytes: int) -> bytes:
+        """Returns the bytes of an object, without any delay."""
+        size = self.size(name)
+        nbytes = max(0, min(nbytes, size - offset))
+        if self._block is None:
+            with open(name, "rb") as f:
+                f.seek(offset)
+                return f.read(nbytes)
+        parts = []
+        while nbytes > 0:
+            start = offset % _BLOCK_SIZE
+            part = self._block[start : start + nbytes]
+            parts.append(part)
+            offset += len(part)
+            nbytes -= len(part)
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+
+class NullStorage(SimulatedStorage):
+    """
+    A store answering every request at once with views of a block of
+    zeros, shared by all stores and only grown for reads larger than it.
+    """
+    def __init__(self, objects: int, object_size: int):
+        super().__init__(NULL, objects, object_size)
+        self._zeros = _ZEROS
+
+    def request(self, what: str):
+        pass
+
+    def read(self, name: str, offset: int, nbytes: int) -> memoryview:
+        nbytes = max(0, min(nbytes, self.size(name) - offset))
+        if nbytes > len(self._zeros):
+            self._zeros = memoryview(bytes(nbytes))
+        return self._zeros[:nbytes]
+
+
+def is_simulated(prefix: str) -> bool:
+    return prefix.startswith(SCHEME) or prefix.startswith(NULL_SCHEME)
+
+
+def from_args(prefix: str, args) -> SimulatedStorage:
+    """Returns the store of a sim:// or null:// prefix, configured by the --sim-* flags."""
+    if prefix.startswith(NULL_SCHEME):
+        return NullStorage(args.sim_objects, args.sim_object_size)
+    root = prefix.removeprefix(SCHEME).rstrip("/") or "/"
+    if root != SYNTHETIC:
+        root = os.path.abspath(root)
+    return SimulatedStorage(
+        root,
+        args.sim_objects,
+        args.sim_object_size,
+        LatencyModel(args.sim_latency_ms, args.sim_latency_distribution, args.sim_latency_sigma),
+        args.sim_stream_bandwidth_mbps * 1000000 / 8,
+        args.sim_bandwidth_mbps * 1000000 / 8,
+        args.sim_error_rate,
+    )
+
+
+class _SimulatedFile(object):
+    """The file object behind a simulated pyarrow input file."""
+    def __init__(self, storage: SimulatedStorage, name: str):
+        self._storage = storage
+        self._name = name
+        self._size = storage.size(name)
+        self._position = 0
+        self.closed = False
+
+    def read(self, nbytes: int = -1) -> bytes:
+        if nbytes is None or nbytes < 0:
+            nbytes = self._size - self._position
+        self._storage.request(f"read of {self._name} at {self._position}")
+        # The stream cap paces the transfer, which starts after the latency.
+        start = time.monotonic()
+        data = self._storage.read(self._name, self._position, nbytes)
+        self._position += len(data)
+        self._storage.throttle.transfer(len(data))
+        if self._storage.stream_bytes_per_s > 0:
+            _sleep_until(start + len(data) / self._storage.stream_bytes_per_s)
+        return data
+
+    def seek(self, position: int, whence: int = 0) -> int:
+        if whence == 1:
+            position += self._position
+        elif whence == 2:
+            position += self._size
+        self._position = position
+        return position
+
+    def tell(self) -> int:
+        return self._position
+
+    def size(self) -> int:
+        return self._size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+class SimulatedHandler(fs.FileSystemHandler):
+    """A read-only pyarrow filesystem handler over a SimulatedStorage."""
+    def __init__(self, storage: SimulatedStorage):
+        self.storage = storage
+
+    def __eq__(self, other):
+        return isinstance(other, SimulatedHandler) and self.storage is other.storage
+
+    def __ne__(self, other):
+        return not self == other
+
+    def get_type_name(self):
+        return "sim"
+
+    def normalize_path(self, path):
+        return path
+
+    def get_file_info(self, paths):
+        infos = []
+        for path in paths:
+            size = self.storage._sizes.get(path)
+            if size is None:
+                infos.append(fs.FileInfo(path, fs.FileType.NotFound))
+            else:
+                infos.append(fs.FileInfo(path, fs.FileType.File, size=size))
+        return infos
+
+    def get_file_info_selector(self, selector):
+        return self.get_file_info(self.storage.names())
+
+    def open_input_file(self, path):
+        self.storage.request(f"open of {path}")
+        return pa.PythonFile(_SimulatedFile(self.storage, path), mode="r")
+
+    def open_input_stream(self, path):
+        return self.open_input_file(path)
+
+    def _read_only(self, *args, **kwargs):
+        raise OSError("The simulated store is read-only.")
+
+    create_dir = delete_dir = delete_dir_contents = delete_root_dir_contents = _read_only
+    delete_file = move = copy_file = open_output_stream = open_append_stream = _read_only
+
+
+def list_prefix(prefix: str, storage: SimulatedStorage) -> manifest.Manifest:
+    """Lists the objects of a simulated or null store, the generation is always 0."""
+    names = storage.names()
+    return manifest.Manifest(prefix, names, [storage.size(n) for n in names], ["0"] * len(names))
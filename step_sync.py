@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Synchronization of the ranks between steps, and the time spent on it.
+"""
+
+import time
+
+import torch
+import torch.distributed as td
+
+MODES = ["barrier", "every-n", "allreduce", "none"]
+
+
+class StepSync:
+    """
+    Synchronizes the ranks after each step according to a mode:
+
+    - 'barrier': a barrier after every step.
+    - 'every-n': a barrier after every `interval` steps.
+    - 'allreduce': an asynchronous all-reduce of a step token, like a
+      gradient sync overlapped with the next step. The step waits for the
+      all-reduce issued by the previous step before issuing its own.
+    - 'none': the ranks only meet at the end of the epoch.
+
+    `step` and `finish` return the time spent waiting for the other ranks,
+    in ns. With a single rank nothing is synchronized.
+    """
+    def __init__(self, mode: str = "barrier", interval: int = 1):
+        if mode not in MODES:
+            raise Exception(f"Unknown sync mode {mode}, expected one of {MODES}.")
+        if interval < 1:
+            raise Exception(f"The sync interval must be positive, got {interval}.")
+        self.mode = mode
+        self.interval = interval
+        self._enabled = td.get_world_size() > 1
+        self._token = torch.zeros(1)
+        self._pending = None
+
+    def step(self, step: int) -> int:
+        """Synchronizes after `step` (0-based) completed."""
+        if not self._enabled or self.mode == "none":
+            return 0
+        start = time.monotonic_ns()
+        if self.mode == "allreduce":
+            self._wait()
+            self._token.fill_(step)
+            self._pending = td.all_reduce(self._token, async_op=True)
+        elif self.mode == "barrier" or (step + 1) % self.interval == 0:
+            td.barrier()
+        return time.monotonic_ns() - start
+
+    def finish(self) -> int:
+        """Waits for the outstanding all-reduce, if any."""
+        start = time.monotonic_ns()
+        self._wait()
+        return time.monotonic_ns() - start
+
+    def _wait(self):
+        if self._pending is not None:
+            self._pending.wait()
+            self._pending = None
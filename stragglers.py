@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Per-step timings of every rank, gathered to rank 0 to find the ranks that
+hold the others up when they synchronize between steps.
+"""
+
+import logging
+
+import numpy as np
+import torch
+import torch.distributed as td
+
+logger = logging.getLogger(__name__)
+
+
+def gather(step_ns: np.ndarray, sync_ns: np.ndarray):
+    """
+    Gathers the step durations and sync waits of every rank to rank 0,
+    in one collective. Returns an array of shape (ranks, 2, steps) on rank 0
+    and None on the others.
+    """
+    local = torch.from_numpy(np.stack([step_ns, sync_ns]).astype(np.int64))
+    if td.get_rank() != 0:
+        td.gather(local, dst=0)
+        return None
+    gathered = [torch.empty_like(local) for _ in range(td.get_world_size())]
+    td.gather(local, gather_list=gathered, dst=0)
+    return torch.stack(gathered).numpy()
+
+
+def summarize(times: np.ndarray, top: int = 5) -> dict:
+    """
+    Summarizes gathered (ranks, 2, steps) timings: the spread of step
+    durations across ranks, how often each rank was the slowest, and the
+    fraction of each rank's time spent waiting for the others.
+    """
+    step_ns, sync_ns = times[:, 0, :], times[:, 1, :]
+    ranks, steps = step_ns.shape
+    slowest = np.argmax(step_ns, axis=0)
+    slowest_counts = np.bincount(slowest, minlength=ranks)
+    total_ns = step_ns.sum(axis=1) + sync_ns.sum(axis=1)
+    sync_fraction = np.divide(
+        sync_ns.sum(axis=1), total_ns, out=np.zeros(ranks), where=total_ns > 0
+    )
+    order = np.argsort(-slowest_counts, kind="stable")[:top]
+    return {
+        "ranks": ranks,
+        "steps": steps,
+        "step_max_ms": (step_ns.max(axis=0) / 1e6).tolist(),
+        "step_min_ms": (step_ns.min(axis=0) / 1e6).tolist(),
+        "slowest_rank": slowest.tolist(),
+        "slowest_ranks": [(int(r), int(slowest_counts[r])) for r in order if slowest_counts[r] > 0],
+        "sync_fraction": sync_fraction.tolist(),
+    }
+
+
+def log_summary(summary: dict):
+    """Logs a summary, one line per finding, with the per-step details at debug level."""
+    if summary["steps"] == 0:
+        return
+    step_max, step_min = np.asarray(summary["step_max_ms"]), np.asarray(summary["step_min_ms"])
+    spread = step_max - step_min
+    worst = int(np.argmax(spread))
+    logger.info(
+        f"step spread over {summary['ranks']} ranks (ms): median max {np.median(step_max):.3f}, "
+        f"median min {np.median(step_min):.3f}, worst step {worst} "
+        f"({step_max[worst]:.3f} on rank {summary['slowest_rank'][worst]} vs {step_min[worst]:.3f})"
+    )
+    logger.info(
+        "slowest rank (rank: steps): "
+        + ", ".join(f"{r}: {n}" for r, n in summary["slowest_ranks"])
+    )
+    fraction = np.asarray(summary["sync_fraction"])
+    logger.info(
+        f"sync wait fraction: mean {fraction.mean():.3f}, min {fraction.min():.3f} "
+        f"(rank {int(np.argmin(fraction))}), max {fraction.max():.3f} (rank {int(np.argmax(fraction))})"
+    )
+    for step in range(summary["steps"]):
+        logger.debug(
+            f"step {step}: max {step_max[step]:.3f} ms (rank {summary['slowest_rank'][step]}), "
+            f"min {step_min[step]:.3f} ms"
+        )
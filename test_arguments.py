@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import contextlib
+import io
+import unittest
+
+import arguments
+
+
+class TestMetricsFile(unittest.TestCase):
+
+    def test_default_follows_format(self):
+        for fmt, name in [("csv", "metrics.csv"), ("parquet", "metrics.parquet"),
+                          ("arrow", "metrics.arrow"), ("histogram", "metrics.hist")]:
+            args = arguments.parse_args(["--prefix", "p", "--metrics-format", fmt])
+            self.assertEqual(args.metrics_file, name)
+
+    def test_matching_extension(self):
+        args = arguments.parse_args(["--prefix", "p", "--metrics-format", "parquet", "--metrics-file", "out/run.parquet"])
+        self.assertEqual(args.metrics_file, "out/run.parquet")
+
+    def test_mismatched_extension(self):
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()) as err:
+            arguments.parse_args(["--prefix", "p", "--metrics-format", "parquet", "--metrics-file", "metrics.csv"])
+        self.assertIn("must end with .parquet", err.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import unittest
+
+import pyarrow.fs as fs
+
+from async_reader import read_requests, run_loop, Worker
+
+
+class TestReadRequests(unittest.TestCase):
+
+    def test_full_random_split_by_rank_and_loop(self):
+        samples = [("a", 0), ("b", 2), ("a", 4), ("b", 6)]
+        result = list(read_requests("FullRandom", ["a", "b"], 0, 2, 1, 2, 2, samples))
+        # Rank 0 owns samples 0 and 2, loop 1 of 2 gets the second of those.
+        self.assertEqual(result, [("a", 4)])
+
+    def test_sequential_reads_from_start(self):
+        samples = [("a", 8), ("a", 2), ("b", 0)]
+        result = list(read_requests("Sequential", ["a", "b"], 0, 1, 0, 1, 2, samples))
+        self.assertEqual(result, [("a", 0), ("a", 2), ("b", 0)])
+
+    def test_file_random_reads_sorted_sample_offsets(self):
+        samples = [("a", 8), ("b", 0), ("a", 2)]
+        result = list(read_requests("FileRandom", ["a", "b"], 0, 1, 0, 1, 2, samples))
+        self.assertEqual(result, [("a", 2), ("a", 8), ("b", 0)])
+
+    def test_unknown_read_order(self):
+        with self.assertRaises(Exception):
+            list(read_requests("Backwards", ["a"], 0, 1, 0, 1, 2, [("a", 0)]))
+
+
+class TestRunLoop(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.name = os.path.join(self.test_dir, "file1.txt")
+        with open(self.name, "wb") as f:
+            f.write(b"testing_random_reader")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_local_reads_with_queue_depth(self):
+        samples = [(self.name, o) for o in range(0, 20, 2)]
+        q = queue.Queue()
+        latencies = []
+        run_loop("FullRandom", [self.name], 0, 1, 0, 1, 4, fs.LocalFileSystem(), 2, samples, q, lambda *latency: latencies.append(latency), 4)
+
+        batches = [q.get_nowait() for _ in range(q.qsize())]
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        result = sorted(r for b in batches for r in b)
+        self.assertEqual(len(result), 10)
+        self.assertEqual([(n, o) for n, o, _ in result], samples)
+        self.assertEqual(len(latencies), 10)
+
+    def test_worker_reuses_backend_across_epochs(self):
+        filesystem = fs.LocalFileSystem()
+        worker = Worker()
+        try:
+            for _ in range(2):
+                q = queue.Queue()
+                run_loop("FullRandom", [self.name], 0, 1, 0, 1, 4, filesystem, 2, [(self.name, 0)], q, lambda *_: None, 1, worker)
+                self.assertEqual(len(q.get_nowait()), 1)
+            # One backend kept its open file for the second epoch.
+            self.assertEqual(len(worker._backends), 1)
+            backend = worker.backend(filesystem, 4)
+            self.assertEqual(len(backend._handles), 1)
+            self.assertEqual(backend._handles.misses, 1)
+        finally:
+            worker.close()
+        self.assertTrue(worker.loop.is_closed())
+
+    def test_worker_bounds_open_files(self):
+        other = os.path.join(self.test_dir, "file2.txt")
+        with open(other, "wb") as f:
+            f.write(b"testing_random_reader")
+        filesystem = fs.LocalFileSystem()
+        worker = Worker(handle_cache_size=1)
+        try:
+            q = queue.Queue()
+            samples = [(self.name, 0), (other, 0), (self.name, 2)]
+            run_loop("FullRandom", [self.name, other], 0, 1, 0, 1, 1, filesystem, 2, samples, q, lambda *_: None, 1, worker)
+            self.assertEqual(q.qsize(), 3)
+            handles = worker.backend(filesystem, 1)._handles
+            self.assertEqual(len(handles), 1)
+            self.assertEqual(handles.evictions, 2)
+        finally:
+            worker.close()
+
+    def test_cancelled_issues_no_reads(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        q = queue.Queue()
+        run_loop("FullRandom", [self.name], 0, 1, 0, 1, 4, fs.LocalFileSystem(), 2, [(self.name, 0)], q, lambda *_: None, 1, None, cancelled)
+        self.assertTrue(q.empty())
+
+    def test_full_random_read_past_end_fails(self):
+        q = queue.Queue()
+        with self.assertRaises(ValueError):
+            run_loop("FullRandom", [self.name], 0, 1, 0, 1, 4, fs.LocalFileSystem(), 2, [(self.name, 100)], q, lambda *_: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import contextlib
+import unittest
+from unittest.mock import patch
+
+import benchmark_suite
+from benchmark_suite import compare
+
+
+class TestCompare(unittest.TestCase):
+
+    def _result(self, **kwargs):
+        result = {"items_per_s": 1000.0, "p99_ms": 10.0, "cpu_us_per_item": 5.0, "peak_rss_mb": 100.0}
+        result.update(kwargs)
+        return result
+
+    def test_within_thresholds(self):
+        baseline = {"benchmarks": {"sampler": self._result()}}
+        results = {"sampler": self._result(items_per_s=800.0, cpu_us_per_item=6.0, p99_ms=100.0), "new": self._result()}
+        self.assertEqual(compare(results, baseline), [])
+
+    def test_regressions(self):
+        baseline = {"benchmarks": {"sampler": self._result()}}
+        results = {"sampler": self._result(items_per_s=600.0, cpu_us_per_item=7.0, peak_rss_mb=130.0)}
+        regressions = compare(results, baseline)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith("sampler: items_per_s 600"))
+
+    def test_threshold_overrides(self):
+        baseline = {
+            "thresholds": {"items_per_s": 0.5, "p99_ms": 1.0},
+            "benchmarks": {"sampler": {**self._result(), "thresholds": {"cpu_us_per_item": 1.0}}},
+        }
+        results = {"sampler": self._result(items_per_s=600.0, cpu_us_per_item=9.0, p99_ms=25.0)}
+        self.assertEqual(compare(results, baseline), ["sampler: p99_ms 25 vs baseline 10 (threshold 100%)"])
+
+    def test_calibrated(self):
+        # The baseline host took 2x as long on the calibration workload.
+        baseline = {"calibration_s": 0.2, "benchmarks": {"sampler": self._result()}}
+        faster = {"sampler": self._result(items_per_s=1500.0, cpu_us_per_item=3.0, p99_ms=100.0)}
+        self.assertEqual(compare(faster, baseline, 0.1), [])
+        self.assertEqual(len(compare(faster, baseline, 0.05)), 2)
+        regressions = compare({"sampler": self._result(items_per_s=1300.0, cpu_us_per_item=2.5)}, baseline, 0.1)
+        self.assertEqual(regressions, ["sampler: items_per_s 1300 vs baseline 2000 (threshold 30%, scaled x2.00 for this host)"])
+        # Without a calibration on either side, results compare as they are.
+        self.assertEqual(compare(faster, {"benchmarks": baseline["benchmarks"]}, 0.1), [])
+        self.assertEqual(compare(faster, baseline), [])
+
+
+class TestMeasure(unittest.TestCase):
+
+    def test_measure(self):
+        calls = []
+        closed = []
+        @contextlib.contextmanager
+        def setup(data):
+            yield lambda: calls.append(1) or 10
+            closed.append(1)
+
+        with patch.dict(benchmark_suite.BENCHMARKS, {"test": setup}):
+            result = benchmark_suite.measure("test", None, 3)
+
+        # One warm-up run and three measured ones.
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(closed, [1])
+        self.assertEqual(result["items"], 30)
+        self.assertGreater(result["items_per_s"], 0)
+        self.assertGreater(result["peak_rss_mb"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
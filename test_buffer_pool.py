@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+import buffer_pool
+from buffer_pool import BufferPool
+
+
+class TestBufferPool(unittest.TestCase):
+
+    def test_release_by_chunk(self):
+        pool = BufferPool(2, 4)
+        buf = pool.acquire()
+        buf[:2] = b"ab"
+        chunk = memoryview(buf)[:2]
+        self.assertEqual(bytes(chunk), b"ab")
+        self.assertEqual(pool.available(), 1)
+        buffer_pool.release(chunk)
+        self.assertEqual(pool.available(), 2)
+
+    def test_release_ignores_unpooled_chunks(self):
+        buffer_pool.release(b"ab")
+        buffer_pool.release(memoryview(bytearray(2)))
+        buffer_pool.release(None)
+
+    def test_acquire_blocks_until_released(self):
+        exhausted = []
+        pool = BufferPool(1, 4, on_exhausted=lambda: exhausted.append(1))
+        buf = pool.acquire()
+        acquired = threading.Event()
+
+        def acquire():
+            pool.acquire()
+            acquired.set()
+
+        t = threading.Thread(target=acquire)
+        t.start()
+        time.sleep(0.05)
+        self.assertFalse(acquired.is_set())
+        pool.release(buf)
+        t.join(timeout=5)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(pool.exhausted, 1)
+        self.assertEqual(exhausted, [1])
+
+    def test_before_wait_hook(self):
+        pool = BufferPool(1, 4)
+        held = [pool.acquire()]
+        flushed = []
+
+        def flush():
+            flushed.append(1)
+            pool.release(held.pop())
+
+        with buffer_pool.before_wait(flush):
+            buf = pool.acquire()
+        # The hook freed a buffer, so there was no wait.
+        self.assertEqual(flushed, [1])
+        self.assertEqual(pool.exhausted, 0)
+        # Only within the block.
+        pool.release(buf)
+        pool.release(pool.acquire())
+        self.assertEqual(flushed, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
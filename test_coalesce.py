@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from coalesce import Range, coalesce, windows
+
+
+class TestCoalesce(unittest.TestCase):
+
+    def test_adjacent_samples_merge(self):
+        ranges = coalesce([("a", 4), ("a", 0), ("a", 8)], 4, 0, 1024)
+        self.assertEqual(ranges, [Range("a", 0, 12, [0, 4, 8])])
+
+    def test_gap_limit(self):
+        ranges = coalesce([("a", 0), ("a", 6), ("a", 20)], 4, 2, 1024)
+        self.assertEqual(ranges, [Range("a", 0, 10, [0, 6]), Range("a", 20, 4, [20])])
+
+    def test_size_limit(self):
+        ranges = coalesce([("a", 0), ("a", 4), ("a", 8)], 4, 0, 8)
+        self.assertEqual(ranges, [Range("a", 0, 8, [0, 4]), Range("a", 8, 4, [8])])
+
+    def test_objects_never_merge(self):
+        ranges = coalesce([("b", 4), ("a", 0), ("b", 0)], 4, 100, 1024)
+        self.assertEqual(ranges, [Range("a", 0, 4, [0]), Range("b", 0, 8, [0, 4])])
+
+    def test_duplicates_and_overlaps(self):
+        ranges = coalesce([("a", 0), ("a", 0), ("a", 2)], 4, 0, 1024)
+        self.assertEqual(ranges, [Range("a", 0, 6, [0, 0, 2])])
+
+    def test_oversized_sample_gets_own_range(self):
+        ranges = coalesce([("a", 0), ("a", 16)], 16, 0, 8)
+        self.assertEqual(ranges, [Range("a", 0, 16, [0]), Range("a", 16, 16, [16])])
+
+
+class TestWindows(unittest.TestCase):
+
+    def test_windows(self):
+        self.assertEqual(list(windows(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(windows([], 2)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
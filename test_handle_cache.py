@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import pyarrow.fs as fs
+
+from handle_cache import HandleCache
+
+
+class CountingFileSystem(object):
+    """Counts the opens and closes of a local filesystem."""
+    def __init__(self):
+        self.opened = []
+        self.closed = []
+        self._fs = fs.LocalFileSystem()
+
+    def open_input_file(self, name):
+        f = self._fs.open_input_file(name)
+        self.opened.append(name)
+        close = f.close
+        def counted_close():
+            self.closed.append(name)
+            close()
+        return type("File", (), {
+            "read_at": lambda _, n, o: f.read_at(n, o),
+            "seek": lambda _, o: f.seek(o),
+            "readinto": lambda _, b: f.readinto(b),
+            "size": lambda _: f.size(),
+            "close": lambda _: counted_close(),
+        })()
+
+
+class TestHandleCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.names = []
+        for i in range(3):
+            name = os.path.join(self.test_dir, f"file{i}")
+            with open(name, "wb") as f:
+                f.write(bytes([ord("a") + i]) * 8)
+            self.names.append(name)
+        self.fs = CountingFileSystem()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_opens_lazily_once(self):
+        cache = HandleCache(self.fs, 2)
+        self.assertEqual(self.fs.opened, [])
+        self.assertEqual(cache.read_at(self.names[0], 2, 1), b"aa")
+        self.assertEqual(cache.read_at(self.names[0], 2, 6), b"aa")
+        buf = bytearray(4)
+        self.assertEqual(cache.readinto_at(self.names[0], buf, 6), 2)
+        self.assertEqual(bytes(buf[:2]), b"aa")
+        self.assertEqual(cache.size(self.names[0]), 8)
+        # The handle, and this thread's stream for readinto.
+        self.assertEqual(self.fs.opened, [self.names[0]] * 2)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions), (3, 1, 0))
+
+    def test_lru_eviction(self):
+        cache = HandleCache(self.fs, 2)
+        cache.read_at(self.names[0], 1, 0)
+        cache.read_at(self.names[1], 1, 0)
+        # Touch the first, the second is now the least recently used.
+        cache.read_at(self.names[0], 1, 0)
+        self.assertEqual(cache.read_at(self.names[2], 1, 0), b"c")
+        self.assertEqual(self.fs.closed, [self.names[1]])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        cache.close()
+        self.assertEqual(sorted(self.fs.closed), sorted(self.names))
+
+    def test_evicted_in_use_closes_on_release(self):
+        cache = HandleCache(self.fs, 1)
+        handle = cache._acquire(self.names[0])
+        cache.read_at(self.names[1], 1, 0)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(self.fs.closed, [])
+        self.assertEqual(handle.file.read_at(1, 0), b"a")
+        cache._release(handle)
+        self.assertEqual(self.fs.closed, [self.names[0]])
+
+    def test_shared_by_threads(self):
+        cache = HandleCache(self.fs, 2)
+        errors = []
+
+        def read(i):
+            try:
+                for j in range(200):
+                    name = self.names[(i + j) % 3]
+                    buf = bytearray(1)
+                    cache.readinto_at(name, buf, j % 8)
+                    if buf[0] != ord("a") + self.names.index(name):
+                        errors.append(name)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        cache.close()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.hits + cache.misses, 800)
+        self.assertEqual(sorted(self.fs.opened), sorted(self.fs.closed))
+
+    def test_readinto_stream_per_thread(self):
+        cache = HandleCache(self.fs, 2)
+        with cache.open(self.names[0]) as handle:
+            reading = threading.Barrier(4)
+            results = []
+
+            def read(offset):
+                with cache.open(self.names[0], readinto=True) as h:
+                    buf = bytearray(2)
+                    # All four threads are inside a read at once.
+                    reading.wait(timeout=5)
+                    results.append(h.readinto_at(buf, offset))
+
+            threads = [threading.Thread(target=read, args=(i,)) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(sorted(results), [2, 2, 2, 2])
+            self.assertEqual(len(handle.streams), 4)
+        cache.close()
+        # The handle and its four streams.
+        self.assertEqual(len(self.fs.closed), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import histogram
+from histogram import LogHistogram, ThreadHistograms
+
+
+class TestLogHistogram(unittest.TestCase):
+
+    def test_quantiles_within_relative_error(self):
+        rng = random.Random(1)
+        values = [rng.lognormvariate(0, 2) for _ in range(20000)]
+        h = LogHistogram(relative_error=0.01)
+        for v in values:
+            h.record(v)
+        values.sort()
+        for q in [0, 0.5, 0.9, 0.99, 0.999, 1]:
+            exact = values[int(q * (len(values) - 1))]
+            if exact > h.min_value:
+                self.assertAlmostEqual(h.quantile(q), exact, delta=exact * 0.01)
+        self.assertEqual(h.count, 20000)
+        self.assertAlmostEqual(h.mean(), sum(values) / len(values))
+
+    def test_record_many(self):
+        values = [0, 0.0005, 0.5, 1, 2.5, 1e9]
+        one_by_one, at_once = LogHistogram(), LogHistogram()
+        for v in values:
+            one_by_one.record(v)
+        at_once.record_many(values)
+        self.assertEqual(at_once.counts, one_by_one.counts)
+        self.assertEqual(at_once.total, one_by_one.total)
+
+    def test_out_of_range_values(self):
+        h = LogHistogram(min_value=1, max_value=100)
+        for v in [0, 0.5, 1000]:
+            h.record(v)
+        self.assertEqual(h.counts[0], 2)
+        self.assertEqual(h.counts[-1], 1)
+
+    def test_empty(self):
+        h = LogHistogram()
+        self.assertEqual(h.count, 0)
+        self.assertEqual(h.quantile(0.99), 0.0)
+        self.assertEqual(h.mean(), 0.0)
+
+    def test_merge_and_delta(self):
+        a, b = LogHistogram(), LogHistogram()
+        for v in [1, 2, 3]:
+            a.record(v)
+        before = a.copy()
+        b.record(10)
+        a.merge(b)
+        self.assertEqual(a.count, 4)
+        self.assertAlmostEqual(a.quantile(1), 10, delta=0.1)
+        delta = a.delta(before)
+        self.assertEqual(delta.count, 1)
+        self.assertEqual(delta.total, 10)
+        with self.assertRaises(ValueError):
+            a.merge(LogHistogram(relative_error=0.05))
+
+    def test_serialization(self):
+        h = LogHistogram()
+        for v in [0.01, 0.5, 0.5, 3, 4000]:
+            h.record(v)
+        data = h.to_bytes()
+        # Only the non-empty buckets are stored.
+        self.assertLess(len(data), 1024)
+        restored = LogHistogram.from_bytes(data)
+        self.assertEqual(restored.counts, h.counts)
+        self.assertEqual(restored.total, h.total)
+
+        test_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(test_dir, "metrics.hist")
+            histogram.write(path, h)
+            self.assertEqual(histogram.read(path).counts, h.counts)
+        finally:
+            shutil.rmtree(test_dir)
+
+    def test_all_reduce(self):
+        h = LogHistogram()
+        h.record(2)
+        def all_reduce(tensor, op=None):
+            # Two ranks holding the same histogram.
+            tensor.mul_(2)
+        with patch('histogram.td.all_reduce', side_effect=all_reduce):
+            merged = histogram.all_reduce(h)
+        self.assertEqual(merged.count, 2)
+        self.assertEqual(merged.total, 4)
+
+
+class TestThreadHistograms(unittest.TestCase):
+
+    def test_snapshot_merges_threads(self):
+        histograms = ThreadHistograms()
+
+        def record():
+            for _ in range(1000):
+                histograms.record(1.0)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(histograms.snapshot().count, 4000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import manifest
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.manifest_dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.data_dir, "subdir"))
+        with open(os.path.join(self.data_dir, "file1.txt"), "w") as f:
+            f.write("test data")
+        with open(os.path.join(self.data_dir, "file2.txt"), "w") as f:
+            f.write("more test data")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+        shutil.rmtree(self.manifest_dir)
+
+    def test_list_prefix_skips_directories(self):
+        listed = manifest.list_prefix(self.data_dir)
+
+        sizes = dict(zip([os.path.basename(n) for n in listed.names], listed.sizes))
+        self.assertEqual(sizes, {"file1.txt": 9, "file2.txt": 14})
+
+    def test_write_and_read_round_trip(self):
+        listed = manifest.list_prefix(self.data_dir)
+        path = manifest.manifest_path(self.manifest_dir, self.data_dir)
+        manifest.write(path, listed)
+
+        stored, digest = manifest.read(path)
+        self.assertEqual(stored.prefix, self.data_dir)
+        self.assertEqual(stored.names, listed.names)
+        self.assertEqual(stored.sizes, listed.sizes)
+        self.assertEqual(digest, listed.digest())
+
+    def test_read_missing(self):
+        self.assertIsNone(manifest.read(os.path.join(self.manifest_dir, "missing.parquet")))
+
+    def test_load_skips_listing_once_stored(self):
+        first = manifest.load(self.manifest_dir, self.data_dir)
+
+        with patch("manifest.list_prefix") as mock_list_prefix:
+            second = manifest.load(self.manifest_dir, self.data_dir)
+            mock_list_prefix.assert_not_called()
+        self.assertEqual(first.names, second.names)
+
+    def test_load_validate_rebuilds_on_change(self):
+        manifest.load(self.manifest_dir, self.data_dir)
+        with open(os.path.join(self.data_dir, "file3.txt"), "w") as f:
+            f.write("new")
+
+        self.assertEqual(len(manifest.load(self.manifest_dir, self.data_dir, "never").names), 2)
+        self.assertEqual(len(manifest.load(self.manifest_dir, self.data_dir, "validate").names), 3)
+        self.assertEqual(len(manifest.load(self.manifest_dir, self.data_dir, "never").names), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
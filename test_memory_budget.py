@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from memory_budget import MemoryBudget
+
+
+class TestMemoryBudget(unittest.TestCase):
+
+    def test_blocks_until_released(self):
+        budget = MemoryBudget(10)
+        acquired = threading.Event()
+
+        def reserve():
+            with budget.reserve(6):
+                acquired.set()
+
+        with budget.reserve(6):
+            t = threading.Thread(target=reserve)
+            t.start()
+            time.sleep(0.05)
+            self.assertFalse(acquired.is_set())
+        t.join(timeout=5)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(budget.peak, 6)
+        self.assertEqual(budget.in_use, 0)
+
+    def test_oversized_request_is_clamped(self):
+        budget = MemoryBudget(10)
+        with budget.reserve(100):
+            self.assertEqual(budget.in_use, 10)
+        self.assertEqual(budget.in_use, 0)
+
+    def test_no_limit(self):
+        budget = MemoryBudget(0)
+        with budget.reserve(100), budget.reserve(100):
+            self.assertEqual(budget.in_use, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
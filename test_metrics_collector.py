@@ -19,11 +19,19 @@ Command to run the unit test:
 """
 
 import unittest
-from metrics_collector import analyze_metrics
+from metrics_collector import analyze_metrics, stream_metrics
+import histogram
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pandas as pd
 from unittest.mock import patch
 from google.cloud import storage
 from io import StringIO
+import os
+import shutil
+import tempfile
+import threading
+from metrics_logger import ArrowMetricsLogger, AsyncMetricsLogger
 
 class TestAnalyzeMetrics(unittest.TestCase):
 
@@ -120,6 +128,98 @@ class TestAnalyzeMetrics(unittest.TestCase):
         # Assert that the result is None
         self.assertIsNone(result_df)
         
+    def test_analyze_metrics_parquet(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            for rank in range(2):
+                logger = ArrowMetricsLogger(file_name=os.path.join(test_dir, f"metrics-{rank}.parquet"), rank=rank)
+                logger.log_metric(10 + rank, "obj", 0, 4, "sequential")
+                logger.close()
+            result_df = analyze_metrics(os.path.join(test_dir, "*.parquet"), False)
+        finally:
+            shutil.rmtree(test_dir)
+
+        self.assertEqual(sorted(result_df['sample_lat'].tolist()), [10, 11])
+        self.assertEqual(sorted(result_df['rank'].tolist()), [0, 1])
+        self.assertEqual(result_df['reader'].tolist(), ["sequential", "sequential"])
+
+    def test_analyze_metrics_filter_multi_thread_csv(self):
+        def log(logger, timestamps):
+            for t in timestamps:
+                with patch('metrics_logger.time.time', return_value=t):
+                    logger.log_metric(t)
+
+        test_dir = tempfile.mkdtemp()
+        try:
+            # Rank 0 logs from two threads, its file holds 8, 9 then 0, 1.
+            logger = AsyncMetricsLogger(file_name=os.path.join(test_dir, "metrics-0.csv"))
+            for timestamps in [[8, 9], [0, 1]]:
+                t = threading.Thread(target=log, args=(logger, timestamps))
+                t.start()
+                t.join()
+            logger.close()
+            logger = AsyncMetricsLogger(file_name=os.path.join(test_dir, "metrics-1.csv"))
+            log(logger, [0.5, 8.5])
+            logger.close()
+            with open(os.path.join(test_dir, "metrics-0.csv")) as f:
+                self.assertEqual(f.read().split()[1:], ["8.0,8", "9.0,9", "0.0,0", "1.0,1"])
+            result_df = analyze_metrics(os.path.join(test_dir, "*.csv"), True)
+        finally:
+            shutil.rmtree(test_dir)
+
+        # The window common to both ranks is [0.5, 8.5].
+        self.assertEqual(sorted(result_df['sample_lat'].tolist()), [0.5, 1, 8, 8.5])
+
+    def test_stream_metrics_relative_error_mismatch(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            hist = histogram.LogHistogram(relative_error=0.05)
+            hist.record(3.0)
+            histogram.write(os.path.join(test_dir, "metrics-0.hist"), hist)
+            with self.assertLogs("metrics_collector", level="ERROR") as logs:
+                result = stream_metrics(os.path.join(test_dir, "*.hist"), relative_error=0.01)
+            matching = stream_metrics(os.path.join(test_dir, "*.hist"), relative_error=0.05)
+        finally:
+            shutil.rmtree(test_dir)
+
+        self.assertIsNone(result)
+        self.assertIn("--relative-error 0.05", logs.output[0])
+        self.assertEqual(matching.count, 1)
+
+    def test_stream_metrics(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            # Two ranks overlapping between timestamps 5 and 10.
+            for rank, start in enumerate([0, 5]):
+                timestamps = [start + i * 0.5 for i in range(21)]
+                latencies = [1.0 if t < 5 or t > 10 else 2.0 for t in timestamps]
+                pq.write_table(pa.table({"timestamp": timestamps, "sample_lat": latencies}),
+                               os.path.join(test_dir, f"metrics-{rank}.parquet"), row_group_size=4)
+                pd.DataFrame({"timestamp": timestamps, "sample_lat": latencies}).to_csv(
+                    os.path.join(test_dir, f"metrics-{rank}.csv"), index=False)
+            hist = histogram.LogHistogram()
+            hist.record(3.0)
+            histogram.write(os.path.join(test_dir, "metrics-2.hist"), hist)
+
+            filtered = stream_metrics(os.path.join(test_dir, "*.parquet"), True)
+            unfiltered = stream_metrics(os.path.join(test_dir, "*.parquet"), False)
+            csv = stream_metrics(os.path.join(test_dir, "*.csv"), True)
+            merged = stream_metrics(os.path.join(test_dir, "metrics-*"), True)
+            missing = stream_metrics(os.path.join(test_dir, "*.arrow"), True)
+        finally:
+            shutil.rmtree(test_dir)
+
+        # Only the 11 samples of each rank within [5, 10] are kept.
+        self.assertEqual(filtered.count, 22)
+        self.assertAlmostEqual(filtered.quantile(0), 2.0, delta=0.02)
+        self.assertAlmostEqual(filtered.quantile(1), 2.0, delta=0.02)
+        self.assertEqual(unfiltered.count, 42)
+        self.assertEqual(csv.counts, filtered.counts)
+        # Histogram files are merged as they are.
+        self.assertEqual(merged.count, 22 * 2 + 1)
+        self.assertAlmostEqual(merged.quantile(1), 3.0, delta=0.03)
+        self.assertIsNone(missing)
+
 
 if __name__ == '__main__':
     loader = unittest.TestLoader()
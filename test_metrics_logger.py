@@ -20,8 +20,12 @@ Command to run the unit test:
 
 import unittest
 import os
+import threading
 import time
-from metrics_logger import AsyncMetricsLogger, NoOpMetricsLogger
+from metrics_logger import AsyncMetricsLogger, NoOpMetricsLogger, HistogramMetricsLogger, ArrowMetricsLogger
+import pyarrow as pa
+import pyarrow.parquet as pq
+import histogram
 
 class TestAsyncMetricsLogger(unittest.TestCase):
 
@@ -63,6 +67,28 @@ class TestAsyncMetricsLogger(unittest.TestCase):
         # Clean up the temporary csv file
         os.remove(file_name)
 
+    def test_logging_from_threads(self):
+        """Tests that metrics logged by many threads across flushes are all written."""
+        file_name = "test_metrics_threads.csv"
+        logger = AsyncMetricsLogger(file_name=file_name, flush_interval=0.001)
+
+        def log():
+            for i in range(2000):
+                logger.log_metric(i + 0.5)
+
+        threads = [threading.Thread(target=log) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        logger.close()
+
+        with open(file_name, "r") as csvfile:
+            rows = [line.strip().split(",") for line in csvfile.readlines()[1:]]
+        os.remove(file_name)
+        self.assertEqual(len(rows), 8000)
+        self.assertEqual(sorted(float(r[1]) for r in rows), sorted([i + 0.5 for i in range(2000)] * 4))
+
 class TestNoOpMetricsLogger(unittest.TestCase):
 
     def test_no_op_metrics_logger(self):
@@ -79,3 +105,67 @@ class TestNoOpMetricsLogger(unittest.TestCase):
         # Assert that the file was not created.
         self.assertFalse(os.path.exists(file_name))
 
+
+class TestHistogramMetricsLogger(unittest.TestCase):
+
+    def test_step_epoch_and_file(self):
+        file_name = "test_metrics.hist"
+        logger = HistogramMetricsLogger(file_name=file_name)
+        try:
+            logger.log_metric(1)
+            logger.log_metric(2)
+            self.assertEqual(logger.step().count, 2)
+            logger.log_metric(3)
+            step = logger.step()
+            self.assertEqual(step.count, 1)
+            self.assertAlmostEqual(step.quantile(0.5), 3, delta=0.03)
+            self.assertEqual(logger.epoch().count, 3)
+            logger.log_metric(4)
+            self.assertEqual(logger.epoch().count, 1)
+            logger.close()
+            self.assertEqual(histogram.read(file_name).count, 4)
+        finally:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+
+class TestArrowMetricsLogger(unittest.TestCase):
+
+    def _log(self, logger):
+        logger.log_metric(400, "obj1", 0, 1024, "sequential")
+        logger.log_metric(300, "obj2", 2048, 512, "full_random")
+        logger.close()
+
+    def test_parquet(self):
+        file_name = "test_metrics.parquet"
+        try:
+            self._log(ArrowMetricsLogger(file_name=file_name, rank=3))
+            table = pq.read_table(file_name)
+        finally:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.column("sample_lat").to_pylist(), [400, 300])
+        self.assertEqual(table.column("object").to_pylist(), ["obj1", "obj2"])
+        self.assertEqual(table.column("offset").to_pylist(), [0, 2048])
+        self.assertEqual(table.column("bytes").to_pylist(), [1024, 512])
+        self.assertEqual(table.column("rank").to_pylist(), [3, 3])
+        self.assertEqual(table.column("reader").to_pylist(), ["sequential", "full_random"])
+        self.assertTrue(all(t > 0 for t in table.column("thread").to_pylist()))
+
+    def test_ipc_flushes_batches(self):
+        file_name = "test_metrics.arrow"
+        try:
+            logger = ArrowMetricsLogger(file_name=file_name, flush_interval=0.01, file_format="ipc")
+            logger.log_metric(1)
+            time.sleep(0.2)
+            self._log(logger)
+            reader = pa.ipc.open_file(file_name)
+            batches = reader.num_record_batches
+            table = reader.read_all()
+        finally:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        self.assertEqual(batches, 2)
+        self.assertEqual(table.column("sample_lat").to_pylist(), [1, 400, 300])
+        self.assertEqual(table.column("object").to_pylist(), [None, "obj1", "obj2"])
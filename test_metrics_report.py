@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+import metrics_report
+from metrics_collector import report_metrics
+from metrics_report import WindowedReport
+
+
+class TestWindowedReport(unittest.TestCase):
+
+    def test_windows_and_ranks(self):
+        report = WindowedReport(start=100, end=119, window=10)
+        # Rank 0: 2 samples in the first window, 1 in the second.
+        report.add([100, 105, 115], [1.0, 1.0, 8.0], [10, 20, -1], rank=0)
+        # Ranks 1 and 2 in a single batch.
+        report.add([101, 112], [2.0, 4.0], ranks=[1, 2])
+        result = report.to_dict()
+
+        self.assertEqual(result["window_s"], 10)
+        overall = result["overall"]
+        self.assertEqual([row["samples"] for row in overall], [3, 2])
+        self.assertEqual([row["samples_per_s"] for row in overall], [0.3, 0.2])
+        self.assertEqual(overall[0]["bytes_per_s"], 3.0)
+        self.assertAlmostEqual(overall[1]["p50_ms"], 4.0, delta=0.1)
+        self.assertAlmostEqual(result["ranks"]["0"][1]["p99_ms"], 8.0, delta=0.2)
+        self.assertEqual(sorted(result["ranks"]), ["0", "1", "2"])
+        self.assertEqual([row["samples"] for row in result["ranks"]["2"]], [0, 1])
+        self.assertIsNone(result["ranks"]["2"][0]["p50_ms"])
+        self.assertAlmostEqual(result["ranks"]["1"][0]["p50_ms"], 2.0, delta=0.05)
+
+        table = metrics_report.format_table(result)
+        self.assertIn("samples/s", table)
+        page = metrics_report.to_html(result)
+        self.assertEqual(page.count("<svg"), 2)
+        self.assertIn("<polyline", page)
+
+    def test_keeps_only_seen_cells(self):
+        report = WindowedReport(start=0, end=100000, window=1)
+        report.add([10, 10, 500], [1.0, 1.0, 2.0])
+        report.add([10], [4.0])
+        indices, counts = report.cells[0]
+        self.assertEqual(len(indices), 3)
+        self.assertEqual(sorted(counts), [1, 1, 2])
+        rows = report.to_dict()["overall"]
+        self.assertEqual(rows[10]["samples"], 3)
+        self.assertAlmostEqual(rows[10]["p50_ms"], 1.0, delta=0.05)
+        self.assertAlmostEqual(rows[500]["p50_ms"], 2.0, delta=0.05)
+
+    def test_report_metrics_timestamp_filter(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            pd.DataFrame({"timestamp": [0.5, 1.5, 2.5], "sample_lat": [1.0, 2.0, 3.0]}).to_csv(
+                os.path.join(test_dir, "metrics-0.csv"), index=False)
+            pd.DataFrame({"timestamp": [1.5, 3.5], "sample_lat": [2.0, 4.0]}).to_csv(
+                os.path.join(test_dir, "metrics-1.csv"), index=False)
+            result = report_metrics(os.path.join(test_dir, "*.csv"), window=1, timestamp_filter=True, relative_error=0.05)
+        finally:
+            shutil.rmtree(test_dir)
+
+        # Only [1.5, 2.5], common to both files, is reported.
+        self.assertEqual(result["start_timestamp"], 1.5)
+        self.assertEqual(result["relative_error"], 0.05)
+        self.assertEqual([row["samples"] for row in result["overall"]], [2, 1])
+
+    def test_report_metrics_from_csv(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            for rank in range(2):
+                pd.DataFrame({"timestamp": [0.5, 1.5, 2.5], "sample_lat": [1.0, 2.0, 3.0 + rank]}).to_csv(
+                    os.path.join(test_dir, f"metrics-{rank}.csv"), index=False)
+            result = report_metrics(os.path.join(test_dir, "*.csv"), window=1)
+            metrics_report.write(result, os.path.join(test_dir, "report.json"), os.path.join(test_dir, "report.html"))
+            with open(os.path.join(test_dir, "report.json")) as f:
+                written = json.load(f)
+            self.assertTrue(os.path.exists(os.path.join(test_dir, "report.html")))
+        finally:
+            shutil.rmtree(test_dir)
+
+        # CSV files carry no rank, each file is one.
+        self.assertEqual(sorted(result["ranks"]), ["0", "1"])
+        self.assertEqual([row["samples"] for row in result["overall"]], [2, 2, 2])
+        self.assertAlmostEqual(result["ranks"]["1"][2]["p50_ms"], 4.0, delta=0.1)
+        self.assertEqual(written, json.loads(json.dumps(result)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import threading
+import unittest
+from unittest.mock import patch
+
+import pacing
+from pacing import Pacer
+
+
+class TestPacer(unittest.TestCase):
+
+    def test_constant_schedule(self):
+        clock = [10**9]
+        def sleep(seconds):
+            clock[0] += int(seconds * 1e9)
+        pacer = Pacer(1000)
+        with patch('pacing.time.monotonic_ns', side_effect=lambda: clock[0]), \
+                patch('pacing.time.sleep', side_effect=sleep):
+            slots = [pacer.wait() for _ in range(5)]
+        self.assertEqual([b - a for a, b in zip(slots, slots[1:])], [1000000] * 4)
+        # Every read waited for its slot, none was backlogged.
+        self.assertEqual(clock[0], slots[-1])
+        self.assertEqual(pacer.issued, 5)
+        self.assertEqual(pacer.backlogged, 0)
+
+    def test_poisson_schedule_mean(self):
+        pacer = Pacer(1000, "poisson", seed=1)
+        with patch('pacing.time.sleep'):
+            slots = [pacer.wait() for _ in range(2001)]
+        mean_gap = (slots[-1] - slots[0]) / 2000
+        self.assertAlmostEqual(mean_gap, 1000000, delta=100000)
+        self.assertGreater(len(set(b - a for a, b in zip(slots, slots[1:]))), 1)
+
+    def test_backlog_when_readers_fall_behind(self):
+        pacer = Pacer(1000)
+        first = pacer.wait()
+        # Readers were busy for 5 intervals, the next reads are all due.
+        with patch('pacing.time.monotonic_ns', return_value=first + 5000000):
+            late = pacer.wait()
+        self.assertEqual(late, first + 1000000)
+        self.assertEqual(pacer.backlogged, 1)
+        self.assertEqual(pacer.max_backlog, 5)
+
+    def test_shared_between_threads(self):
+        pacer = Pacer(2000)
+        slots = []
+        lock = threading.Lock()
+
+        def read():
+            for _ in range(10):
+                s = pacer.wait()
+                with lock:
+                    slots.append(s)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+        slots.sort()
+        self.assertEqual(len(set(slots)), 40)
+        self.assertEqual(slots[-1] - slots[0], 39 * 500000)
+
+    def test_missed_deadlines(self):
+        pacer = Pacer(1000, deadline_ns=5000000)
+        self.assertFalse(pacer.done(4000000))
+        self.assertTrue(pacer.done(6000000))
+        self.assertEqual(pacer.missed_deadlines, 1)
+        self.assertFalse(Pacer(1000).done(10**12))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Pacer(0)
+        with self.assertRaises(ValueError):
+            Pacer(10, "bursty")
+
+    def test_target_rate(self):
+        args = argparse.Namespace(target_rate=0, target_bytes_rate=4096, sample_size=1024)
+        self.assertEqual(pacing.target_rate(args), 4)
+        args.target_rate = 10
+        self.assertEqual(pacing.target_rate(args), 10)
+        args.target_rate = args.target_bytes_rate = 0
+        self.assertEqual(pacing.target_rate(args), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+import unittest
+
+from reader_pool import ReaderPool
+
+
+class TestReaderPool(unittest.TestCase):
+
+    def test_threads_and_state_live_across_epochs(self):
+        pool = ReaderPool(2)
+        seen = []
+        lock = threading.Lock()
+        done = threading.Barrier(3)
+
+        def target(worker_id, state, cancelled):
+            state["runs"] = state.get("runs", 0) + 1
+            with lock:
+                seen.append((worker_id, threading.current_thread().name, state["runs"]))
+            done.wait()
+
+        try:
+            for _ in range(2):
+                pool.run(target)
+                done.wait()
+        finally:
+            pool.close()
+
+        self.assertEqual(
+            sorted(seen), [(0, "reader-0", 1), (0, "reader-0", 2), (1, "reader-1", 1), (1, "reader-1", 2)]
+        )
+
+    def test_cancel_and_close_state(self):
+        pool = ReaderPool(1)
+        started = threading.Event()
+        closed = []
+
+        class Handle:
+            def close(self):
+                closed.append(True)
+
+        def target(worker_id, state, cancelled):
+            state["handle"] = Handle()
+            started.set()
+            cancelled.wait()
+
+        cancelled = pool.run(target)
+        started.wait()
+        cancelled.set()
+        pool.close()
+        self.assertEqual(closed, [True])
+
+    def test_failed_work_keeps_thread(self):
+        pool = ReaderPool(1)
+        ran = threading.Event()
+
+        def fail(worker_id, state, cancelled):
+            raise ValueError("failed")
+
+        pool.run(fail)
+        pool.run(lambda worker_id, state, cancelled: ran.set())
+        self.assertTrue(ran.wait(5))
+        pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
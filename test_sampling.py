@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+
+from sampling import SampleIndex, Samples, available_samples, index_of, select_samples
+from sampling import dataset_fingerprint, plan_checksum
+
+
+class TestSampleIndex(unittest.TestCase):
+
+    def test_offsets_are_sorted_per_object(self):
+        index = SampleIndex.from_pairs([("a", 8), ("b", 4), ("a", 0), ("a", 8), ("b", 0)])
+
+        self.assertEqual(index.offsets("a").tolist(), [0, 8, 8])
+        self.assertEqual(index.offsets("b").tolist(), [0, 4])
+        self.assertEqual(index.count("a"), 3)
+        self.assertEqual(index.count("b"), 2)
+
+    def test_unknown_object(self):
+        index = SampleIndex.from_pairs([("a", 0)])
+
+        self.assertEqual(index.offsets("missing").tolist(), [])
+        self.assertEqual(index.count("missing"), 0)
+
+    def test_empty(self):
+        index = SampleIndex.from_pairs([])
+
+        self.assertEqual(index.count("a"), 0)
+
+
+class TestSamples(unittest.TestCase):
+
+    def test_sequence_and_prebuilt_index(self):
+        samples = Samples.from_pairs([("a", 4), ("b", 0), ("a", 0)])
+
+        self.assertEqual(len(samples), 3)
+        self.assertEqual(samples[1], ("b", 0))
+        self.assertEqual(list(samples), [("a", 4), ("b", 0), ("a", 0)])
+        self.assertIs(index_of(samples), samples.index)
+
+    def test_index_of_plain_list(self):
+        index = index_of([("a", 4), ("a", 0)])
+
+        self.assertEqual(index.offsets("a").tolist(), [0, 4])
+
+
+class TestSelectSamples(unittest.TestCase):
+
+    def test_offsets_are_aligned_and_in_range(self):
+        sizes = [10, 0, 4, 7]
+        samples = select_samples(["a", "b", "c", "d"], sizes, 4, 1000, np.random.default_rng(1))
+
+        self.assertEqual(len(samples), 1000)
+        for name, offset in samples:
+            self.assertEqual(offset % 4, 0)
+            self.assertLess(offset, dict(zip("abcd", sizes))[name])
+        # The empty object is never selected.
+        self.assertEqual(samples.index.count("b"), 0)
+
+    def test_uniform_over_all_offsets(self):
+        # "a" has 3 offsets and "b" has 1, draws follow the offset count.
+        samples = select_samples(["a", "b"], [9, 3], 3, 40000, np.random.default_rng(7))
+
+        self.assertAlmostEqual(samples.index.count("a") / 40000, 0.75, delta=0.02)
+        self.assertEqual(sorted(set(samples.index.offsets("a").tolist())), [0, 3, 6])
+
+    def test_no_samples_available(self):
+        with self.assertRaises(ValueError):
+            select_samples(["a"], [0], 4, 1)
+
+    def test_available_samples(self):
+        self.assertEqual(available_samples([10, 0, 4], 4), 4)
+
+
+class TestPlanDigests(unittest.TestCase):
+
+    def test_fingerprint_ignores_listing_order(self):
+        self.assertEqual(
+            dataset_fingerprint({"p": ["a", "b"], "q": ["c"]}),
+            dataset_fingerprint({"q": ["c"], "p": ["b", "a"]}),
+        )
+        self.assertNotEqual(
+            dataset_fingerprint({"p": ["a", "b"]}),
+            dataset_fingerprint({"p": ["a", "b", "c"]}),
+        )
+
+    def test_checksum_depends_on_plan(self):
+        samples = Samples(["a", "b"], [0, 1], [0, 4])
+
+        self.assertEqual(plan_checksum(["a", "b"], samples), plan_checksum(["a", "b"], Samples(["a", "b"], [0, 1], [0, 4])))
+        self.assertNotEqual(plan_checksum(["a", "b"], samples), plan_checksum(["b", "a"], samples))
+        self.assertNotEqual(plan_checksum(["a", "b"], samples), plan_checksum(["a", "b"], Samples(["a", "b"], [0, 1], [0, 8])))
+
+
+if __name__ == '__main__':
+    unittest.main()
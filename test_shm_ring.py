@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import unittest
+
+import shm_ring
+from shm_ring import SharedRingBuffer
+
+
+class TestSharedRingBuffer(unittest.TestCase):
+
+    def test_descriptor_round_trip(self):
+        ring = SharedRingBuffer(slots=4)
+        try:
+            ring.put(shm_ring.SAMPLE, 3, 1024, 5000, b"ignored", 7)
+            ring.put(shm_ring.DONE)
+            self.assertEqual(ring.get(), (shm_ring.SAMPLE, 3, 1024, 5000, None, 7))
+            self.assertEqual(ring.get()[0], shm_ring.DONE)
+        finally:
+            ring.close()
+
+    def test_payload_is_truncated_to_slot(self):
+        ring = SharedRingBuffer(slots=2, payload_size=4)
+        try:
+            ring.put(shm_ring.SAMPLE, 0, 0, 0, b"testing")
+            self.assertEqual(ring.get()[4], b"test")
+        finally:
+            ring.close()
+
+    def test_wraps_around_with_forked_producers(self):
+        ring = SharedRingBuffer(slots=3, payload_size=8)
+
+        def produce(worker_id):
+            for i in range(10):
+                ring.put(shm_ring.SAMPLE, worker_id, i, 0, b"%d-%d" % (worker_id, i))
+            ring.put(shm_ring.DONE)
+
+        ctx = multiprocessing.get_context("fork")
+        producers = [ctx.Process(target=produce, args=(w,)) for w in range(2)]
+        for p in producers:
+            p.start()
+        try:
+            received = []
+            running = len(producers)
+            while running:
+                kind, index, offset, _, payload, _ = ring.get()
+                if kind == shm_ring.DONE:
+                    running -= 1
+                    continue
+                self.assertEqual(payload, b"%d-%d" % (index, offset))
+                received.append((index, offset))
+            self.assertEqual(sorted(received), [(w, i) for w in range(2) for i in range(10)])
+        finally:
+            for p in producers:
+                p.join()
+            ring.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import unittest
+
+import pyarrow.fs as fs
+
+import simulated_fs
+from simulated_fs import LatencyModel, NullStorage, SimulatedHandler, SimulatedStorage, Throttle
+
+
+class TestLatencyModel(unittest.TestCase):
+
+    def test_means(self):
+        self.assertEqual(LatencyModel(0, "lognormal").sample(), 0)
+        self.assertEqual(LatencyModel(5).sample(), 0.005)
+        for distribution in ["exponential", "lognormal"]:
+            model = LatencyModel(10, distribution, sigma=0.5, seed=1)
+            samples = [model.sample() for _ in range(20000)]
+            self.assertAlmostEqual(statistics.mean(samples), 0.010, delta=0.0005)
+
+    def test_lognormal_tail_grows_with_sigma(self):
+        def p99(sigma):
+            model = LatencyModel(10, "lognormal", sigma=sigma, seed=1)
+            return sorted(model.sample() for _ in range(10000))[9900]
+        self.assertGreater(p99(1.5), 2 * p99(0.25))
+
+    def test_unknown_distribution(self):
+        with self.assertRaises(Exception):
+            LatencyModel(1, "uniform")
+
+
+class TestThrottle(unittest.TestCase):
+
+    def test_transfers_share_the_link(self):
+        throttle = Throttle(1000000)
+        start = time.monotonic()
+        for _ in range(3):
+            throttle.transfer(20000)
+        self.assertGreaterEqual(time.monotonic() - start, 0.06)
+
+
+class TestSimulatedStorage(unittest.TestCase):
+
+    def test_synthetic_objects(self):
+        storage = SimulatedStorage("synthetic", 3, 3 << 20, seed=1)
+        filesystem = fs.PyFileSystem(SimulatedHandler(storage))
+        names = storage.names()
+        self.assertEqual(names, ["synthetic/object-000000", "synthetic/object-000001", "synthetic/object-000002"])
+
+        with filesystem.open_input_file(names[1]) as f:
+            self.assertEqual(f.size(), 3 << 20)
+            # Reads across the repeated block and past the end.
+            data = f.read_at(2 << 20, (1 << 20) - 10)
+            self.assertEqual(len(data), 2 << 20)
+            self.assertEqual(data[10 : (1 << 20) + 10], f.read_at(1 << 20, 0))
+            self.assertEqual(len(f.read_at(100, (3 << 20) - 10)), 10)
+            buf = bytearray(4)
+            f.seek(10)
+            self.assertEqual(f.readinto(buf), 4)
+            self.assertEqual(bytes(buf), data[20:24])
+        # One open and four reads.
+        self.assertEqual(storage.requests, 5)
+
+    def test_local_directory(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            name = os.path.join(test_dir, "file1")
+            with open(name, "wb") as f:
+                f.write(b"testing_simulated_fs")
+            storage = simulated_fs.from_args(
+                f"sim://{test_dir}/",
+                type("Args", (), dict(
+                    sim_objects=0, sim_object_size=0, sim_latency_ms=1, sim_latency_distribution="fixed",
+                    sim_latency_sigma=1, sim_stream_bandwidth_mbps=0, sim_bandwidth_mbps=0, sim_error_rate=0,
+                ))(),
+            )
+            listing = simulated_fs.list_prefix(f"sim://{test_dir}/", storage)
+            self.assertEqual(listing.names, [name])
+            self.assertEqual(listing.sizes, [20])
+
+            filesystem = fs.PyFileSystem(SimulatedHandler(storage))
+            start = time.monotonic()
+            with filesystem.open_input_stream(name) as f:
+                self.assertEqual(f.read(), b"testing_simulated_fs")
+            # One open and one read, 1 ms each.
+            self.assertGreaterEqual(time.monotonic() - start, 0.002)
+            info = filesystem.get_file_info([name, name + "-missing"])
+            self.assertEqual([i.type for i in info], [fs.FileType.File, fs.FileType.NotFound])
+            with self.assertRaises(OSError):
+                filesystem.delete_file(name)
+        finally:
+            shutil.rmtree(test_dir)
+
+    def test_null_store(self):
+        args = type("Args", (), dict(sim_objects=2, sim_object_size=100))()
+        self.assertTrue(simulated_fs.is_simulated("null://"))
+        storage = simulated_fs.from_args("null://", args)
+        self.assertIsInstance(storage, NullStorage)
+        self.assertEqual(storage.names(), ["null/object-000000", "null/object-000001"])
+        self.assertEqual(bytes(storage.read("null/object-000001", 90, 20)), bytes(10))
+
+        with fs.PyFileSystem(SimulatedHandler(storage)).open_input_file("null/object-000000") as f:
+            self.assertEqual(f.read_at(10, 0), bytes(10))
+        self.assertEqual(storage.requests, 0)
+
+    def test_null_store_memory(self):
+        # A 1 TiB object is served from the shared block of zeros.
+        storage = NullStorage(1, 1 << 40)
+        name = storage.names()[0]
+        self.assertEqual(bytes(storage.read(name, (1 << 40) - 4, 8)), bytes(4))
+        self.assertIs(storage.read(name, 0, 16).obj, simulated_fs._ZEROS.obj)
+        # Reads larger than the block grow it.
+        self.assertEqual(len(storage.read(name, 0, 3 << 20)), 3 << 20)
+
+    def test_stream_bandwidth(self):
+        storage = SimulatedStorage("synthetic", 1, 1 << 20, stream_bytes_per_s=10 << 20)
+        f = fs.PyFileSystem(SimulatedHandler(storage)).open_input_file(storage.names()[0])
+        start = time.monotonic()
+        f.read_at(1 << 20, 0)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_stream_bandwidth_after_latency(self):
+        # 150ms of latency then 100ms of transfer, not max(150, 100).
+        storage = SimulatedStorage("synthetic", 1, 1 << 20, latency=LatencyModel(150, "fixed"),
+                                   stream_bytes_per_s=10 << 20)
+        f = fs.PyFileSystem(SimulatedHandler(storage)).open_input_file(storage.names()[0])
+        start = time.monotonic()
+        f.read_at(1 << 20, 0)
+        self.assertGreaterEqual(time.monotonic() - start, 0.24)
+
+    def test_error_rate(self):
+        storage = SimulatedStorage("synthetic", 1, 1024, error_rate=0.5, seed=3)
+        failures = 0
+        for _ in range(200):
+            try:
+                storage.request("read")
+            except OSError as e:
+                self.assertIn("503", str(e))
+                failures += 1
+        self.assertEqual(storage.errors, failures)
+        self.assertGreater(failures, 60)
+        self.assertLess(failures, 140)
+
+
+if __name__ == "__main__":
+    unittest.main()
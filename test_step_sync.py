@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from step_sync import StepSync
+
+
+@patch("step_sync.td.get_world_size", return_value=2)
+class TestStepSync(unittest.TestCase):
+
+    @patch("step_sync.td.barrier")
+    def test_barrier_every_step(self, mock_barrier, mock_world):
+        sync = StepSync("barrier")
+        for step in range(3):
+            self.assertGreaterEqual(sync.step(step), 0)
+        self.assertEqual(mock_barrier.call_count, 3)
+
+    @patch("step_sync.td.barrier")
+    def test_every_n(self, mock_barrier, mock_world):
+        sync = StepSync("every-n", 3)
+        for step in range(7):
+            sync.step(step)
+        # After steps 2 and 5.
+        self.assertEqual(mock_barrier.call_count, 2)
+
+    @patch("step_sync.td.barrier")
+    @patch("step_sync.td.all_reduce")
+    def test_allreduce_waits_for_previous_step(self, mock_all_reduce, mock_barrier, mock_world):
+        works = [MagicMock(), MagicMock()]
+        mock_all_reduce.side_effect = works
+        sync = StepSync("allreduce")
+        sync.step(0)
+        self.assertEqual(mock_all_reduce.call_args.kwargs, {"async_op": True})
+        works[0].wait.assert_not_called()
+        sync.step(1)
+        works[0].wait.assert_called_once()
+        works[1].wait.assert_not_called()
+        sync.finish()
+        works[1].wait.assert_called_once()
+        mock_barrier.assert_not_called()
+
+    @patch("step_sync.td.barrier")
+    @patch("step_sync.td.all_reduce")
+    def test_none(self, mock_all_reduce, mock_barrier, mock_world):
+        sync = StepSync("none")
+        self.assertEqual(sync.step(0), 0)
+        self.assertGreaterEqual(sync.finish(), 0)
+        mock_barrier.assert_not_called()
+        mock_all_reduce.assert_not_called()
+
+    @patch("step_sync.td.barrier")
+    def test_single_rank(self, mock_barrier, mock_world):
+        mock_world.return_value = 1
+        self.assertEqual(StepSync("barrier").step(0), 0)
+        mock_barrier.assert_not_called()
+
+    def test_invalid(self, mock_world):
+        with self.assertRaises(Exception):
+            StepSync("sometimes")
+        with self.assertRaises(Exception):
+            StepSync("every-n", 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
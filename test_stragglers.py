@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import torch
+
+import stragglers
+
+
+class TestStragglers(unittest.TestCase):
+
+    def _times(self):
+        # 3 ranks, 4 steps: rank 2 is slowest in 3 steps, rank 0 in 1.
+        step_ns = np.array([[5, 1, 1, 9], [2, 2, 2, 2], [6, 7, 8, 3]]) * 1000000
+        sync_ns = np.array([[1, 6, 7, 0], [4, 5, 6, 7], [0, 0, 0, 6]]) * 1000000
+        return np.stack([step_ns, sync_ns], axis=1)
+
+    def test_summarize(self):
+        summary = stragglers.summarize(self._times())
+        self.assertEqual(summary["ranks"], 3)
+        self.assertEqual(summary["steps"], 4)
+        self.assertEqual(summary["step_max_ms"], [6, 7, 8, 9])
+        self.assertEqual(summary["step_min_ms"], [2, 1, 1, 2])
+        self.assertEqual(summary["slowest_rank"], [2, 2, 2, 0])
+        self.assertEqual(summary["slowest_ranks"], [(2, 3), (0, 1)])
+        np.testing.assert_allclose(summary["sync_fraction"], [14 / 30, 22 / 30, 6 / 30])
+
+    def test_summarize_idle_rank(self):
+        times = np.zeros((2, 2, 3), dtype=np.int64)
+        times[0, 0] = [1, 1, 1]
+        summary = stragglers.summarize(times)
+        self.assertEqual(summary["sync_fraction"], [0.0, 0.0])
+        self.assertEqual(summary["slowest_ranks"], [(0, 3)])
+
+    def test_log_summary(self):
+        with self.assertLogs("stragglers", level="DEBUG") as logs:
+            stragglers.log_summary(stragglers.summarize(self._times()))
+        self.assertIn("slowest rank (rank: steps): 2: 3, 0: 1", logs.output[1])
+        self.assertIn("step 3: max 9.000 ms (rank 0)", logs.output[-1])
+
+    @patch("stragglers.td.gather")
+    @patch("stragglers.td.get_world_size", return_value=2)
+    @patch("stragglers.td.get_rank", return_value=0)
+    def test_gather_on_rank_0(self, mock_rank, mock_world, mock_gather):
+        def gather(tensor, gather_list=None, dst=0):
+            gather_list[0].copy_(tensor)
+            gather_list[1].copy_(tensor * 2)
+        mock_gather.side_effect = gather
+        times = stragglers.gather(np.array([1, 2]), np.array([3, 4]))
+        mock_gather.assert_called_once()
+        np.testing.assert_array_equal(times, [[[1, 2], [3, 4]], [[2, 4], [6, 8]]])
+
+    @patch("stragglers.td.gather")
+    @patch("stragglers.td.get_world_size", return_value=2)
+    @patch("stragglers.td.get_rank", return_value=1)
+    def test_gather_on_other_ranks(self, mock_rank, mock_world, mock_gather):
+        self.assertIsNone(stragglers.gather(np.array([1, 2]), np.array([3, 4])))
+        tensor = mock_gather.call_args.args[0]
+        self.assertTrue(torch.equal(tensor, torch.tensor([[1, 2], [3, 4]])))
+        self.assertEqual(mock_gather.call_args.kwargs, {"dst": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
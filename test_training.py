@@ -22,13 +22,23 @@ import pandas as pd
 from io import StringIO
 import logging
 from training import main, training
-from training import sequential_reader, full_random_reader
+from training import sequential_reader, file_random_reader, full_random_reader, Epoch, configure_samples
+from training import configure_epoch, check_open_loop, compute_time_sampler, plan_epoch, Source
+import threading
+import pyarrow.fs as pafs
+from memory_budget import MemoryBudget
+import buffer_pool
+from buffer_pool import BufferPool
+from pacing import Pacer
+from reader_pool import ReaderPool
+import time
 
 import unittest
 import os
 import shutil
 from unittest.mock import patch
 import argparse
+import arguments
 from training import main
 import tempfile
 import pytest
@@ -43,6 +53,22 @@ class TestEndToEnd(unittest.TestCase):
         with open(os.path.join(self.test_dir, "file2.txt"), "w") as f:
             f.write("more test data")
 
+        # Every argument main() may read, from the parser's own defaults. Parsed
+        # here, the tests patch arguments.parse_args.
+        self.args = arguments.parse_args([
+            "--prefix", self.test_dir,
+            "--epochs", "1",
+            "--steps", "1",
+            "--sample-size", "1000",
+            "--batch-size", "10",
+            "--read-order", "FullRandom",
+            "--background-threads", "16",
+            "--label", "test-label",
+            "--object-count-limit", "100",
+        ])
+        # Boolean flags parse any value as True, set the disabled ones here.
+        self.args.clear_pagecache_after_epoch = False
+
     def tearDown(self):
         shutil.rmtree(self.test_dir)
 
@@ -51,35 +77,18 @@ class TestEndToEnd(unittest.TestCase):
     @patch('training.close_metrics_logger')
     @patch('torch.distributed.destroy_process_group')
     def test_e2e_main_error_during_read(self, mock_destroy_process_group, mock_close_metrics_logger, mock_full_random_reader, mock_parse_args):
-        mock_args = argparse.Namespace(
-            prefix=[self.test_dir],
-            epochs=1,
-            steps=1,
-            sample_size=1000,
-            batch_size=10,
-            read_order=["FullRandom"],
-            background_queue_maxsize=2048,            
-            background_threads=16,
-            group_coordinator_address="localhost",
-            group_coordinator_port="4567",
-            group_member_id=0,
-            group_size=1,
-            log_level="INFO",
-            label="test-label",
-            log_metrics=False,
-            log_file="",
-            export_metrics=False,
-            metrics_file="metrics.csv",
-            clear_pagecache_after_epoch=False,
-            object_count_limit=100,
-        )
+        mock_args = self.args
         mock_parse_args.return_value = mock_args
         mock_full_random_reader.side_effect = Exception("Read failed")
         
-        with self.assertRaises(SystemExit) as ce:
+        with self.assertRaises(SystemExit) as ce, self.assertLogs("test-label", level="ERROR") as logs:
             main()
 
         self.assertEqual(ce.exception.code, 1)
+        # The run failed because of the read, not any other error.
+        mock_full_random_reader.assert_called()
+        self.assertTrue(any("failed: Read failed" in line for line in logs.output), logs.output)
+        self.assertIn("Workload failed with error: One of the background threads failed.", logs.output[-1])
         mock_close_metrics_logger.assert_called_once()
         mock_destroy_process_group.assert_called_once()
 
@@ -160,7 +169,22 @@ class TestTraining(unittest.TestCase):
             sample_size=1024,
             batch_size=1024,
             read_order=["Sequential"],
+            reader_engine="thread",
+            plan_mode="broadcast",
+            plan_ahead=0,
+            manifest_dir="",
+            coalesce_max_gap=-1,
+            file_random_mode="readall",
+            file_random_window=1024,
+            reader_memory_budget=0,
             background_queue_maxsize=2048,
+            queue_batch_size=16,
+            buffer_pool_size=0,
+            handle_cache_size=16,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            target_rate=0,
+            target_bytes_rate=0,
             background_threads=16,
             group_coordinator_address="localhost",
             group_coordinator_port="4567",
@@ -170,13 +194,14 @@ class TestTraining(unittest.TestCase):
             log_metrics=True,
             export_metrics=True,
             metrics_file="metrics.csv",
+            metrics_format="csv",
             clear_pagecache_after_epoch=True,
         )
         
         mock_parse_args.return_value = mock_args
 
         # Mock the necessary functions
-        mock_configure_object_sources.return_value = {"gs://test-bucket/": "sequential_reader"}
+        mock_configure_object_sources.return_value = {"gs://test-bucket/": Source("gcs", "test_fs", ["test_object"], {"test_object": 1024})}
         mock_configure_epoch.return_value = (lambda *args: [], "Sequential", "test_fs", "test_fs", ["test_object"])
         mock_configure_samples.return_value = [("test_object", 0)]
         mock_Epoch.return_value = [f"Step: 0, Duration (ms): 100, Batch-sample: 1024"]
@@ -242,6 +267,174 @@ class TestTraining(unittest.TestCase):
         self.assertEqual(result[1][1], 2)
         self.assertGreater(result[1][2], 0)
         
+    @patch('training.td.get_world_size', return_value=1)
+    def test_configure_samples(self, mock_get_world_size):
+        test_dir = tempfile.mkdtemp()
+        names = [os.path.join(test_dir, "file1.txt"), os.path.join(test_dir, "file2.txt")]
+        for name, data in zip(names, [b"test data", b"more test data"]):
+            with open(name, "wb") as f:
+                f.write(data)
+        args = argparse.Namespace(batch_size=5, steps=2, group_size=1, sample_size=4)
+        try:
+            samples = configure_samples(names, pafs.LocalFileSystem(), args)
+        finally:
+            shutil.rmtree(test_dir)
+
+        self.assertEqual(len(samples), 10)
+        for name, offset in samples:
+            self.assertIn(name, names)
+            self.assertEqual(offset % 4, 0)
+            self.assertLess(offset, 14)
+
+    @patch('training.td.get_world_size', return_value=1)
+    def test_configure_samples_uses_known_sizes(self, mock_get_world_size):
+        class NoOpenFileSystem:
+            def open_input_file(self, path):
+                raise AssertionError(f"{path} should not be opened")
+
+        args = argparse.Namespace(batch_size=5, steps=2, group_size=1, sample_size=4)
+        samples = configure_samples(["a", "b"], NoOpenFileSystem(), args, object_sizes={"a": 8, "b": 0})
+
+        self.assertEqual(len(samples), 10)
+        self.assertEqual(samples.index.count("a"), 10)
+
+    @patch('training.td.get_world_size', return_value=1)
+    def test_configure_epoch_seed_is_deterministic(self, mock_get_world_size):
+        args = argparse.Namespace(prefix=["p1", "p2"], read_order=["Sequential", "FullRandom"], object_count_limit=3, coalesce_max_gap=-1)
+        objects = [f"object-{i}" for i in range(10)]
+        # Listing order must not matter in seed mode.
+        plans = [
+            configure_epoch({"p1": Source("local", "fs", objects), "p2": Source("local", "fs", objects[::-1])}, args, seed=42)
+            for _ in range(2)
+        ] + [configure_epoch({"p1": Source("local", "fs", objects[::-1]), "p2": Source("local", "fs", objects)}, args, seed=42)]
+
+        self.assertEqual(len(plans[0][4]), 3)
+        self.assertEqual(plans[0][1:], plans[1][1:])
+        self.assertEqual(plans[0][1:], plans[2][1:])
+
+    @patch('training.td.get_world_size', return_value=1)
+    def test_configure_samples_seed_is_deterministic(self, mock_get_world_size):
+        test_dir = tempfile.mkdtemp()
+        name = os.path.join(test_dir, "file1.txt")
+        with open(name, "wb") as f:
+            f.write(b"testing_random_reader")
+        args = argparse.Namespace(batch_size=8, steps=4, group_size=1, sample_size=2)
+        try:
+            first = configure_samples([name], pafs.LocalFileSystem(), args, seed=7)
+            second = configure_samples([name], pafs.LocalFileSystem(), args, seed=7)
+        finally:
+            shutil.rmtree(test_dir)
+
+        self.assertEqual(list(first), list(second))
+
+    @patch('training.td.get_world_size', return_value=1)
+    def test_plan_epoch(self, mock_get_world_size):
+        args = argparse.Namespace(
+            prefix=["p"], read_order=["FullRandom"], object_count_limit=2, coalesce_max_gap=-1,
+            plan_mode="seed", plan_seed=3, buffer_pool_size=4, batch_size=5, steps=2, group_size=1, sample_size=4,
+        )
+        sources = {"p": Source("local", None, ["a", "b", "c"], {"a": 8, "b": 8, "c": 8})}
+        (reader, read_order, filesystem, epoch_objects, samples, pool, pacer) = plan_epoch(
+            sources, 1, args, 0, sources["p"].sizes
+        )
+
+        self.assertEqual(read_order, "FullRandom")
+        self.assertEqual(len(epoch_objects), 2)
+        self.assertEqual(len(samples), 10)
+        self.assertEqual(pool.available(), 4)
+        self.assertEqual(reader.keywords["pool"], pool)
+        self.assertIsNone(pacer)
+        # The same seed gives the same plan.
+        self.assertEqual(list(samples), list(plan_epoch(sources, 1, args, 0, sources["p"].sizes)[4]))
+
+    @patch('training.td.get_world_size', return_value=1)
+    def test_plan_epoch_pacer_seed_per_rank(self, mock_get_world_size):
+        args = argparse.Namespace(
+            prefix=["p"], read_order=["FullRandom"], object_count_limit=2, coalesce_max_gap=-1,
+            plan_mode="seed", plan_seed=3, buffer_pool_size=0, batch_size=5, steps=2, group_size=1, sample_size=4,
+            arrival="poisson", deadline_ms=0,
+        )
+        sources = {"p": Source("local", None, ["a", "b", "c"], {"a": 8, "b": 8, "c": 8})}
+
+        def gaps(rank):
+            with patch('training.td.get_rank', return_value=rank):
+                pacer = plan_epoch(sources, 1, args, 100, sources["p"].sizes)[6]
+            return [pacer._gap_ns() for _ in range(5)]
+
+        # Reproducible per rank, independent across ranks.
+        self.assertEqual(gaps(0), gaps(0))
+        self.assertNotEqual(gaps(0), gaps(1))
+
+    @patch('training.arguments.parse_args')
+    @patch('training.setup_logger')
+    @patch('training.configure_object_sources')
+    @patch('training.plan_epoch')
+    @patch('training.Epoch')
+    @patch('torch.distributed.init_process_group')
+    @patch('training.td.get_world_size', return_value=1)
+    def test_training_plans_ahead(self, mock_get_world_size, mock_init_process_group, mock_Epoch, mock_plan_epoch,
+                                  mock_configure_object_sources, mock_setup_logger, mock_parse_args):
+        mock_parse_args.return_value = argparse.Namespace(
+            prefix=["p"], epochs=3, steps=1, sample_size=1, batch_size=1, read_order=["FullRandom"],
+            reader_engine="thread", plan_mode="broadcast", plan_ahead=1, manifest_dir="",
+            coalesce_max_gap=-1, file_random_mode="readall", file_random_window=1, reader_memory_budget=0,
+            background_queue_maxsize=1, queue_batch_size=1, buffer_pool_size=0, handle_cache_size=16, prefetch_depth=0,
+            compute_time_ms=0, target_rate=0, target_bytes_rate=0, background_threads=1,
+            group_coordinator_address="localhost", group_coordinator_port="4567", group_member_id=0,
+            group_size=1, label="test-label", log_metrics=False, export_metrics=False,
+            clear_pagecache_after_epoch=False,
+        )
+        mock_setup_logger.return_value = logging.getLogger("test-label")
+        mock_configure_object_sources.return_value = {"p": Source("local", None, ["a"])}
+        planned = []
+        def plan(sources, epoch, args, rate, object_sizes, group=None):
+            planned.append((epoch, threading.current_thread().name))
+            return (None, "FullRandom", None, ["a"], [("a", 0)], None, None)
+        mock_plan_epoch.side_effect = plan
+        mock_Epoch.return_value = []
+
+        training()
+
+        self.assertEqual([epoch for epoch, _ in planned], [0, 1, 2])
+        for _, thread in planned:
+            self.assertTrue(thread.startswith("planner"))
+        self.assertEqual(mock_Epoch.call_count, 3)
+
+    def test_file_random_reader_sample_offsets(self):
+        mock_fs = type('MockFileSystem', (object,), {'open_input_file': lambda self, path: type('MockFile', (object,), {'readall': lambda self: b"testing_random_reader"})()})()
+
+        with patch('training.td.get_rank', return_value=0), patch('training.td.get_world_size', return_value=1):
+            result = list(file_random_reader(["test_file", "other_file"], 0, 1, mock_fs, 2, [("test_file", 10), ("other_file", 4), ("test_file", 0)]))
+
+        # Offsets are read in sorted order per object.
+        self.assertEqual(result, [(0, b"te"), (10, b"nd"), (4, b"in")])
+
+    def test_file_random_reader_modes(self):
+        test_dir = tempfile.mkdtemp()
+        name = os.path.join(test_dir, "file1.txt")
+        with open(name, "wb") as f:
+            f.write(b"testing_random_reader")
+        samples = [(name, 20), (name, 4), (name, 0), (name, 6), (name, 4)]
+        budget = MemoryBudget(8)
+        try:
+            with patch('training.td.get_rank', return_value=0), patch('training.td.get_world_size', return_value=1), \
+                    patch('training.sample_lat_logger') as mock_logger:
+                results = {
+                    mode: list(file_random_reader([name], 0, 1, pafs.LocalFileSystem(), 3, samples, mode=mode, window_size=5, budget=budget))
+                    for mode in ["readall", "window", "ranged"]
+                }
+        finally:
+            shutil.rmtree(test_dir)
+
+        expected = [(0, b"tes"), (4, b"ing"), (4, b"ing"), (6, b"g_r"), (20, b"r")]
+        self.assertEqual(results["readall"], expected)
+        self.assertEqual(results["window"], expected)
+        self.assertEqual(results["ranged"], expected)
+        # Every sample records its latency, in every mode.
+        self.assertEqual(mock_logger.log_metric.call_count, 15)
+        self.assertLessEqual(budget.peak, 8)
+        self.assertEqual(budget.in_use, 0)
+
     def test_full_random_reader_continuous_sample(self):        
         mock_fs = type('MockFileSystem', (object,), {'open_input_file': lambda self, path: type('MockFile', (object,), {'readall': lambda self: b"testing_random_reader", 'read_at': lambda self, size, offset: b"testing_random_reader"[offset:offset+size], 'close': lambda self: None})()})()
 
@@ -257,6 +450,76 @@ class TestTraining(unittest.TestCase):
         self.assertEqual(result[1][0], 2)
         self.assertEqual(result[1][1], b"st")
         
+    def test_readers_with_buffer_pool(self):
+        test_dir = tempfile.mkdtemp()
+        name = os.path.join(test_dir, "file1.txt")
+        with open(name, "wb") as f:
+            f.write(b"testing_random_reader")
+        pool = BufferPool(2, 3)
+        try:
+            with patch('training.td.get_rank', return_value=0), patch('training.td.get_world_size', return_value=1), \
+                    patch('training.sample_lat_logger'):
+                sequential = []
+                for _, offset, _, chunk in sequential_reader([name], 0, 1, pafs.LocalFileSystem(), 3, [(name, 0)] * 7, pool=pool):
+                    sequential.append((offset, bytes(chunk)))
+                    buffer_pool.release(chunk)
+                full = []
+                for offset, chunk in full_random_reader([name], 0, 1, pafs.LocalFileSystem(), 3, [(name, 20), (name, 4)], pool=pool):
+                    full.append((offset, bytes(chunk)))
+                    buffer_pool.release(chunk)
+        finally:
+            shutil.rmtree(test_dir)
+
+        self.assertEqual(sequential[0], (0, b"tes"))
+        self.assertEqual(sequential[-1], (18, b"der"))
+        self.assertEqual(len(sequential), 7)
+        self.assertEqual(full, [(20, b"r"), (4, b"ing")])
+        # Every buffer went back to the pool and none had to be waited for.
+        self.assertEqual(pool.available(), 2)
+        self.assertEqual(pool.exhausted, 0)
+
+    def test_full_random_reader_open_loop(self):
+        def read_at(self, size, offset):
+            time.sleep(0.02)
+            return b"testing_random_reader"[offset:offset+size]
+        mock_fs = type('MockFileSystem', (object,), {'open_input_file': lambda self, path: type('MockFile', (object,), {'read_at': read_at, 'close': lambda self: None})()})()
+        pacer = Pacer(1000, deadline_ns=10000000)
+
+        with patch('training.td.get_rank', return_value=0), patch('training.td.get_world_size', return_value=1), \
+                patch('training.sample_lat_logger') as mock_logger:
+            result = list(full_random_reader(["test_file"], 0, 1, mock_fs, 2, [("test_file", 0), ("test_file", 2), ("test_file", 4)], pacer=pacer))
+
+        self.assertEqual(result, [(0, b"te"), (2, b"st"), (4, b"in")])
+        # Later reads were due 1 ms apart but waited for the slow ones, their
+        # latency counts from the schedule.
+        latencies = [c.args[0] for c in mock_logger.log_metric.call_args_list]
+        self.assertGreater(latencies[2], 35)
+        self.assertEqual(pacer.issued, 3)
+        self.assertEqual(pacer.backlogged, 2)
+        self.assertEqual(pacer.missed_deadlines, 3)
+
+    def test_check_open_loop(self):
+        args = argparse.Namespace(reader_engine="thread", read_order=["FileRandom", "FullRandom"], file_random_mode="ranged", coalesce_max_gap=-1)
+        check_open_loop(args)
+        for change in [{"reader_engine": "asyncio"}, {"file_random_mode": "readall"}, {"coalesce_max_gap": 0}]:
+            with self.assertRaises(Exception):
+                check_open_loop(argparse.Namespace(**{**vars(args), **change}))
+
+    def test_full_random_reader_coalesced(self):
+        reads = []
+        def read_at(self, size, offset):
+            reads.append((offset, size))
+            return b"testing_random_reader"[offset:offset+size]
+        mock_fs = type('MockFileSystem', (object,), {'open_input_file': lambda self, path: type('MockFile', (object,), {'read_at': read_at, 'close': lambda self: None})()})()
+
+        with patch('training.td.get_rank', return_value=0), patch('training.td.get_world_size', return_value=1):
+            result = list(full_random_reader(["test_file"], 0, 1, mock_fs, 2, [("test_file", 10), ("test_file", 0), ("test_file", 2), ("test_file", 19)],
+                                             coalesce_max_gap=0, coalesce_max_size=1024, coalesce_window=4))
+
+        # Samples 0 and 2 are adjacent and served by one read, 19 runs past the end.
+        self.assertEqual(reads, [(0, 4), (10, 2), (19, 2)])
+        self.assertEqual(result, [(0, b"te"), (2, b"st"), (10, b"nd"), (19, b"er")])
+
     def test_full_random_reader_random_sample(self):
         mock_fs = type('MockFileSystem', (object,), {'open_input_file': lambda self, path: type('MockFile', (object,), {'readall': lambda self: b"testing_random_reader", 'read_at': lambda self, size, offset: b"testing_random_reader"[offset:offset+size], 'close': lambda self: None})()})()
 
@@ -272,6 +535,333 @@ class TestTraining(unittest.TestCase):
         self.assertEqual(result[1][0], 10)
         self.assertEqual(result[1][1], b"nd")
         
+    def test_full_random_reader_shared_handles(self):
+        opened = []
+        def open_input_file(self, path):
+            opened.append(path)
+            return type('MockFile', (object,), {'read_at': lambda self, size, offset: path.encode()[offset:offset+size], 'close': lambda self: None})()
+        mock_fs = type('MockFileSystem', (object,), {'open_input_file': open_input_file})()
+        source = Source("local", mock_fs, ["f1", "f2", "f3"], handle_cache_size=2)
+        samples = [("f2", 0), ("f2", 1), ("f1", 0), ("f2", 0)]
+
+        with patch('training.td.get_rank', return_value=0), patch('training.td.get_world_size', return_value=1):
+            for thread_id in range(2):
+                list(full_random_reader(source.objects, thread_id, 2, mock_fs, 1, samples, handles=source.handles))
+
+        # Only the sampled objects are opened, once for both readers.
+        self.assertEqual(sorted(opened), ["f1", "f2"])
+        self.assertEqual((source.handles.hits, source.handles.misses), (2, 2))
+
+    def test_full_random_reader_open_not_timed(self):
+        def open_input_file(self, path):
+            time.sleep(0.1)
+            return type('MockFile', (object,), {'read_at': lambda self, size, offset: b"x" * size, 'close': lambda self: None})()
+        mock_fs = type('MockFileSystem', (object,), {'open_input_file': open_input_file})()
+
+        with patch('training.td.get_rank', return_value=0), patch('training.td.get_world_size', return_value=1), \
+                patch('training.sample_lat_logger') as mock_logger:
+            list(full_random_reader(["f1"], 0, 1, mock_fs, 1, [("f1", 0), ("f1", 1)]))
+
+        # The 100ms open of the first sample is not part of its latency.
+        latencies = [c.args[0] for c in mock_logger.log_metric.call_args_list]
+        self.assertEqual(len(latencies), 2)
+        self.assertLess(max(latencies), 50)
+
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_micro_batch_spans_steps(self, mock_get_world_size, mock_get_rank):
+        def reader(object_names, thread_id, thread_count, filesystem, sample_size, samples):
+            for offset in range(10):
+                yield ("test_file", offset, 1)
+
+        args = argparse.Namespace(
+            reader_engine="thread",
+            background_threads=1,
+            background_queue_maxsize=16,
+            queue_batch_size=8,
+            buffer_pool_size=0,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            sample_size=1,
+            batch_size=3,
+            steps=3,
+        )
+        summaries = list(Epoch(reader, ["test_file"], None, [], args))
+
+        # The first micro-batch of 8 samples completes two steps, the
+        # surplus and the second micro-batch complete the third.
+        self.assertEqual(len(summaries), 3)
+        self.assertTrue(summaries[2].startswith("Step: 2,"))
+        self.assertIn("Batch-sample: 3,", summaries[2])
+
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_cancels_pooled_readers(self, mock_get_world_size, mock_get_rank):
+        threads = set()
+        closed = []
+        def reader(object_names, thread_id, thread_count, filesystem, sample_size, samples):
+            threads.add(threading.current_thread().name)
+            try:
+                # More samples than the steps need, the readers are cancelled.
+                for offset in range(1000000):
+                    yield ("test_file", offset, 1)
+            finally:
+                closed.append(thread_id)
+
+        args = argparse.Namespace(
+            reader_engine="thread",
+            background_threads=2,
+            background_queue_maxsize=4,
+            queue_batch_size=1,
+            buffer_pool_size=0,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            sample_size=1,
+            batch_size=2,
+            steps=2,
+        )
+        readers = ReaderPool(2)
+        try:
+            for epoch in range(2):
+                summaries = list(Epoch(reader, ["test_file"], None, [], args, readers=readers))
+                self.assertEqual(len(summaries), 2)
+                self.assertEqual(len(closed), 2 * (epoch + 1))
+        finally:
+            readers.close()
+
+        # Both epochs ran on the same two threads.
+        self.assertEqual(threads, {"reader-0", "reader-1"})
+
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_undersized_buffer_pool(self, mock_get_world_size, mock_get_rank):
+        # 32 buffers for 4 threads batching 16 samples each.
+        pool = BufferPool(32, 1)
+        started = threading.Barrier(4)
+        def reader(object_names, thread_id, thread_count, filesystem, sample_size, samples):
+            for offset in range(1000000):
+                if offset == 8:
+                    # Every buffer now sits in a partial batch.
+                    started.wait()
+                yield ("test_file", offset, 1, memoryview(pool.acquire()))
+
+        args = argparse.Namespace(
+            reader_engine="thread",
+            background_threads=4,
+            background_queue_maxsize=4,
+            queue_batch_size=16,
+            buffer_pool_size=32,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            sample_size=1,
+            batch_size=8,
+            steps=20,
+        )
+        summaries = []
+        t = threading.Thread(target=lambda: summaries.extend(Epoch(reader, ["test_file"], None, [], args)), daemon=True)
+        t.start()
+        t.join(timeout=30)
+
+        self.assertFalse(t.is_alive(), f"Epoch stuck, {pool.available()} buffers free")
+        self.assertEqual(len(summaries), 20)
+        self.assertGreater(pool.exhausted, 0)
+
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_time_to_first_sample(self, mock_get_world_size, mock_get_rank):
+        def reader(object_names, thread_id, thread_count, filesystem, sample_size, samples):
+            yield ("test_file", 0, 1)
+
+        args = argparse.Namespace(
+            reader_engine="thread",
+            background_threads=1,
+            background_queue_maxsize=16,
+            queue_batch_size=1,
+            buffer_pool_size=0,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            sample_size=1,
+            batch_size=1,
+            steps=1,
+        )
+        # The epoch started 50 ms before its plan was ready.
+        with patch("training.logger", logging.getLogger("training")), self.assertLogs("training", level="INFO") as logs:
+            list(Epoch(reader, ["test_file"], None, [], args, start_ns=time.monotonic_ns() - 50000000))
+
+        lines = [line for line in logs.output if "Time to first sample" in line]
+        self.assertEqual(len(lines), 1)
+        self.assertGreaterEqual(float(lines[0].split(": ")[-1].split(" ")[0]), 50)
+
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_compute_hides_io(self, mock_get_world_size, mock_get_rank):
+        produced = []
+        def reader(object_names, thread_id, thread_count, filesystem, sample_size, samples):
+            for offset in range(40):
+                time.sleep(0.002)
+                produced.append(offset)
+                yield ("test_file", offset, 1)
+
+        args = argparse.Namespace(
+            reader_engine="thread",
+            background_threads=1,
+            background_queue_maxsize=1000,
+            queue_batch_size=1,
+            buffer_pool_size=0,
+            prefetch_depth=2, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=30,
+            compute_time_distribution="fixed",
+            sample_size=1,
+            batch_size=4,
+            steps=4,
+        )
+        consumed = []
+        stalls = []
+        for summary in Epoch(reader, ["test_file"], None, [], args):
+            consumed.append(4 * (len(consumed) + 1))
+            # Readers stay within the prefetch depth of the consumed samples.
+            self.assertLessEqual(len(produced), consumed[-1] + 2 * 4 + 2)
+            stalls.append(float(summary.split("Stall (ms): ")[1].split(",")[0]))
+            self.assertIn("Compute (ms): 30", summary)
+
+        # The first batch waits for the readers, the next ones were
+        # prefetched during the compute of the previous step.
+        self.assertGreater(stalls[0], 5)
+        self.assertLess(max(stalls[1:]), 5)
+
+    def test_compute_time_sampler(self):
+        def args(**kwargs):
+            return argparse.Namespace(**{"compute_time_ms": 10, "compute_time_distribution": "fixed", "compute_time_stddev_ms": 0, **kwargs})
+
+        self.assertEqual(compute_time_sampler(args(compute_time_ms=0))(), 0)
+        self.assertEqual(compute_time_sampler(args())(), 0.01)
+        normal = compute_time_sampler(args(compute_time_distribution="normal", compute_time_stddev_ms=50))
+        self.assertTrue(all(normal() >= 0 for _ in range(100)))
+        exponential = compute_time_sampler(args(compute_time_distribution="exponential"))
+        self.assertAlmostEqual(sum(exponential() for _ in range(5000)) / 5000, 0.01, delta=0.001)
+
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_asyncio_engine(self, mock_get_world_size, mock_get_rank):
+        test_dir = tempfile.mkdtemp()
+        name = os.path.join(test_dir, "file1.txt")
+        with open(name, "wb") as f:
+            f.write(b"testing_random_reader")
+        args = argparse.Namespace(
+            reader_engine="asyncio",
+            async_loops=2,
+            async_queue_depth=4,
+            background_queue_maxsize=16,
+            queue_batch_size=3,
+            buffer_pool_size=0,
+            handle_cache_size=16,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            sample_size=2,
+            batch_size=4,
+            steps=2,
+        )
+        samples = [(name, o) for o in range(0, 16, 2)]
+        try:
+            summaries = list(Epoch(full_random_reader, [name], pafs.LocalFileSystem(), samples, args, "FullRandom"))
+        finally:
+            shutil.rmtree(test_dir)
+
+        self.assertEqual(len(summaries), 2)
+        self.assertTrue(summaries[1].startswith("Step: 1,"))
+
+    @patch('training.async_reader.Worker', side_effect=OSError("no event loop"))
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_asyncio_worker_fails(self, mock_get_world_size, mock_get_rank, mock_worker):
+        args = argparse.Namespace(
+            reader_engine="asyncio",
+            async_loops=2,
+            async_queue_depth=4,
+            background_queue_maxsize=16,
+            queue_batch_size=1,
+            buffer_pool_size=0,
+            handle_cache_size=16,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            sample_size=2,
+            batch_size=4,
+            steps=2,
+        )
+        samples = [("file1.txt", o) for o in range(0, 16, 2)]
+        with self.assertRaisesRegex(Exception, "background threads failed"):
+            list(Epoch(full_random_reader, ["file1.txt"], None, samples, args, "FullRandom"))
+        self.assertEqual(mock_worker.call_count, 2)
+
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_process_engine(self, mock_get_world_size, mock_get_rank):
+        test_dir = tempfile.mkdtemp()
+        name = os.path.join(test_dir, "file1.txt")
+        with open(name, "wb") as f:
+            f.write(b"testing_random_reader")
+        args = argparse.Namespace(
+            reader_engine="process",
+            reader_processes=2,
+            shm_ring_slots=4,
+            shm_handoff="bytes",
+            background_queue_maxsize=16,
+            queue_batch_size=3,
+            buffer_pool_size=0,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            sample_size=2,
+            batch_size=4,
+            steps=2,
+        )
+        samples = [(name, o) for o in range(0, 16, 2)]
+        try:
+            summaries = list(Epoch(full_random_reader, [name], pafs.LocalFileSystem(), samples, args, "FullRandom"))
+        finally:
+            shutil.rmtree(test_dir)
+
+        self.assertEqual(len(summaries), 2)
+        self.assertTrue(summaries[1].startswith("Step: 1,"))
+
+    @patch('training.td.get_rank', return_value=0)
+    @patch('training.td.get_world_size', return_value=1)
+    def test_epoch_process_engine_logged_rows(self, mock_get_world_size, mock_get_rank):
+        test_dir = tempfile.mkdtemp()
+        name = os.path.join(test_dir, "file1.txt")
+        with open(name, "wb") as f:
+            f.write(b"testing_random_reader")
+        args = argparse.Namespace(
+            reader_engine="process",
+            reader_processes=2,
+            shm_ring_slots=4,
+            shm_handoff="descriptor",
+            background_queue_maxsize=16,
+            queue_batch_size=3,
+            buffer_pool_size=0,
+            prefetch_depth=0, sync_mode="barrier", sync_interval=1,
+            compute_time_ms=0,
+            sample_size=2,
+            batch_size=4,
+            steps=2,
+        )
+        samples = [(name, o) for o in range(0, 16, 2)]
+        rows = {}
+        try:
+            for reader in [full_random_reader, sequential_reader]:
+                with patch('training.sample_lat_logger') as mock_logger:
+                    mock_logger.step.return_value = None
+                    mock_logger.epoch.return_value = None
+                    list(Epoch(reader, [name], pafs.LocalFileSystem(), samples, args, "FullRandom"))
+                rows[reader.__name__] = [c.args[1:] for c in mock_logger.log_metric.call_args_list]
+        finally:
+            shutil.rmtree(test_dir)
+
+        # The object and bytes read travel with the descriptor.
+        for reader, logged in rows.items():
+            self.assertGreaterEqual(len(logged), 8, reader)
+            for logged_name, offset, nbytes, kind in logged:
+                self.assertEqual((logged_name, nbytes, kind), (name, 2, "process"), reader)
+
     @patch('training.td.get_rank', return_value=0)
     @patch('training.td.get_world_size', return_value=1)
     def test_full_random_reader_exception(self, mock_get_world_size, mock_get_rank):
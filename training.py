@@ -18,24 +18,44 @@ A Synthetic Scale IO Generator for training workloads.
 """
 
 import argparse
-import fsspec
+import collections
+import contextlib
 import datetime
+import functools
+import multiprocessing
 import queue
 import random
 import sys
 import traceback
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable
 import logging
 import arguments
+import async_reader
+import buffer_pool
+import coalesce
+import handle_cache
+import histogram
+import manifest
+import memory_budget
+import pacing
+import reader_pool
 import util
 
 import gcsfs
+import numpy as np
+import torch
 import torch.distributed as td
 import pyarrow.fs as fs
 
 import monitoring 
+import sampling
+import shm_ring
+import simulated_fs
+import step_sync
+import stragglers
 
 from opentelemetry import metrics
 import metrics_logger
@@ -51,6 +71,28 @@ import metrics_logger
 # Global for recording sample latency to export.
 sample_lat = metrics.NoOpHistogram("no_op")
 
+# Sample latency attributes of each reader, built once instead of per sample.
+_READER_ATTRIBUTES = {
+    reader: {"reader": reader} for reader in ["sequential", "file_random", "full_random", "asyncio", "process"]
+}
+
+# Global for recording how long each step waited for data.
+step_stall = metrics.NoOpHistogram("no_op")
+
+# Global for recording how long each epoch waited for its first sample.
+time_to_first_sample = metrics.NoOpHistogram("no_op")
+
+# Global for recording how long each step waited for the other ranks.
+step_sync_wait = metrics.NoOpHistogram("no_op")
+
+# Global for counting how often readers waited for a free pooled buffer.
+buffer_pool_exhausted = metrics.NoOpCounter("no_op")
+
+# Globals for counting open-loop reads issued behind schedule or completed
+# past their deadline.
+backlogged_reads = metrics.NoOpCounter("no_op")
+missed_deadlines = metrics.NoOpCounter("no_op")
+
 # Initialize the global metrics logger with no-op logger.
 sample_lat_logger = metrics_logger.NoOpMetricsLogger()
 
@@ -59,10 +101,21 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 class Source(object):
-    def __init__(self, name: str, filesystem: fs.FileSystem, objects: Iterable[str]):
+    def __init__(
+        self,
+        name: str,
+        filesystem: fs.FileSystem,
+        objects: Iterable[str],
+        sizes: dict[str, int] = None,
+        handle_cache_size: int = 0,
+    ):
         self.name = name
         self.filesystem = filesystem
         self.objects = list(objects)
+        # Object sizes from the listing or manifest, if known.
+        self.sizes = sizes or {}
+        # Handles shared by the readers of every epoch.
+        self.handles = handle_cache.HandleCache(filesystem, handle_cache_size)
 
 def setup_metrics_exporter(args):
     # Initialize the OpenTelemetry MeterProvider
@@ -76,11 +129,61 @@ def setup_metrics_exporter(args):
         unit="ms"
     )
 
+    global step_stall
+    step_stall = meter.create_histogram(
+        name="ssiog.step_stall",
+        description="Time each step waited for its batch of samples",
+        unit="ms"
+    )
+
+    global time_to_first_sample
+    time_to_first_sample = meter.create_histogram(
+        name="ssiog.time_to_first_sample",
+        description="Time from the start of each epoch to its first sample",
+        unit="ms"
+    )
+
+    global step_sync_wait
+    step_sync_wait = meter.create_histogram(
+        name="ssiog.step_sync",
+        description="Time each step waited to synchronize with the other ranks",
+        unit="ms"
+    )
+
+    global buffer_pool_exhausted
+    buffer_pool_exhausted = meter.create_counter(
+        name="ssiog.buffer_pool_exhausted",
+        description="Number of times a reader waited for a free pooled buffer",
+    )
+
+    global backlogged_reads
+    backlogged_reads = meter.create_counter(
+        name="ssiog.backlogged_reads",
+        description="Number of open-loop reads issued while the next read was already due",
+    )
+
+    global missed_deadlines
+    missed_deadlines = meter.create_counter(
+        name="ssiog.missed_deadlines",
+        description="Number of open-loop reads completed past their deadline",
+    )
+
     logger.info("Metrics exporter initialized.")
     
 def setup_metrics_logger(args):
     global sample_lat_logger
-    sample_lat_logger = metrics_logger.AsyncMetricsLogger(file_name=args.metrics_file)
+    if args.metrics_format == "histogram":
+        sample_lat_logger = metrics_logger.HistogramMetricsLogger(
+            file_name=args.metrics_file, relative_error=args.histogram_relative_error
+        )
+    elif args.metrics_format in ("parquet", "arrow"):
+        sample_lat_logger = metrics_logger.ArrowMetricsLogger(
+            file_name=args.metrics_file,
+            rank=args.group_member_id,
+            file_format="parquet" if args.metrics_format == "parquet" else "ipc",
+        )
+    else:
+        sample_lat_logger = metrics_logger.AsyncMetricsLogger(file_name=args.metrics_file)
 
     logger.info("Metrics logger initialized.")
 
@@ -126,7 +229,7 @@ def training():
 
     # Initialize the metrics logger.
     if args.log_metrics:
-        logger.info(f"Logging metrics to: {args.metrics_file}")
+        logger.info(f"Logging metrics to: {args.metrics_file} ({args.metrics_format})")
         setup_metrics_logger(args)
         
         
@@ -147,88 +250,389 @@ def training():
     logger.info(f"Batch size: {args.batch_size}")
     logger.info(f"Steps: {args.steps}")
     logger.info(f"Read order: {args.read_order[0]}")
+    logger.info(f"File random mode: {args.file_random_mode}, window {args.file_random_window}, memory budget {args.reader_memory_budget}")
+    if args.coalesce_max_gap >= 0:
+        logger.info(f"Coalescing FullRandom reads: max gap {args.coalesce_max_gap}, max size {args.coalesce_max_size}, window {args.coalesce_window}")
+    logger.info(f"Reader engine: {args.reader_engine}")
+    if args.reader_engine == "asyncio":
+        logger.info(f"Async loops: {args.async_loops}")
+        logger.info(f"Async queue depth: {args.async_queue_depth}")
+    elif args.reader_engine == "process":
+        logger.info(f"Reader processes: {args.reader_processes}")
+        logger.info(f"Shared-memory ring slots: {args.shm_ring_slots}")
+        logger.info(f"Shared-memory handoff: {args.shm_handoff}")
     logger.info(f"Background queue max size: {args.background_queue_maxsize}")
+    if args.prefetch_depth > 0:
+        logger.info(f"Prefetch depth (batches): {args.prefetch_depth}")
+    if args.compute_time_ms > 0:
+        logger.info(f"Compute time per step: {args.compute_time_distribution} {args.compute_time_ms} ms (stddev {args.compute_time_stddev_ms} ms)")
     logger.info(f"Background threads: {args.background_threads}")
+    logger.info(f"Queue batch size: {args.queue_batch_size}")
+    logger.info(f"Buffer pool size: {args.buffer_pool_size}")
+    logger.info(f"Handle cache size: {args.handle_cache_size}")
+    rate = pacing.target_rate(args)
+    if rate > 0:
+        check_open_loop(args)
+        logger.info(f"Open loop: {rate} samples/s per rank, {args.arrival} arrivals, deadline {args.deadline_ms} ms")
     logger.info(f"Group member id: {args.group_member_id}")
     logger.info(f"Group size: {args.group_size}")
     logger.info(f"Label: {args.label}")
+    logger.info(f"Plan mode: {args.plan_mode}")
+    if args.manifest_dir:
+        logger.info(f"Manifest dir: {args.manifest_dir} (refresh: {args.manifest_refresh})")
     logger.info(f"Data set path: {args.prefix}.\n")
     sources = configure_object_sources(args)
+    object_sizes = {n: size for source in sources.values() for n, size in source.sizes.items()}
     
+    # Epochs planned ahead run their collectives on a group of their own, so
+    # they never interleave with the step synchronization of the running epoch.
+    planner = None
+    plans = collections.deque()
+    if args.plan_ahead > 0:
+        group = td.new_group(backend="gloo") if td.get_world_size() > 1 else None
+        planner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner")
+        logger.info(f"Planning up to {args.plan_ahead} epochs ahead.")
+
+    # Reader threads live across epochs, keeping their open files and
+    # connections. Reader processes are forked per epoch.
+    readers = None
+    if args.reader_engine != "process":
+        readers = reader_pool.ReaderPool(
+            args.async_loops if args.reader_engine == "asyncio" else args.background_threads
+        )
+
     for epoch in range(args.epochs):
         logger.info(f"******** Starting epoch: {epoch} ********.")
-        logger.info(f"Configure epoch: {epoch}.")
-        (reader, read_order, filesystem_name, filesystem, epoch_objects) = (configure_epoch(sources, args))
-        logger.info(f"Configured, total objects: {len(epoch_objects)}")
-        
-        logger.info(f"Configuring samples.")
-        samples = configure_samples(epoch_objects, filesystem, args)
-        logger.info(f"Configured, total selected samples: {len(samples)}")
+        epoch_start = time.monotonic_ns()
+        if planner is not None:
+            # Keep --plan-ahead epochs queued after this one.
+            while len(plans) <= args.plan_ahead and epoch + len(plans) < args.epochs:
+                plans.append(
+                    planner.submit(plan_epoch, sources, epoch + len(plans), args, rate, object_sizes, group)
+                )
+            plan = plans.popleft().result()
+        else:
+            plan = plan_epoch(sources, epoch, args, rate, object_sizes)
+        (reader, read_order, filesystem, epoch_objects, samples, pool, pacer) = plan
+        logger.info(f"Epoch {epoch} plan ready after {(time.monotonic_ns() - epoch_start) / 1000000} ms.")
 
         logger.info(f"Running epoch: {epoch}")
-        for summary in Epoch(reader, epoch_objects, filesystem, samples, args):
+        for summary in Epoch(reader, epoch_objects, filesystem, samples, args, read_order, epoch_start, readers):
             logger.info(f"Epoch: {epoch}, {summary}")
             
+        epoch_lat = sample_lat_logger.epoch()
+        if epoch_lat is not None:
+            if td.get_world_size() > 1:
+                epoch_lat = histogram.all_reduce(epoch_lat)
+            p = epoch_lat.percentiles()
+            logger.info(
+                f"Epoch {epoch} sample latency over all ranks ({epoch_lat.count} samples, ms): "
+                + ", ".join(f"p{k}={v:.3f}" for k, v in p.items())
+            )
+        for prefix, source in sources.items():
+            handles = source.handles
+            if handles.misses > 0:
+                logger.info(
+                    f"Handle cache of {prefix}: {handles.hits} hits, {handles.misses} misses, "
+                    f"{handles.evictions} evictions, {len(handles)} open."
+                )
+        if pool is not None:
+            logger.info(f"Buffer pool exhausted {pool.exhausted} times.")
+        if pacer is not None:
+            logger.info(
+                f"Open loop: issued {pacer.issued}, backlogged {pacer.backlogged}, "
+                f"max backlog {pacer.max_backlog}, missed deadlines {pacer.missed_deadlines}."
+            )
+            backlogged_reads.add(pacer.backlogged)
+            missed_deadlines.add(pacer.missed_deadlines)
         logger.info(f"Epoch {epoch} completed.\n")
         
         # Clear the kernel cache
         if args.clear_pagecache_after_epoch:
             util.clear_kernel_cache(logger)
 
+    if planner is not None:
+        planner.shutdown()
+    if readers is not None:
+        readers.close()
+    for source in sources.values():
+        source.handles.close()
+
+
+def plan_epoch(
+    sources: dict[str, Source],
+    epoch: int,
+    args: argparse.Namespace,
+    rate: float,
+    object_sizes: dict[str, int],
+    group=None,
+):
+    """
+    Plans an epoch: agrees with the other ranks on its objects, read order
+    and samples, and sets up its buffer pool and pacer. Collectives run on
+    `group`, the default group if None.
+    """
+    logger.info(f"Configure epoch: {epoch}.")
+    seed = None
+    if args.plan_mode == "seed":
+        seed = configure_plan_seed(sources, epoch, args, group)
+        logger.info(f"Plan seed: {seed}")
+    # A fresh pool per epoch: readers of an earlier epoch which stopped
+    # at --steps may still hold buffers they will never hand back.
+    pool = None
+    if args.buffer_pool_size > 0:
+        pool = buffer_pool.BufferPool(
+            args.buffer_pool_size, args.sample_size, on_exhausted=lambda: buffer_pool_exhausted.add(1)
+        )
+    pacer = None
+    if rate > 0:
+        # Ranks share the plan seed but not their arrivals, which would
+        # otherwise line up across the group.
+        pacer_seed = None if seed is None else seed + td.get_rank()
+        pacer = pacing.Pacer(rate, args.arrival, int(args.deadline_ms * 1000000), pacer_seed)
+    (reader, read_order, filesystem_name, filesystem, epoch_objects) = (
+        configure_epoch(sources, args, seed, pool, pacer, group)
+    )
+    logger.info(f"Configured epoch {epoch}, total objects: {len(epoch_objects)}")
+
+    logger.info("Configuring samples.")
+    samples = configure_samples(epoch_objects, filesystem, args, seed, object_sizes, group)
+    logger.info(f"Configured epoch {epoch}, total selected samples: {len(samples)}")
+    if seed is not None:
+        verify_plan(epoch_objects, samples, group)
+    return (reader, read_order, filesystem, epoch_objects, samples, pool, pacer)
+
+
+def check_open_loop(args: argparse.Namespace):
+    """
+    Open-loop pacing needs one read per sample, issued by reader threads
+    sharing the pacer of the rank.
+    """
+    if args.reader_engine != "thread":
+        raise Exception(f"Open-loop pacing needs --reader-engine=thread, got {args.reader_engine}.")
+    if "FileRandom" in args.read_order and args.file_random_mode != "ranged":
+        raise Exception("Open-loop pacing of FileRandom needs --file-random-mode=ranged.")
+    if "FullRandom" in args.read_order and args.coalesce_max_gap >= 0:
+        raise Exception("Open-loop pacing of FullRandom does not support coalesced reads.")
+
 def Epoch(
     reader: callable,
     epoch_objects: Iterable[str],
     filesystem: fs.PyFileSystem,
     samples: list,
     args: argparse.Namespace,
+    read_order: str = None,
+    start_ns: int = None,
+    readers: reader_pool.ReaderPool = None,
 ):
-    q = queue.Queue(maxsize=args.background_queue_maxsize)
-    for i in range(args.background_threads):
-        threading.Thread(
-            daemon=True,
-            target=_background,
-            args=(
-                reader,
-                q,
-                epoch_objects,
-                i,
-                args.background_threads,
-                filesystem,
-                args.sample_size,
-                samples,
-            ),
-        ).start()
-    step_start = time.monotonic_ns()
+    # Capacity of the queue in samples: readers may run at most
+    # --prefetch-depth batches ahead of the step being computed.
+    capacity = args.background_queue_maxsize
+    if args.prefetch_depth > 0:
+        capacity = args.prefetch_depth * args.batch_size
+    # The queue carries micro-batches, keep its capacity in samples unchanged.
+    queue_maxsize = max(1, capacity // args.queue_batch_size)
+    processes = []
+    cancelled = None
+    own_readers = False
+    if args.reader_engine == "process":
+        payload_size = args.sample_size if args.shm_handoff == "bytes" else 0
+        slots = capacity if args.prefetch_depth > 0 else args.shm_ring_slots
+        ring = shm_ring.SharedRingBuffer(slots=slots, payload_size=payload_size)
+        q = _RingQueue(ring, epoch_objects, args.queue_batch_size)
+        workers = args.reader_processes
+        ctx = multiprocessing.get_context("fork")
+        for i in range(workers):
+            p = ctx.Process(
+                daemon=True,
+                target=_process_background,
+                args=(
+                    reader,
+                    ring,
+                    epoch_objects,
+                    i,
+                    workers,
+                    filesystem,
+                    args.sample_size,
+                    samples,
+                ),
+            )
+            p.start()
+            processes.append(p)
+    else:
+        q = queue.Queue(maxsize=queue_maxsize)
+        workers = args.async_loops if args.reader_engine == "asyncio" else args.background_threads
+        if readers is None:
+            # Without a pool from the caller, the readers live for this epoch.
+            readers = reader_pool.ReaderPool(workers)
+            own_readers = True
+        if readers.count != workers:
+            raise Exception(f"Reader pool has {readers.count} threads, expected {workers}.")
+        if args.reader_engine == "asyncio":
+            def target(i, state, cancelled):
+                try:
+                    if "async" not in state:
+                        state["async"] = async_reader.Worker(args.handle_cache_size)
+                except Exception as e:
+                    # Ends this thread's part of the epoch, which
+                    # _async_background does once it starts.
+                    logger.error(f"Background thread {i} failed: {e}")
+                    q.put(Failed())
+                    q.put(Done())
+                    return
+                _async_background(
+                    read_order,
+                    q,
+                    epoch_objects,
+                    i,
+                    workers,
+                    args.async_queue_depth,
+                    filesystem,
+                    args.sample_size,
+                    samples,
+                    args.queue_batch_size,
+                    state["async"],
+                    cancelled,
+                )
+        else:
+            def target(i, state, cancelled):
+                _background(
+                    reader,
+                    q,
+                    epoch_objects,
+                    i,
+                    workers,
+                    filesystem,
+                    args.sample_size,
+                    samples,
+                    args.queue_batch_size,
+                    cancelled,
+                )
+        cancelled = readers.run(target)
+    compute_time = compute_time_sampler(args)
+    epoch_stall_ns = 0
+    epoch_start = step_start = time.monotonic_ns()
+    # The time to the first sample counts from start_ns, when the epoch
+    # started before its plan was ready.
+    start_ns = start_ns or epoch_start
+    first_sample = True
+    # Per-step durations and sync waits, gathered to rank 0 at the end.
+    step_ns = np.zeros(args.steps, dtype=np.int64)
+    sync_ns = np.zeros(args.steps, dtype=np.int64)
+    sync = step_sync.StepSync(args.sync_mode, args.sync_interval)
     step = 0
-    running = args.background_threads
+    running = workers
     batch_samples = 0
-    remaining = len(samples)
     logger.debug("Starting the steps loop.")
-    while running != 0 and step < args.steps:
-        item = q.get()
-        if isinstance(item, Failed):
-            raise Exception("One of the background threads failed.")
-        if isinstance(item, Done):
+    try:
+        while running != 0 and step < args.steps:
+            item = q.get()
+            if isinstance(item, Failed):
+                raise Exception("One of the background threads failed.")
+            if isinstance(item, Done):
+                q.task_done()
+                running -= 1
+                continue
             q.task_done()
-            running -= 1
-            continue
-        q.task_done()
-        batch_samples += 1
-        remaining -= args.batch_size
-        if batch_samples < args.batch_size:
-            continue
-        duration_ns = time.monotonic_ns() - step_start
-        yield f"Step: {step}, Duration (ms): {duration_ns/1000000}, Batch-sample: {batch_samples}"
-        if td.get_world_size() > 1:
-            td.barrier()
-        step_start = time.monotonic_ns()
-        step += 1
-        batch_samples = 0
-    
+            if first_sample:
+                first_sample = False
+                first_sample_ns = time.monotonic_ns() - start_ns
+                time_to_first_sample.record(first_sample_ns / 1000000)
+                logger.info(f"Time to first sample: {first_sample_ns / 1000000} ms.")
+            if args.buffer_pool_size > 0:
+                # The samples are accounted for, their buffers can be reused.
+                for sample in item:
+                    buffer_pool.release(sample[-1])
+            # Each item is a micro-batch of samples, which may complete more
+            # than one step. The surplus counts towards the next step.
+            batch_samples += len(item)
+            while batch_samples >= args.batch_size and step < args.steps:
+                # The step waited for data until its batch was complete, then
+                # computes while the readers keep prefetching.
+                stall_ns = time.monotonic_ns() - step_start
+                epoch_stall_ns += stall_ns
+                step_stall.record(stall_ns / 1000000)
+                compute_s = compute_time()
+                if compute_s > 0:
+                    time.sleep(compute_s)
+                duration_ns = time.monotonic_ns() - step_start
+                summary = (
+                    f"Step: {step}, Duration (ms): {duration_ns/1000000}, Batch-sample: {args.batch_size}, "
+                    f"Stall (ms): {stall_ns/1000000}, Compute (ms): {compute_s*1000}"
+                )
+                step_lat = sample_lat_logger.step()
+                if step_lat is not None and step_lat.count > 0:
+                    summary += f", Sample lat p50/p99 (ms): {step_lat.quantile(0.5):.3f}/{step_lat.quantile(0.99):.3f}"
+                yield summary
+                step_ns[step] = duration_ns
+                sync_ns[step] = sync.step(step)
+                step_sync_wait.record(sync_ns[step] / 1000000)
+                step_start = time.monotonic_ns()
+                step += 1
+                batch_samples -= args.batch_size
+    finally:
+        if cancelled is not None:
+            # Stop the readers at the step budget and drain what they queue
+            # meanwhile, so none stays blocked on a full queue.
+            cancelled.set()
+            while running > 0:
+                item = q.get()
+                if isinstance(item, Done):
+                    running -= 1
+                elif args.buffer_pool_size > 0 and isinstance(item, list):
+                    for sample in item:
+                        buffer_pool.release(sample[-1])
+            if own_readers:
+                readers.close()
+        # Reader processes may still be blocked on a full ring buffer.
+        for p in processes:
+            p.terminate()
+            p.join()
+        if processes:
+            q.ring.close()
+
     for i in range(step, args.steps):
         logger.info(f"Empty step {i}")
+        sync_ns[i] = sync.step(i)
+    if args.steps > 0:
+        sync_ns[-1] += sync.finish()
+
+    if step > 0:
+        epoch_ns = time.monotonic_ns() - epoch_start
+        logger.info(
+            f"Stalled {epoch_stall_ns/1000000} ms waiting for data over {step} steps, "
+            f"{100 * epoch_stall_ns / epoch_ns:.1f}% of {epoch_ns/1000000} ms."
+        )
         if td.get_world_size() > 1:
-            td.barrier()
+            total_sync_ns = int(sync_ns.sum())
+            logger.info(
+                f"Waited {total_sync_ns/1000000} ms to synchronize ({args.sync_mode}), "
+                f"{100 * total_sync_ns / epoch_ns:.1f}% of {epoch_ns/1000000} ms."
+            )
+
+    if td.get_world_size() > 1:
+        times = stragglers.gather(step_ns, sync_ns)
+        if times is not None:
+            stragglers.log_summary(stragglers.summarize(times))
+
+def compute_time_sampler(args: argparse.Namespace) -> callable:
+    """
+    Returns a function drawing the simulated compute time of a step, in
+    seconds: --compute-time-ms every step ('fixed'), or drawn from a normal
+    (clamped at 0) or exponential distribution with that mean.
+    """
+    mean = args.compute_time_ms / 1000
+    if mean <= 0:
+        return lambda: 0
+    if args.compute_time_distribution == "fixed":
+        return lambda: mean
+    rng = random.Random()
+    if args.compute_time_distribution == "normal":
+        stddev = args.compute_time_stddev_ms / 1000
+        return lambda: max(0, rng.gauss(mean, stddev))
+    if args.compute_time_distribution == "exponential":
+        return lambda: rng.expovariate(1 / mean)
+    raise Exception(f"Unknown compute time distribution {args.compute_time_distribution}")
 
 class Done(object):
     pass
@@ -248,21 +652,198 @@ def _background(
     filesystem: fs.FileSystem,
     sample_size: int,
     samples: list,
+    batch_size: int = 1,
+    cancelled: threading.Event = None,
 ):
     logger.debug(f"Background thread {thread_id} started.")
+    samples_iter = None
     try:
         success = True
-        for r in reader(object_names, thread_id, thread_count, filesystem, sample_size, samples):
-            queue.put(r)
+        batch = []
+
+        def flush():
+            # A reader about to wait for a pooled buffer hands on the ones
+            # it holds, the consumer could otherwise never release them.
+            nonlocal batch
+            if batch:
+                queue.put(batch)
+                batch = []
+
+        samples_iter = reader(object_names, thread_id, thread_count, filesystem, sample_size, samples)
+        with buffer_pool.before_wait(flush):
+            for r in samples_iter:
+                if cancelled is not None and cancelled.is_set():
+                    batch = []
+                    break
+                batch.append(r)
+                if len(batch) >= batch_size:
+                    flush()
+            flush()
     except Exception as e:
         success = False
         queue.put(Failed())
         logger.error(f"Background thread {thread_id} failed: {e}")
     finally:
+        # Closes the files of a reader stopped early.
+        if hasattr(samples_iter, "close"):
+            samples_iter.close()
         queue.put(Done())
         if success:
             logger.debug(f"Background thread {thread_id} completed.")
 
+class _LatencyCapture(object):
+    """
+    Stands in for the metrics logger inside a reader process, keeping the
+    latency, object and size of the last read so they can travel with the
+    sample descriptor.
+    """
+    def __init__(self):
+        self.last_ns = 0
+        self.last_name = None
+        self.last_nbytes = -1
+
+    def log_metric(self, sample_lat, name=None, offset=-1, nbytes=-1, reader=None):
+        self.last_ns = int(sample_lat * 1000000)
+        self.last_name = name
+        self.last_nbytes = nbytes
+
+    def close(self):
+        pass
+
+def _sample_fields(item: tuple):
+    """Returns (name, offset, chunk) from the tuple yielded by any reader."""
+    if len(item) == 2:
+        return (None, item[0], item[1])
+    if len(item) == 4:
+        return (item[0], item[1], item[3])
+    return (item[0], item[1], None)
+
+class _RingQueue(object):
+    """
+    Adapts a SharedRingBuffer to the queue interface consumed by Epoch, and
+    records the latencies measured by the reader processes.
+
+    Each get() drains up to `batch_size` already published slots into one
+    micro-batch, control messages (Done, Failed) are returned on their own.
+    """
+    def __init__(self, ring: shm_ring.SharedRingBuffer, object_names: Iterable[str], batch_size: int = 1):
+        self.ring = ring
+        self.object_names = list(object_names)
+        self.batch_size = batch_size
+        self._pending = None
+
+    def get(self):
+        if self._pending is not None:
+            item, self._pending = self._pending, None
+            return item
+        batch = []
+        slot = self.ring.get()
+        while True:
+            kind, index, offset, latency_ns, payload, nbytes = slot
+            if kind != shm_ring.SAMPLE:
+                control = Failed() if kind == shm_ring.FAILED else Done()
+                if not batch:
+                    return control
+                self._pending = control
+                return batch
+            name = self.object_names[index] if index >= 0 else None
+            if nbytes < 0 and payload is not None:
+                nbytes = len(payload)
+            sample_lat_logger.log_metric(latency_ns / 1000000, name, offset, nbytes, "process")
+            sample_lat.record(latency_ns / 1000000, _READER_ATTRIBUTES["process"])
+            batch.append((name, offset, latency_ns, payload))
+            if len(batch) >= self.batch_size:
+                return batch
+            slot = self.ring.get(block=False)
+            if slot is None:
+                return batch
+
+    def task_done(self):
+        pass
+
+def _process_background(
+    reader: callable,
+    ring: shm_ring.SharedRingBuffer,
+    object_names: Iterable[str],
+    worker_id: int,
+    worker_count: int,
+    filesystem: fs.FileSystem,
+    sample_size: int,
+    samples: list,
+):
+    # This runs in a forked reader process, the parent's metrics logger and
+    # exporter threads do not exist here, so latencies go through the ring.
+    global sample_lat_logger, sample_lat
+    capture = _LatencyCapture()
+    sample_lat_logger = capture
+    sample_lat = metrics.NoOpHistogram("no_op")
+    index = {n: i for i, n in enumerate(object_names)}
+    logger.debug(f"Reader process {worker_id} started.")
+    try:
+        success = True
+        for r in reader(object_names, worker_id, worker_count, filesystem, sample_size, samples):
+            name, offset, chunk = _sample_fields(r)
+            # FullRandom and FileRandom yield no name, the reader logged it.
+            name = name if name is not None else capture.last_name
+            nbytes = capture.last_nbytes if chunk is None else len(chunk)
+            ring.put(shm_ring.SAMPLE, index.get(name, -1), offset, capture.last_ns, chunk, nbytes)
+            buffer_pool.release(chunk)
+    except Exception as e:
+        success = False
+        ring.put(shm_ring.FAILED)
+        logger.error(f"Reader process {worker_id} failed: {e}")
+    finally:
+        ring.put(shm_ring.DONE)
+        if success:
+            logger.debug(f"Reader process {worker_id} completed.")
+
+def _record_async_sample_lat(elapsed_time: int, name: str, offset: int, nbytes: int):
+    sample_lat_logger.log_metric(elapsed_time / 1000000, name, offset, nbytes, "asyncio")
+    sample_lat.record(elapsed_time / 1000000, _READER_ATTRIBUTES["asyncio"])
+
+def _async_background(
+    read_order: str,
+    queue: queue.Queue,
+    object_names: Iterable[str],
+    loop_id: int,
+    loop_count: int,
+    queue_depth: int,
+    filesystem: fs.FileSystem,
+    sample_size: int,
+    samples: list,
+    batch_size: int = 1,
+    worker: async_reader.Worker = None,
+    cancelled: threading.Event = None,
+):
+    logger.debug(f"Event loop thread {loop_id} started.")
+    try:
+        success = True
+        async_reader.run_loop(
+            read_order,
+            object_names,
+            td.get_rank(),
+            td.get_world_size(),
+            loop_id,
+            loop_count,
+            queue_depth,
+            filesystem,
+            sample_size,
+            samples,
+            queue,
+            _record_async_sample_lat,
+            batch_size,
+            worker,
+            cancelled,
+        )
+    except Exception as e:
+        success = False
+        queue.put(Failed())
+        logger.error(f"Event loop thread {loop_id} failed: {e}")
+    finally:
+        queue.put(Done())
+        if success:
+            logger.debug(f"Event loop thread {loop_id} completed.")
+
 def sequential_reader(
     object_names: Iterable[str],
     thread_id: int,
@@ -270,28 +851,46 @@ def sequential_reader(
     filesystem: fs.FileSystem,
     sample_size: int,
     samples: list,
+    pool: buffer_pool.BufferPool = None,
+    pacer: pacing.Pacer = None,
 ):
+    """
+    Reads the objects sequentially. With a buffer pool, each sample is read
+    into a pooled buffer and yielded as (name, offset, elapsed, chunk), the
+    consumer releases the chunk. With a pacer, reads are issued on its
+    schedule and their latency is measured from the scheduled time.
+    """
+    index = sampling.index_of(samples)
     subset = _subset(object_names, td.get_rank(), td.get_world_size())
     subset = _subset(subset, thread_id, thread_count)
     for name in subset:
         # Only read as many samples as have been configured for this object.
-        max_offset = sample_size * len([o for n, o in samples if n == name])
+        max_offset = sample_size * index.count(name)
         logger.debug(f"Reading {name} sequentially from {0} to {max_offset}.")
         with filesystem.open_input_stream(name) as f:
             offset = 0
             while offset < max_offset:
-                start_time = time.monotonic_ns()
-                chunk = f.read(sample_size)
+                buf = pool.acquire() if pool else None
+                start_time = pacer.wait() if pacer else time.monotonic_ns()
+                if buf is None:
+                    chunk = f.read(sample_size)
+                else:
+                    chunk = memoryview(buf)[: f.readinto(buf)]
                 elapsed_time = time.monotonic_ns() - start_time
-                sample_lat_logger.log_metric(elapsed_time / 1000000)
-                sample_lat.record(elapsed_time / 1000000, {"reader": "sequential"})
+                if pacer:
+                    pacer.done(elapsed_time)
+                sample_lat_logger.log_metric(elapsed_time / 1000000, name, offset, len(chunk), "sequential")
+                sample_lat.record(elapsed_time / 1000000, _READER_ATTRIBUTES["sequential"])
                 if not chunk:
+                    buffer_pool.release(chunk)
                     break
-                yield (name, offset, elapsed_time)
+                if buf is None:
+                    yield (name, offset, elapsed_time)
+                else:
+                    yield (name, offset, elapsed_time, chunk)
                 offset += len(chunk)
 
 
-# TODO (raj-prince): discuss what observability is required for file_random_reader pattern.
 def file_random_reader(
     object_names: Iterable[str],
     thread_id: int,
@@ -299,18 +898,94 @@ def file_random_reader(
     filesystem: fs.FileSystem,
     sample_size: int,
     samples: list,
+    mode: str = "readall",
+    window_size: int = 64 * 1024 * 1024,
+    budget: memory_budget.MemoryBudget = None,
+    pacer: pacing.Pacer = None,
 ):
+    """
+    Reads the selected samples of each object, in offset order.
+
+    'readall' reads each whole object into memory, 'window' streams it in
+    `window_size` reads, and 'ranged' reads only the selected samples. The
+    buffered bytes are reserved from `budget`, if given. Each sample records
+    the latency of the read it was served from. Only 'ranged' issues one read
+    per sample, so only it can be paced.
+    """
+    index = sampling.index_of(samples)
     subset = _subset(object_names, td.get_rank(), td.get_world_size())
     subset = _subset(subset, thread_id, thread_count)
     for name in subset:
-        data = filesystem.open_input_file(name).readall()
-        offsets = [o for n, o in samples if n == name]
+        offsets = index.offsets(name).tolist()
+        if mode == "readall":
+            yield from _file_random_readall(filesystem, name, offsets, sample_size, budget)
+        elif mode == "window":
+            yield from _file_random_window(filesystem, name, offsets, sample_size, window_size, budget)
+        elif mode == "ranged":
+            yield from _file_random_ranged(filesystem, name, offsets, sample_size, pacer)
+        else:
+            raise Exception(f"Unknown file random mode {mode}")
+
+def _record_file_random_lat(elapsed_time: int, name: str, offset: int, nbytes: int):
+    sample_lat_logger.log_metric(elapsed_time / 1000000, name, offset, nbytes, "file_random")
+    sample_lat.record(elapsed_time / 1000000, _READER_ATTRIBUTES["file_random"])
+
+def _file_random_readall(filesystem: fs.FileSystem, name: str, offsets: list[int], sample_size: int, budget):
+    f = filesystem.open_input_file(name)
+    with budget.reserve(f.size()) if budget else contextlib.nullcontext():
+        start_time = time.monotonic_ns()
+        data = f.readall()
+        elapsed_time = time.monotonic_ns() - start_time
         for offset in offsets:
             chunk = data[offset : min(len(data), offset + sample_size)]
+            _record_file_random_lat(elapsed_time, name, offset, len(chunk))
             yield (offset, chunk)
-        del offsets
         del data
 
+def _file_random_window(
+    filesystem: fs.FileSystem, name: str, offsets: list[int], sample_size: int, window_size: int, budget
+):
+    if not offsets:
+        return
+    # A sample may straddle two windows, so up to one sample is carried over.
+    with budget.reserve(window_size + sample_size) if budget else contextlib.nullcontext():
+        with filesystem.open_input_stream(name) as f:
+            i = 0
+            buf = b""
+            buf_start = 0
+            eof = False
+            while i < len(offsets) and not eof:
+                start_time = time.monotonic_ns()
+                data = f.read(window_size)
+                elapsed_time = time.monotonic_ns() - start_time
+                eof = len(data) < window_size
+                buf += data
+                buf_end = buf_start + len(buf)
+                while i < len(offsets) and (offsets[i] + sample_size <= buf_end or eof):
+                    offset = offsets[i]
+                    i += 1
+                    chunk = buf[offset - buf_start : offset - buf_start + sample_size]
+                    _record_file_random_lat(elapsed_time, name, offset, len(chunk))
+                    yield (offset, chunk)
+                # Keep only the bytes still needed by the next samples.
+                keep = offsets[i] if i < len(offsets) else buf_end
+                keep = min(max(keep, buf_start), buf_end)
+                buf = buf[keep - buf_start :]
+                buf_start = keep
+
+def _file_random_ranged(filesystem: fs.FileSystem, name: str, offsets: list[int], sample_size: int, pacer=None):
+    if not offsets:
+        return
+    with filesystem.open_input_file(name) as f:
+        for offset in offsets:
+            start_time = pacer.wait() if pacer else time.monotonic_ns()
+            chunk = f.read_at(sample_size, offset)
+            elapsed_time = time.monotonic_ns() - start_time
+            if pacer:
+                pacer.done(elapsed_time)
+            _record_file_random_lat(elapsed_time, name, offset, len(chunk))
+            yield (offset, chunk)
+
 def full_random_reader(
     object_names: Iterable[str],
     thread_id: int,
@@ -318,134 +993,290 @@ def full_random_reader(
     filesystem: fs.FileSystem,
     sample_size: int,
     samples: list,
+    coalesce_max_gap: int = -1,
+    coalesce_max_size: int = 0,
+    coalesce_window: int = 1,
+    pool: buffer_pool.BufferPool = None,
+    pacer: pacing.Pacer = None,
+    handles: handle_cache.HandleCache = None,
 ):
-    files = {n: filesystem.open_input_file(n) for n in object_names}
+    # Objects are opened on first read, through the shared handles if given.
+    files = handles if handles is not None else handle_cache.HandleCache(filesystem)
     subset = _subset(samples, td.get_rank(), td.get_world_size())
     subset = _subset(subset, thread_id, thread_count)
-    for name, offset in subset:
-        logger.debug(f"Reading {name} at {offset} with size {sample_size}.")
-        start_time = time.monotonic_ns()
-        try:
-            chunk = files[name].read_at(sample_size, offset)
-        except Exception as e:
-            logger.error(f"error in reading {name} at {offset} with size {sample_size}: {e}")
-            raise
-        elapsed_time = time.monotonic_ns() - start_time
-        sample_lat_logger.log_metric(elapsed_time / 1000000)
-        sample_lat.record(elapsed_time / 1000000, {"reader": "full_random"})
-        logger.debug(f"Complete reading {name} at {offset} with size {sample_size} in {elapsed_time / 1000000} ms.")
-        if not chunk:
-            logger.error(f"Chunk is nil.")
-            raise ValueError("chunk is nil.") 
-        yield (offset, chunk)
-    for name, f in files.items():
-        f.close()
-    del files
+    if coalesce_max_gap >= 0:
+        yield from _coalesced_reads(files, subset, sample_size, coalesce_max_gap, coalesce_max_size, coalesce_window)
+    else:
+        for name, offset in subset:
+            logger.debug(f"Reading {name} at {offset} with size {sample_size}.")
+            buf = pool.acquire() if pool else None
+            try:
+                # Opened before the clock starts, the latency is the read's.
+                with files.open(name, readinto=buf is not None) as handle:
+                    start_time = pacer.wait() if pacer else time.monotonic_ns()
+                    if buf is None:
+                        chunk = handle.read_at(sample_size, offset)
+                    else:
+                        chunk = memoryview(buf)[: handle.readinto_at(buf, offset)]
+                    elapsed_time = time.monotonic_ns() - start_time
+            except Exception as e:
+                logger.error(f"error in reading {name} at {offset} with size {sample_size}: {e}")
+                raise
+            if pacer:
+                pacer.done(elapsed_time)
+            sample_lat_logger.log_metric(elapsed_time / 1000000, name, offset, len(chunk) if chunk else 0, "full_random")
+            sample_lat.record(elapsed_time / 1000000, _READER_ATTRIBUTES["full_random"])
+            logger.debug(f"Complete reading {name} at {offset} with size {sample_size} in {elapsed_time / 1000000} ms.")
+            if not chunk:
+                buffer_pool.release(chunk)
+                logger.error(f"Chunk is nil.")
+                raise ValueError("chunk is nil.") 
+            yield (offset, chunk)
+    if handles is None:
+        files.close()
     del samples
 
+def _coalesced_reads(
+    files: handle_cache.HandleCache,
+    subset: list,
+    sample_size: int,
+    max_gap: int,
+    max_size: int,
+    window: int,
+):
+    """
+    Reads the samples of a worker through coalesced ranges, looking ahead
+    `window` samples at a time, and slices each sample out of its range.
+
+    Every sample records the latency of the range read it was served from.
+    """
+    for samples in coalesce.windows(subset, window):
+        for r in coalesce.coalesce(samples, sample_size, max_gap, max_size):
+            logger.debug(f"Reading {r.name} at {r.start} with size {r.length} for {len(r.offsets)} samples.")
+            try:
+                with files.open(r.name) as handle:
+                    start_time = time.monotonic_ns()
+                    data = handle.read_at(r.length, r.start)
+                    elapsed_time = time.monotonic_ns() - start_time
+            except Exception as e:
+                logger.error(f"error in reading {r.name} at {r.start} with size {r.length}: {e}")
+                raise
+            for offset in r.offsets:
+                chunk = data[offset - r.start : offset - r.start + sample_size]
+                sample_lat_logger.log_metric(elapsed_time / 1000000, r.name, offset, len(chunk), "full_random")
+                sample_lat.record(elapsed_time / 1000000, _READER_ATTRIBUTES["full_random"])
+                if not chunk:
+                    logger.error(f"Chunk is nil.")
+                    raise ValueError("chunk is nil.")
+                yield (offset, chunk)
+
 
 def configure_samples(
-    object_names: Iterable[str], filesystem: fs.FileSystem, args: argparse.Namespace
+    object_names: Iterable[str],
+    filesystem: fs.FileSystem,
+    args: argparse.Namespace,
+    seed: int = None,
+    object_sizes: dict[str, int] = None,
+    group=None,
 ):
-    samples = []
-    logger.info(f"Opening {len(object_names)} files.")
-    files = {n: filesystem.open_input_file(n) for n in object_names}
+    object_names = list(object_names)
+    object_sizes = object_sizes or {}
+    sizes = [object_sizes.get(name) for name in object_names]
+    unknown = [i for i, size in enumerate(sizes) if size is None]
+    if unknown:
+        # Only objects missing from the listing need a metadata request.
+        logger.info(f"Opening {len(unknown)} files.")
+        for i in unknown:
+            with filesystem.open_input_file(object_names[i]) as f:
+                sizes[i] = f.size()
     
     req_samples = args.batch_size * args.steps * args.group_size
     logger.info(f"Collecting {req_samples} samples.")
     
-    for name, f in files.items():
-        samples.extend([(name, offset) for offset in range(0, f.size(), args.sample_size)])
-    logger.info(f"Total samples: {len(samples)}")
+    available = sampling.available_samples(sizes, args.sample_size)
+    logger.info(f"Total samples: {available}")
     
-    logger.info(f"Selecting {req_samples} samples from {len(samples)} randomly.")
-    if req_samples > len(samples):
-        logger.warning(f"Req sample ({req_samples}) > available ({len(samples)}), hence duplicated.")
+    logger.info(f"Selecting {req_samples} samples from {available} randomly.")
+    if req_samples > available:
+        logger.warning(f"Req sample ({req_samples}) > available ({available}), hence duplicated.")
     
     sample_selection_stime = time.monotonic_ns()
-    samples = random.choices(samples, k=req_samples)
+    rng = np.random.default_rng(seed)
+    samples = sampling.select_samples(object_names, sizes, args.sample_size, req_samples, rng)
     sample_selection_etime = time.monotonic_ns()
     logger.info(f"Sample selection took {(sample_selection_etime - sample_selection_stime) / 1000000} ms.")
 
-    if td.get_world_size() > 1:
+    # The object names are already known by all ranks, only the compact
+    # sample arrays are broadcast.
+    arrays = [samples.object_ids, samples.offsets]
+    _broadcast("samples", arrays, seed, group)
+    if seed is None and td.get_world_size() > 1:
+        samples = sampling.Samples(object_names, arrays[0], arrays[1])
+
+    return samples
+
+
+def _broadcast(label: str, values: list, seed: int = None, group=None):
+    """
+    Broadcasts `values` in place from rank 0 over `group`, unless every rank
+    derives them from the shared plan seed.
+    """
+    if seed is not None:
+        logger.info(f"Broadcasting[{label}] is not required as it is derived from the plan seed.")
+    elif td.get_world_size() > 1:
         broadcast_time_start = time.monotonic_ns()
-        td.broadcast_object_list(samples, src=0)
-        td.barrier()
+        td.broadcast_object_list(values, src=0, group=group)
+        td.barrier(group=group)
         broadcast_time_end = time.monotonic_ns()
-        logger.info(f"Sample broadcast took {(broadcast_time_end - broadcast_time_start) / 1000000} ms.")
+        logger.info(f"{label.capitalize()} broadcast took {(broadcast_time_end - broadcast_time_start) / 1000000} ms.")
     else:
-        logger.info("Broadcasting[samples] is not required as world size is 1.")
-    
-    return samples
+        logger.info(f"Broadcasting[{label}] is not required as world size is 1.")
 
 
-def configure_epoch(sources: dict[str, Source], args: argparse.Namespace):
-    prefix = [random.choice(args.prefix)]
-    
+def configure_plan_seed(sources: dict[str, Source], epoch: int, args: argparse.Namespace, group=None) -> int:
+    """
+    Agrees on the seed every rank derives the epoch plan from.
+
+    Rank 0 broadcasts only the seed and its dataset fingerprint, the other
+    ranks fail fast if they listed a different dataset.
+    """
+    fingerprint = sampling.dataset_fingerprint({p: s.objects for p, s in sources.items()})
+    if args.plan_seed >= 0:
+        seed = args.plan_seed + epoch
+    else:
+        seed = random.getrandbits(63)
+    plan = [seed, fingerprint]
     if td.get_world_size() > 1:
         broadcast_time_start = time.monotonic_ns()
-        td.broadcast_object_list(prefix, src=0)
-        td.barrier()
+        td.broadcast_object_list(plan, src=0, group=group)
         broadcast_time_end = time.monotonic_ns()
-        logger.info(f"Prefix broadcast took {(broadcast_time_end - broadcast_time_start) / 1000000} ms.")
-    else:
-        logger.info("Broadcasting[prefix] is not required as world size is 1.")
+        logger.info(f"Plan seed broadcast took {(broadcast_time_end - broadcast_time_start) / 1000000} ms.")
+    if plan[1] != fingerprint:
+        raise Exception(f"Dataset fingerprint {fingerprint} does not match rank 0 ({plan[1]}).")
+    return plan[0]
+
+
+def verify_plan(epoch_objects: Iterable[str], samples: sampling.Samples, group=None):
+    """
+    Checks that all ranks derived the same epoch plan, with a single
+    all-reduce of a 64-bit checksum.
+    """
+    checksum = sampling.plan_checksum(epoch_objects, samples)
+    if td.get_world_size() <= 1:
+        return
+    # The max of (c, -c) across ranks gives both the max and min checksum.
+    t = torch.tensor([checksum, -checksum], dtype=torch.int64)
+    td.all_reduce(t, op=td.ReduceOp.MAX, group=group)
+    if t[0].item() != -t[1].item():
+        raise Exception(f"Epoch plan checksum mismatch across ranks (local: {checksum}).")
+    logger.info(f"Epoch plan checksum {checksum} verified across ranks.")
+
+
+def configure_epoch(
+    sources: dict[str, Source],
+    args: argparse.Namespace,
+    seed: int = None,
+    pool: buffer_pool.BufferPool = None,
+    pacer: pacing.Pacer = None,
+    group=None,
+):
+    rng = random if seed is None else random.Random(seed)
+    prefix = [rng.choice(args.prefix)]
+    _broadcast("prefix", prefix, seed, group)
 
     p = prefix[0]
     name = sources[p].name
     filesystem = sources[p].filesystem
     epoch_objects = sources[p].objects.copy()
-    random.shuffle(epoch_objects)
+    if seed is not None:
+        # Start from the same order on every rank, whatever the listing order.
+        epoch_objects.sort()
+    rng.shuffle(epoch_objects)
     if len(epoch_objects) > args.object_count_limit:
         epoch_objects = epoch_objects[0 : args.object_count_limit]
-
-    if td.get_world_size() > 1:
-        broadcast_time_start = time.monotonic_ns()
-        td.broadcast_object_list(epoch_objects, src=0)
-        td.barrier()
-        broadcast_time_end = time.monotonic_ns()
-        logger.info(f"Epoch-objects broadcast took {(broadcast_time_end - broadcast_time_start) / 1000000} ms.")
-    else:
-        logger.info("Broadcasting[epoch-objects] is not required as world size is 1.")
+    _broadcast("epoch-objects", epoch_objects, seed, group)
         
-    read_order = [random.choice(args.read_order)]
-    if td.get_world_size() > 1:
-        broadcast_time_start = time.monotonic_ns()
-        td.broadcast_object_list(read_order, src=0)
-        td.barrier()
-        broadcast_time_end = time.monotonic_ns()
-        logger.info(f"Read-order broadcast took {(broadcast_time_end - broadcast_time_start) / 1000000} ms.")
-    else:
-        logger.info("Broadcasting[read-order] is not required as world size is 1.")
+    read_order = [rng.choice(args.read_order)]
+    _broadcast("read-order", read_order, seed, group)
 
+    # Reader options, the ones left as None keep the reader defaults.
     if read_order[0] == "Sequential":
         reader = sequential_reader
+        options = {"pool": pool, "pacer": pacer}
     elif read_order[0] == "FileRandom":
         reader = file_random_reader
+        options = {
+            "mode": args.file_random_mode,
+            "window_size": args.file_random_window,
+            "budget": memory_budget.MemoryBudget(args.reader_memory_budget),
+            "pacer": pacer,
+        }
     elif read_order[0] == "FullRandom":
         reader = full_random_reader
+        options = {"pacer": pacer, "handles": sources[p].handles}
+        if args.coalesce_max_gap >= 0:
+            # Coalesced ranges are sliced, they are not read into the pool.
+            options.update(
+                coalesce_max_gap=args.coalesce_max_gap,
+                coalesce_max_size=args.coalesce_max_size,
+                coalesce_window=args.coalesce_window,
+            )
+        else:
+            options["pool"] = pool
     else:
         raise Exception(f"Unknown reading order {read_order[0]}")
+    options = {k: v for k, v in options.items() if v is not None}
+    if options:
+        reader = functools.partial(reader, **options)
 
     return (reader, read_order[0], name, filesystem, epoch_objects)
 
 
 def configure_object_sources(args: argparse.Namespace) -> dict[str, Source]:
+    simulated = {
+        p: simulated_fs.from_args(p, args)
+        for p in args.prefix
+        if simulated_fs.is_simulated(p)
+    }
+
+    def listing(prefix: str) -> manifest.Manifest:
+        if prefix in simulated:
+            return simulated_fs.list_prefix(prefix, simulated[prefix])
+        if args.manifest_dir:
+            return manifest.load(args.manifest_dir, prefix, args.manifest_refresh)
+        return manifest.list_prefix(prefix)
+
+    # One listing (or manifest load) per prefix, in parallel.
+    listing_time_start = time.monotonic_ns()
+    with ThreadPoolExecutor(max_workers=len(args.prefix)) as pool:
+        listings = dict(zip(args.prefix, pool.map(listing, args.prefix)))
+    listing_time_end = time.monotonic_ns()
+    logger.info(f"Listing took {(listing_time_end - listing_time_start) / 1000000} ms.")
+
     sources = dict()
     for prefix in args.prefix:
+        objects = listings[prefix].names
+        sizes = dict(zip(listings[prefix].names, listings[prefix].sizes))
         if prefix.startswith("gs://"):
-            objects = fsspec.filesystem("gcs").ls(prefix.removeprefix("gs://"))
-            sources[prefix] = Source("gcs", fs.GcsFileSystem(), objects)
+            sources[prefix] = Source("gcs", fs.GcsFileSystem(), objects, sizes, args.handle_cache_size)
         elif prefix.startswith("gcsfs://"):
             sources[prefix] = Source(
                 "fsspec",
                 fs.PyFileSystem(fs.FSSpecHandler(gcsfs.GCSFileSystem())),
-                fsspec.filesystem("gcs").ls(prefix.removeprefix("gcsfs://")),
+                objects,
+                sizes,
+                args.handle_cache_size,
             )
-        else:
+        elif prefix in simulated:
             sources[prefix] = Source(
-                "local", fs.LocalFileSystem(), fsspec.filesystem("local").ls(prefix)
+                prefix.split("://")[0],
+                fs.PyFileSystem(simulated_fs.SimulatedHandler(simulated[prefix])),
+                objects,
+                sizes,
+                args.handle_cache_size,
             )
+        else:
+            sources[prefix] = Source("local", fs.LocalFileSystem(), objects, sizes, args.handle_cache_size)
     return sources
 
 def main():